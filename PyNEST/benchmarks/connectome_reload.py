@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# connectome_reload.py
+#
+# This file is part of https://github.com/INM-6/microcircuit-PD14-model
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+'''
+Benchmark of the network construction from an exported connectome.
+-------------------------------------------------------------------
+
+Builds the network with the randomized ``fixed_total_number`` connectivity,
+exports the recurrent connectome, and rebuilds the same network realization
+from the exported arrays (``one_to_one`` array connects).
+The times to connect (including ``nest.Prepare()``) are compared.
+
+Usage:
+    python connectome_reload.py [--scaling <scaling_factor>] [--threads <local_num_threads>] [--path <data_path>]
+'''
+
+#####################
+import copy
+import time
+from argparse import ArgumentParser
+
+import nest
+import numpy as np
+
+## import model implementation
+from microcircuit import network
+
+## import (default) parameters (network, simulation, stimulus)
+from microcircuit.network_params import default_net_dict as net_dict
+from microcircuit.sim_params import default_sim_dict as sim_dict
+from microcircuit.stimulus_params import default_stim_dict as stim_dict
+
+parser = ArgumentParser()
+parser.add_argument("--scaling", type=float, default=0.1)
+parser.add_argument("--threads", type=int, default=sim_dict["local_num_threads"])
+parser.add_argument("--path", type=str, default="data_connectome/")
+args = parser.parse_args()
+
+#####################
+
+## set network scale
+net_dict["N_scaling"] = args.scaling
+net_dict["K_scaling"] = args.scaling
+
+sim_dict.update(
+    {
+        "data_path": args.path,
+        "local_num_threads": args.threads,
+        "print_time": False,
+        "store_metadata": False,
+    }
+)
+
+def build(sim_dict):
+    '''
+    Create and connect the network, and return it together with the time to connect.
+    '''
+    net = network.Network(sim_dict, net_dict, stim_dict)
+    net.create()
+    time_start = time.time()
+    net.connect()
+    return net, time.time() - time_start
+
+def weight_sum(net):
+    '''
+    Sum of the weights onto a small sample of neurons (as a simple fingerprint of the connectome).
+    Reading out all weights would take longer than building the network.
+    '''
+    conns = nest.GetConnections(target=net.pops[0][:10], synapse_model='static_synapse')
+    return np.sum(conns.weight) if len(conns) > 0 else 0.0
+
+def main():
+
+    ## randomized connectivity (fixed_total_number)
+    net, time_random = build(sim_dict)
+    num_random = nest.num_connections
+    weights_random = weight_sum(net)
+    net.export_connectome()
+
+    ## connectivity restored from the exported arrays (one_to_one)
+    sim_dict_reload = copy.deepcopy(sim_dict)
+    sim_dict_reload["connectome_path"] = args.path
+    net, time_reload = build(sim_dict_reload)
+    num_reload = nest.num_connections
+    weights_reload = weight_sum(net)
+
+    if nest.Rank() == 0:
+        print()
+        print('##########################################')
+        print()
+        print('Scaling factor                          : %.3f' % args.scaling)
+        print('Virtual processes                       : %d' % nest.total_num_virtual_procs)
+        print('Time to connect (fixed_total_number)    : %.3fs' % time_random)
+        print('Time to connect (connectome, one_to_one): %.3fs' % time_reload)
+        print('Speedup                                 : %.2f' % (time_random / time_reload))
+        print('Identical number of connections         : %s' % (num_random == num_reload))
+        print('Identical sample of weights             : %s' % np.isclose(weights_random, weights_reload))
+        print()
+        print('##########################################')
+        print()
+
+#####################
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# scaling.py
+#
+# This file is part of https://github.com/INM-6/microcircuit-PD14-model
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+'''
+Scaling benchmark of the microcircuit model.
+--------------------------------------------
+
+Runs the network for all combinations of scaling factors (``N_scaling =
+K_scaling``), numbers of threads and numbers of MPI processes on the local
+machine, with several repetitions per configuration. Each run is a separate
+process (started with ``mpirun`` for more than one MPI process) and stores
+its ``benchmark.json`` in ``<path>/<configuration>/rep-<repetition>/``.
+
+The harness collects the real-time factor, the peak memory, the phase
+breakdown and, with an energy meter, the energy per synaptic event, and
+writes
+
+* ``results.csv``: one row per run,
+* ``performance_data.yaml``: one entry per configuration (median across
+  repetitions) in the schema of
+  ``docs/benchmarking/_scripts/performance_data_raw.yaml``.
+
+Usage:
+    python scaling.py [--scalings <factors>] [--threads <nums>] [--ranks <nums>] [--repetitions <num>]
+                      [--t-presim <ms>] [--t-sim <ms>] [--energy-meter <meter>] [--mpirun <command>] [--path <path>]
+'''
+
+#####################
+import csv
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+import numpy as np
+from ruamel.yaml import YAML
+
+parser = ArgumentParser()
+parser.add_argument("--scalings", type=float, nargs="+", default=[0.1])
+parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+parser.add_argument("--ranks", type=int, nargs="+", default=[1])
+parser.add_argument("--repetitions", type=int, default=3)
+parser.add_argument("--t-presim", type=float, default=500.0)
+parser.add_argument("--t-sim", type=float, default=1000.0)
+parser.add_argument("--energy-meter", type=str, default=None, help='energy meter ("rapl" or "fake")')
+parser.add_argument("--mpirun", type=str, default="mpirun -np {ranks}", help="command prefix for MPI runs")
+parser.add_argument("--path", type=str, default="data_scaling/")
+parser.add_argument("--worker", action="store_true", help="run a single configuration")
+parser.add_argument("--scaling", type=float, help="scaling factor of a single run (--worker)")
+parser.add_argument("--num-threads", type=int, help="number of threads of a single run (--worker)")
+parser.add_argument("--data-path", type=str, help="data path of a single run (--worker)")
+
+phases = ["init", "create", "connect", "presimulate", "simulate"]
+
+#####################
+
+def run_worker(args):
+    '''
+    Build and simulate the network for a single configuration and store benchmark.json.
+    '''
+    import nest
+
+    from microcircuit import network
+    from microcircuit.network_params import default_net_dict as net_dict
+    from microcircuit.sim_params import default_sim_dict as sim_dict
+    from microcircuit.stimulus_params import default_stim_dict as stim_dict
+
+    net_dict["N_scaling"] = args.scaling
+    net_dict["K_scaling"] = args.scaling
+    sim_dict.update(
+        {
+            "data_path": args.data_path,
+            "local_num_threads": args.num_threads,
+            "t_presim": args.t_presim,
+            "t_sim": args.t_sim,
+            "energy_meter": args.energy_meter,
+            "print_time": False,
+            "store_metadata": False,
+        }
+    )
+
+    net = network.Network(sim_dict, net_dict, stim_dict)
+    net.create()
+    net.connect()
+    net.presimulate()
+    net.simulate(sim_dict["t_sim"])
+    net.store_benchmark()
+
+    if nest.Rank() == 0:
+        if net.net_dict["bg_input_type"] == "poisson":
+            drive = "Poisson"
+        else:
+            drive = "DC"
+        with open(os.path.join(args.data_path, "drive.txt"), "w") as file:
+            file.write(drive)
+
+def configuration_name(scaling, threads, ranks):
+    '''
+    Name of the directory of a configuration.
+    '''
+    return "scaling-%.3f_threads-%d_ranks-%d" % (scaling, threads, ranks)
+
+def run_configuration(args, scaling, threads, ranks, repetition):
+    '''
+    Run a single configuration in a separate process and return its benchmark results.
+    '''
+    data_path = os.path.join(args.path, configuration_name(scaling, threads, ranks), "rep-%d" % repetition) + "/"
+    os.makedirs(data_path, exist_ok=True)
+
+    command = [sys.executable, os.path.abspath(__file__), "--worker",
+               "--scaling", str(scaling), "--num-threads", str(threads), "--data-path", data_path,
+               "--t-presim", str(args.t_presim), "--t-sim", str(args.t_sim)]
+    if args.energy_meter is not None:
+        command += ["--energy-meter", args.energy_meter]
+    if ranks > 1:
+        command = args.mpirun.format(ranks=ranks).split() + command
+
+    print("Running %s, repetition %d" % (configuration_name(scaling, threads, ranks), repetition))
+    with open(os.path.join(data_path, "output.log"), "w") as log:
+        subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, check=True)
+
+    with open(os.path.join(data_path, "benchmark.json"), "r") as file:
+        data = json.load(file)
+    with open(os.path.join(data_path, "drive.txt"), "r") as file:
+        data["drive"] = file.read()
+    return data
+
+def result_row(data, scaling, threads, ranks, repetition):
+    '''
+    Flatten the summary of a run to a row of the results table.
+    '''
+    summary = data["summary"]
+    row = {
+        "scaling": scaling,
+        "threads": threads,
+        "ranks": ranks,
+        "repetition": repetition,
+        "drive": data["drive"],
+        "rtf": summary["real_time_factor"],
+        "time_total": summary["time_total"],
+    }
+    for phase in phases:
+        row["time_" + phase] = summary["times"].get(phase)
+    row["memory_peak_max"] = max(memory["peak_max"] for memory in summary["memory"].values())
+    row["memory_peak_sum"] = max(memory["peak_sum"] for memory in summary["memory"].values())
+    row["synaptic_events_per_second"] = summary["synaptic_events_per_second"].get("simulate")
+    esyn = summary["energy_per_synaptic_event"].get("simulate")
+    row["esyn_muJ"] = esyn * 1e6 if esyn is not None else None
+    return row
+
+def system_info():
+    '''
+    Short characterization of the compute node (CPU model and number of sockets).
+    '''
+    model = platform.processor() or platform.machine()
+    sockets = set()
+    if os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo", "r") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key.strip() == "model name":
+                    model = value.strip()
+                elif key.strip() == "physical id":
+                    sockets.add(value.strip())
+    return "%d %s" % (max(len(sockets), 1), model)
+
+def yaml_entries(rows):
+    '''
+    One entry per configuration in the schema of performance_data_raw.yaml (medians across repetitions).
+    '''
+    today = datetime.date.today()
+    system = system_info()
+    entries = []
+    keys = sorted({(row["scaling"], row["threads"], row["ranks"]) for row in rows})
+    for scaling, threads, ranks in keys:
+        runs = [row for row in rows if (row["scaling"], row["threads"], row["ranks"]) == (scaling, threads, ranks)]
+        esyn = [row["esyn_muJ"] for row in runs if row["esyn_muJ"] is not None]
+        details = [
+            # only full-scale runs are comparable to the published data points
+            {"show_rtf_year": False},
+            {"show_esyn_rtf": False},
+            {"authoryear": "own measurement (%s)" % today.isoformat()},
+            {"bibentry": None},
+            {"year": today.year},
+            {"simulator": "nest_cpu"},
+            {"num_nodes": 1},
+            {"system": system},
+            {"process_node_nm": None},
+            {"rtf": float(np.median([row["rtf"] for row in runs]))},
+            {"esyn_muJ": float(np.median(esyn)) if len(esyn) > 0 else None},
+            {"drive": runs[0]["drive"]},
+            {"comment": "N_scaling = K_scaling = %g, %d MPI process(es) x %d thread(s), median of %d run(s)"
+                        % (scaling, ranks, threads, len(runs))},
+        ]
+        entries.append({"own%s-%s" % (today.strftime("%y%m%d"), configuration_name(scaling, threads, ranks)): details})
+    return entries
+
+def main(args):
+
+    rows = []
+    for scaling, threads, ranks in itertools.product(args.scalings, args.threads, args.ranks):
+        for repetition in range(args.repetitions):
+            data = run_configuration(args, scaling, threads, ranks, repetition)
+            rows.append(result_row(data, scaling, threads, ranks, repetition))
+
+    ## raw results table (one row per run)
+    with open(os.path.join(args.path, "results.csv"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    ## entries for performance_data_raw.yaml (one per configuration)
+    yaml = YAML()
+    yaml.default_flow_style = False
+    yaml.width = 4096
+    with open(os.path.join(args.path, "performance_data.yaml"), "w") as file:
+        yaml.dump(yaml_entries(rows), file)
+
+    print()
+    print("Results table    : %s" % os.path.join(args.path, "results.csv"))
+    print("YAML entries     : %s" % os.path.join(args.path, "performance_data.yaml"))
+
+#####################
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args)
+    else:
+        main(args)
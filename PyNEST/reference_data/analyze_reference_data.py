@@ -11,6 +11,7 @@
 Analyze reference data generated with generate_reference_data.py.
 '''
 
+import os
 import time
 import nest
 import numpy as np
@@ -36,43 +37,133 @@ from argparse import ArgumentParser
 parser = ArgumentParser()
 parser.add_argument("--seed", type=int, default=12345)
 parser.add_argument("--path", type=str, default="data")
-args = parser.parse_args()
-
-path = Path(args.path)
-sim_dict.update(
-        {
-            "data_path": str(path) + "/",
-            "rng_seed": args.seed,
-        }
-)
+parser.add_argument("--observables", type=str, nargs="+", default=None,
+                    help="observables to compute (rates, spike_cvs, spike_ccs; default: all)")
 
 #####################
 populations = net_dict['populations'] # list of populations
+observable_names = ['rates', 'spike_cvs', 'spike_ccs'] # observables of a single network realization
 #####################
 
-## set network scale
-scaling_factor = ref_dict['scaling_factor']
-net_dict["N_scaling"] = scaling_factor
-net_dict["K_scaling"] = scaling_factor
-
-random.seed( ref_dict['seed_subsampling'] )  # set seed for reproducibility
-
 ########################################################################################################################
 #                                   Define auxiliary functions to analyze and plot data                                #
 ########################################################################################################################
 
-def analyze_single_neuron_stats( observable_name: str, func: callable ) -> dict:
+def get_recording_interval( data_path: str ) -> tuple:
+    '''
+    Determine the time interval used for the analysis.
+    --------------------------------------------------
+    The interval starts after the pre-simulation (warm-up) phase, but not before 't_min'.
+    If the simulation stored the actual pre-simulation time (presim.json, e.g. for adaptive
+    pre-simulation), this time is used instead of 't_presim' in params.py.
+    --------------------------------------------------
+    Parameters:
+    - data_path : str
+        Path to the data of a single network realization.
+    --------------------------------------------------
+    Returns:
+    - recording_interval : tuple
+        Start and stop of the analysis interval (ms).
+    '''
+
+    t_presim = ref_dict['t_presim']
+    presim_file = Path( data_path ) / 'presim.json'
+    if presim_file.exists():
+        t_presim = helpers.json2dict( str( presim_file ) )['t_presim']
+
+    return ( max( ref_dict['t_min'], t_presim ), t_presim + ref_dict['t_sim'] )
+
+def load_spikes( data_path: str, nodes: dict ) -> dict:
+    '''
+    Load the spike data of all populations from the spike files.
+    ------------------------------------------------------------
+    Parameters:
+    - data_path : str
+        Path to the data of a single network realization.
+    - nodes : dict
+        Node IDs of neurons and spike recorders (nodes.json).
+    ------------------------------------------------------------
+    Returns:
+    - spikes : dict
+        Dictionary containing the spike data ('senders', 'times') for all populations.
+    '''
+
+    spikes = {}
+    for pop in populations:
+        spikes[pop] = helpers.load_spike_data( data_path, spike_label( nodes, pop ) ) # load spike data for population
+
+    return spikes
+
+def spike_label( nodes: dict, pop: str ) -> str:
+    '''
+    Label (file name root) of the spike files of a population.
+    '''
+    return 'spike_recorder-' + str( nodes['spike_recorder_%s' % pop][0] ) # label of spike recorder device
+
+def spike_loader( data_path: str, label: str ) -> callable:
+    '''
+    Function loading the spike data of a population on its first call (see compute_statistic()).
+    '''
+    loaded = []
+    def load():
+        if len( loaded ) == 0:
+            loaded.append( helpers.load_spike_data( data_path, label ) )
+        return loaded[0]
+    return load
+
+def compute_statistic( func: callable, pop: str, spikes: dict, neurons, recording_interval: tuple, *args,
+                       cache: helpers.StatisticsCache = None, fingerprints: dict = None ):
+    '''
+    Compute a spike statistic of a population, or reload it from the statistics cache.
+    -----------------------------------------------------------------------------------
+    Parameters:
+    - func : function
+        Statistic with the signature func( spikes, neurons, interval, *args ) (see helpers.py).
+    - pop : str
+        Population.
+    - spikes : dict
+        Spike data ('senders', 'times') for all populations, or functions loading it (see spike_loader()).
+    - neurons : list
+        IDs of the observed neurons.
+    - recording_interval : tuple
+        Start and stop of the analysis interval (ms).
+    - args :
+        Further arguments of func (e.g. the bin size).
+    - cache : helpers.StatisticsCache (optional)
+        Cache of statistics; if None, the statistic is always computed.
+    - fingerprints : dict (optional)
+        Fingerprints of the spike data of all populations (see helpers.spike_data_fingerprint()); required with cache.
+    -----------------------------------------------------------------------------------
+    Returns:
+    - statistic : array
+    '''
+
+    if cache is not None:
+        return cache.compute( func, fingerprints[pop], spikes[pop], neurons, recording_interval, *args )
+    pop_spikes = spikes[pop]() if callable( spikes[pop] ) else spikes[pop]
+    return func( pop_spikes, neurons, recording_interval, *args )
+
+def analyze_single_neuron_stats( observable_name: str, func: callable, data_path: str, nodes: dict, spikes: dict,
+                                 cache: helpers.StatisticsCache = None, fingerprints: dict = None ) -> dict:
     '''
     Analyze single neuron statistics such as time avaraged firing rates and ISI CVs.
     --------------------------------------------------------------------------------
     Parameters:
     - observable_name : str
         Name of the observable to be analyzed and stored.
-        Name will be used to store the observable as json file and used in further analysis.
+        Name will be used to store the observable as npz file and used in further analysis.
     - func : function
         Function to compute the single neuron statistic. Are part of the microcircuit package and can be find in helpers.py.
         - 'helpers.time_averaged_single_neuron_firing_rates': computes time averaged firing rates per neuron
         - 'helpers.single_neuron_isi_cvs': computes interval spike irregularity as count variance per neuron
+    - data_path : str
+        Path to the data of a single network realization.
+    - nodes : dict
+        Node IDs of neurons and spike recorders (nodes.json).
+    - spikes : dict
+        Spike data ('senders', 'times') for all populations, or functions loading it (see spike_loader()).
+    - cache, fingerprints :
+        Statistics cache and fingerprints of the spike data (optional, see compute_statistic()).
     --------------------------------------------------------------------------------
     Returns:
     - observable : dict
@@ -80,70 +171,118 @@ def analyze_single_neuron_stats( observable_name: str, func: callable ) -> dict:
     '''
 
     observable = {} # list of single neuron observable [pop][neuron]
-    recording_interval = ( max( ref_dict['t_min'], ref_dict['t_presim'] ), ref_dict['t_presim'] + ref_dict['t_sim'] )
-
-    
-    data_path = sim_dict['data_path']
-    nodes = helpers.json2dict( data_path + 'nodes.json' )
+    recording_interval = get_recording_interval( data_path )
 
     for pop in populations:
-        observable[pop] = {}
+        observable[pop] = list( compute_statistic( func, pop, spikes, nodes[pop], recording_interval,
+                                                   cache = cache, fingerprints = fingerprints ) ) # compute single neuron statistic
 
-        label = 'spike_recorder-' + str( nodes['spike_recorder_%s' % pop][0] ) # label of spike recorder device
-        spikes = helpers.load_spike_data( data_path, label ) # load spike data for population
-        observable[pop] = list( func( spikes, nodes[pop], recording_interval ) ) # compute single neuron statistic
-
-    # store observable as json file
-    helpers.dict2json( observable, sim_dict['data_path'] + f'{observable_name}.json' )
+    # store observable as binary (float32) npz file
+    helpers.dict2npz( observable, data_path + f'{observable_name}.npz' )
 
     return observable
 
-def analyze_pairwise_stats( observable_name: str, func: callable ) -> dict:
+def analyze_pairwise_stats( observable_name: str, func: callable, data_path: str, nodes: dict, spikes: dict,
+                            cache: helpers.StatisticsCache = None, fingerprints: dict = None ) -> dict:
     '''
     Analyze pairwise statistics such as spike count correlations.
     -------------------------------------------------------------
     Parameters:
     - observable_name : str
         Name of the observable to be analyzed and stored.
-        Name will be used to store the observable as json file and used in further analysis.
+        Name will be used to store the observable as npz file and used in further analysis.
     - func : function
         Function to compute the pairwise statistic. Are part of the microcircuit package and can be find in helpers.py.
         - 'helpers.pairwise_spike_count_correlations': computes pairwise spike count correlations for a subsample of neurons of each population.
+    - data_path : str
+        Path to the data of a single network realization.
+    - nodes : dict
+        Node IDs of neurons and spike recorders (nodes.json).
+    - spikes : dict
+        Spike data ('senders', 'times') for all populations, or functions loading it (see spike_loader()).
+    - cache, fingerprints :
+        Statistics cache and fingerprints of the spike data (optional, see compute_statistic()).
     -------------------------------------------------------------
     Returns:
     - observable : dict
         Dictionary containing the pairwise statistic for all populations.
     '''
 
-    recording_interval = ( max ( ref_dict['t_min'], ref_dict['t_presim'] ), ref_dict['t_presim'] + ref_dict['t_sim'] )
+    recording_interval = get_recording_interval( data_path )
 
-    #cc_binsize = 2. # in ms
     observable = {}  # list of pairwise spike count correlations [pop][correlation]
-    
-    data_path = sim_dict['data_path']
-    nodes = helpers.json2dict( data_path + 'nodes.json' )
-    
-    for pop in populations:
-        observable[pop] = {}
 
+    for pop in populations:
         pop_nodes = nodes[pop]  # list of neuron nodes for the population
-        label = 'spike_recorder-' + str( nodes['spike_recorder_%s' % pop][0] ) # label of spike recorder device
-        spikes = helpers.load_spike_data( data_path, label ) # load spike data for population
 
         # Generate random subsample of neuron nodes for the population for pairwise analysis (without replacement)
         selected_nodes = random.sample( pop_nodes, ref_dict['subsample_size'] ) # subsample of neuron nodes for the population
 
-        observable[pop] = list( func( spikes, selected_nodes, recording_interval, ref_dict['binsize'] ) ) # compute pairwise statistic
+        observable[pop] = list( compute_statistic( func, pop, spikes, selected_nodes, recording_interval, ref_dict['binsize'],
+                                                   cache = cache, fingerprints = fingerprints ) ) # compute pairwise statistic
 
-    helpers.dict2json( observable, sim_dict['data_path'] + f'{observable_name}.json' ) # store observable as json file
+    helpers.dict2npz( observable, data_path + f'{observable_name}.npz' ) # store observable as binary (float32) npz file
 
     return observable
 
+def analyze( data_path: str, spikes: dict = None, observables: list = None ):
+    '''
+    Analyze the data of a single network realization.
+    -------------------------------------------------
+    Computes and stores the time averaged firing rates, the ISI CVs and the pairwise spike count correlations.
+    The spike data is either passed in memory (fused generation and analysis, see generate_reference_data.py),
+    or loaded once from the spike files in 'data_path'.
+    With ref_dict['statistics_cache'], statistics of unchanged spike data, neurons, interval and bin size are
+    reloaded from the statistics cache (see helpers.StatisticsCache); spike files are then only loaded for
+    populations with statistics to be computed.
+    -------------------------------------------------
+    Parameters:
+    - data_path : str
+        Path to the data of a single network realization, containing nodes.json (and presim.json).
+    - spikes : dict (optional)
+        Spike data ('senders', 'times') for all populations. If None, the spike data is loaded from the spike files.
+    - observables : list (optional)
+        Observables to compute (see observable_names); if None, all observables are computed.
+    '''
+
+    random.seed( ref_dict['seed_subsampling'] )  # set seed for reproducibility
+
+    nodes = helpers.load_nodes( data_path + 'nodes.json' ) # node ID ranges, expanded on demand
+
+    cache = None
+    fingerprints = None
+    if ref_dict['statistics_cache'] is not None:
+        cache = helpers.StatisticsCache( os.path.expanduser( ref_dict['statistics_cache'] ), ref_dict['statistics_cache_max_size'] )
+        if spikes is None:
+            fingerprints = { pop: helpers.spike_data_fingerprint( path = data_path, label = spike_label( nodes, pop ) ) for pop in populations }
+        else:
+            fingerprints = { pop: helpers.spike_data_fingerprint( spikes = spikes[pop] ) for pop in populations }
+
+    if spikes is None:
+        ## spike data of each population is loaded on first use (i.e., not at all if all its statistics are cached)
+        spikes = { pop: spike_loader( data_path, spike_label( nodes, pop ) ) for pop in populations }
+
+    if observables is None:
+        observables = observable_names
+    unknown = set( observables ) - set( observable_names )
+    if len( unknown ) > 0:
+        raise ValueError( f'Unknown observable(s) {sorted( unknown )}, valid options are {observable_names}.' )
+
+    kwargs = { 'cache': cache, 'fingerprints': fingerprints }
+    if 'rates' in observables:
+        analyze_single_neuron_stats( 'rates', helpers.time_averaged_single_neuron_firing_rates, data_path, nodes, spikes, **kwargs ) # compute and store time averaged firing rates
+    if 'spike_cvs' in observables:
+        analyze_single_neuron_stats( 'spike_cvs', helpers.single_neuron_isi_cvs, data_path, nodes, spikes, **kwargs ) # compute and store single neuron ISI CVs
+    if 'spike_ccs' in observables:
+        analyze_pairwise_stats( 'spike_ccs', helpers.pairwise_spike_count_correlations, data_path, nodes, spikes, **kwargs ) # compute and store pairwise spike count correlations
+
+    if cache is not None:
+        print( f'Statistics cache: {cache.hits} reloaded, {cache.misses} computed' )
+
 def main():
 
-    analyze_single_neuron_stats( 'rates', helpers.time_averaged_single_neuron_firing_rates ) # compute and store time averaged firing rates
-    analyze_single_neuron_stats( 'spike_cvs', helpers.single_neuron_isi_cvs ) # compute and store single neuron ISI CVs
-    analyze_pairwise_stats( 'spike_ccs', helpers.pairwise_spike_count_correlations ) # compute and store pairwise spike count correlations
+    args = parser.parse_args()
+    analyze( str( Path( args.path ) ) + "/", observables = args.observables )
 
     ## current memory consumption of the python process (in MB)
     import psutil
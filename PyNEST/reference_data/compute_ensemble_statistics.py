@@ -13,6 +13,8 @@ Compute spike statistics across the ensemble of network realizations (RNG seeds)
 from the single-realization analysis performed with analyze_reference_data.py.
 '''
 
+import hashlib
+import os
 import time
 import nest
 import numpy as np
@@ -47,52 +49,121 @@ seeds = ref_dict['RNG_seeds'] # list of seeds
 
 sim_dict['data_path'] = ref_dict['data_path'] + '/data_T' + str( int( ref_dict['t_sim'] * 1.0e-3 ) ) + 's/'
 
+## persistent cache of KS distances between pairs of seeds (see compute_ks_distances())
+cache_file = sim_dict['data_path'] + 'ks_distances_cache.json'
+
 #######################################################
 # Define auxiliary functions to analyze and plot data #
 #######################################################
-def concatenate_data( observable_name: str ) -> dict:
+def file_hash( filename: str ) -> str:
+    '''
+    SHA-256 hash of the content of a file.
+    '''
+
+    sha = hashlib.sha256()
+    with open( filename, 'rb' ) as file:
+        for chunk in iter( lambda: file.read( 2**20 ), b'' ):
+            sha.update( chunk )
+    return sha.hexdigest()
+
+def observable_hashes( observable_name: str ) -> list:
+    '''
+    Hashes of the files storing an observable for each seed (in the order of 'seeds').
+    '''
+
+    return [ file_hash( sim_dict['data_path'] + f'seed-{seed}/{observable_name}.npz' ) for seed in seeds ]
+
+def load_cache() -> dict:
+    '''
+    Load the cache of concatenated observables and KS distances (empty if it does not exist yet).
+    '''
+
+    if os.path.isfile( cache_file ):
+        return helpers.json2dict( cache_file )
+    return { 'concatenated': {}, 'ks_distances': {} }
+
+def concatenate_data( observable_name: str, hashes: list, cache: dict ) -> None:
     '''
     Concatenate data across different seeds.
     ----------------------------------------
+    The concatenated data is only rewritten if the seeds or the data of any seed changed.
+    ----------------------------------------
     Parameters:
     - observable_name: str 
         Name of the observable to concatenate (e.g., 'rates', 'spike_cvs', 'spike_ccs').
         Needs to match the filename used to store the data per seed in 'analyze_reference_data.py'.
-    -----------------------------------------
-    Returns:
-    - observable: dict
-        Dictionary containing the concatenated data across seeds.
+    - hashes: list
+        Hashes of the files storing the observable for each seed (see observable_hashes()).
+    - cache: dict
+        Cache of concatenated observables and KS distances (see load_cache()).
     '''
 
+    filename = sim_dict['data_path'] + f'{observable_name}.npz'
+    key = [ [ str( seed ), seed_hash ] for seed, seed_hash in zip( seeds, hashes ) ]
+    if cache['concatenated'].get( observable_name ) == key and os.path.isfile( filename ):
+        print( f'{observable_name}: concatenated data is up to date' )
+        return
+
     observable = {}
 
     for cseed, seed in enumerate( seeds ):
-        observable[cseed] = {}
         data_path = sim_dict['data_path'] + 'seed-%s/' % seed
 
-        data_per_seed = helpers.json2dict( f'{data_path}{observable_name}.json' ) # load data per seed as dictionary sorted by populations
-
-        observable[cseed] = data_per_seed # concatenate data
+        observable[cseed] = helpers.npz2dict( f'{data_path}{observable_name}.npz' ) # load data per seed as dictionary sorted by populations
     
-    helpers.dict2json( observable, sim_dict['data_path'] + f'{observable_name}.json' ) # store concatenated data as json file
-
-    return observable
+    helpers.dict2npz( observable, filename ) # store concatenated data as binary (float32) npz file
+    cache['concatenated'][observable_name] = key
 
-def compute_ks_distances( observable: dict, observable_name: str ) -> dict:
+def compute_ks_distances( observable_name: str, ks_name: str, hashes: list, cache: dict ) -> dict:
     '''
     Compute Kolmogorov-Smirnov distances between distributions of an observable across different seeds.
     ---------------------------------------------------------------------------------------------------
+    The distances are cached per pair of seeds, keyed by the seeds and the hashes of their observable files.
+    Only pairs that are not in the cache (e.g., pairs involving a newly added seed) are computed, and only
+    the data of the seeds in these pairs is loaded.
+    ---------------------------------------------------------------------------------------------------
     Parameters:
-    - observable: dict
-        Dictionary containing the concatenated data across seeds.
     - observable_name: str
-        Name of the observable to compute KS distances for (e.g., 'rate', 'spike_cvs', 'spike_ccs').
+        Name of the observable (e.g., 'rates', 'spike_cvs', 'spike_ccs').
+    - ks_name: str
+        Name of the file storing the KS distances (e.g., 'rate' for 'rate_ks_distances.json').
+    - hashes: list
+        Hashes of the files storing the observable for each seed (see observable_hashes()).
+    - cache: dict
+        Cache of concatenated observables and KS distances (see load_cache()).
     ---------------------------------------------------------------------------------------------------
     Returns:
     - observable_ks_distances: dict
         Dictionary containing the KS distances between distributions of the observable across different seeds.
     '''
 
+    distances = cache['ks_distances'].setdefault( observable_name, {} )
+    observable = {} # data of the seeds loaded so far
+
+    def load( cseed ):
+        if cseed not in observable:
+            data_per_seed = helpers.npz2dict( sim_dict['data_path'] + f'seed-{seeds[cseed]}/{observable_name}.npz' )
+            for pop in populations:
+                data_per_seed[pop] = np.array( data_per_seed[pop], dtype=float )
+                data_per_seed[pop] = np.delete( data_per_seed[pop], np.where( np.isnan( data_per_seed[pop] ) ) ) # clean data: remove NaNs
+            observable[cseed] = data_per_seed
+        return observable[cseed]
+
+    n_seeds = len( seeds )
+    n_computed = 0
+
+    pair_distances = {}
+    for i in range( n_seeds ):
+        for j in range( i+1, n_seeds ):
+            key = '%s:%s|%s:%s' % ( seeds[i], hashes[i], seeds[j], hashes[j] )
+            if key not in distances:
+                data_i, data_j = load( i ), load( j )
+                distances[key] = { pop: ks( data_i[pop], data_j[pop] )[0].tolist() for pop in populations }
+                n_computed += 1
+            pair_distances[i, j] = distances[key]
+
+    print( f'{observable_name}: computed {n_computed} of {n_seeds * ( n_seeds - 1 ) // 2} KS comparisons' )
+
     observable_ks_distances = {} # list of ks distances [pop][seed][ks_distance to other seed]
     for cpop, pop in enumerate( populations ):
         observable_ks_distances[pop] = {
@@ -100,30 +171,26 @@ def compute_ks_distances( observable: dict, observable_name: str ) -> dict:
             "list": []      # to compute mean and std
         }
 
-        for cseed, seed in enumerate( seeds ):
-            observable[cseed][pop] = np.delete( observable[cseed][pop], np.where( np.isnan( observable[cseed][pop] ) ) ) # clean data: remove NaNs
-
-        n_seeds = len( seeds ) 
-
         for i in range( n_seeds ):
             observable_ks_distances[pop]["seeds"][i] = {}
             for j in range( i+1, n_seeds ):
-                observable_ks_distance = ks( observable[i][pop], observable[j][pop] )[0].tolist()
+                observable_ks_distance = pair_distances[i, j][pop]
                 observable_ks_distances[pop]["seeds"][i][j] = observable_ks_distance
                 observable_ks_distances[pop]["list"].append( observable_ks_distance )
 
-    helpers.dict2json( observable_ks_distances, sim_dict['data_path'] + f'{observable_name}_ks_distances.json' ) # save ks distances as json file
+    helpers.dict2json( observable_ks_distances, sim_dict['data_path'] + f'{ks_name}_ks_distances.json' ) # save ks distances as json file
 
     return observable_ks_distances
 
 def main():
-    rates = concatenate_data( 'rates' )
-    spike_cvs = concatenate_data( 'spike_cvs' )
-    spike_ccs = concatenate_data( 'spike_ccs' )
-    
-    compute_ks_distances( rates, 'rate' )
-    compute_ks_distances( spike_cvs, 'spike_cvs' )
-    compute_ks_distances( spike_ccs, 'spike_ccs' )
+    cache = load_cache()
+
+    for observable_name, ks_name in [ ( 'rates', 'rate' ), ( 'spike_cvs', 'spike_cvs' ), ( 'spike_ccs', 'spike_ccs' ) ]:
+        hashes = observable_hashes( observable_name )
+        concatenate_data( observable_name, hashes, cache )
+        compute_ks_distances( observable_name, ks_name, hashes, cache )
+
+    helpers.dict2json( cache, cache_file ) # store cache of concatenated observables and KS distances
 
     ## current memory consumption of the python process (in MB)
     import psutil
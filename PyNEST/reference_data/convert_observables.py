@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# convert_observables.py
+#
+# This file is part of https://github.com/INM-6/microcircuit-PD14-model
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+'''
+Conversion of observables stored as json files (rates.json, spike_cvs.json, spike_ccs.json) by earlier
+versions of analyze_reference_data.py and compute_ensemble_statistics.py to the binary npz format
+(float32, compressed; see helpers.dict2npz()).
+
+All observable files in the given path and its subdirectories (e.g. data_T<sim_time_in_s>s/seed-<RNGseed>/)
+are converted. Existing npz files are not overwritten.
+
+Usage:
+    python convert_observables.py [--path <data_path>] [--remove-json]
+'''
+
+#####################
+import os
+from argparse import ArgumentParser
+
+from microcircuit import helpers
+
+parser = ArgumentParser()
+parser.add_argument("--path", type=str, default="data")
+parser.add_argument("--remove-json", action="store_true", help="remove the json files after conversion")
+
+## observables stored per seed (and concatenated across seeds)
+observable_names = ['rates', 'spike_cvs', 'spike_ccs']
+
+#####################
+
+def convert( json_file: str, remove_json: bool = False ) -> bool:
+    '''
+    Convert a single observable json file to npz; returns True if a file was written.
+    '''
+
+    npz_file = os.path.splitext( json_file )[0] + '.npz'
+    if os.path.isfile( npz_file ):
+        print( f'Skipping {json_file}: {npz_file} exists' )
+        return False
+
+    helpers.dict2npz( helpers.json2dict( json_file ), npz_file )
+    print( f'{json_file} ({os.path.getsize( json_file ) / 2**20:.1f} MB) -> {npz_file} ({os.path.getsize( npz_file ) / 2**20:.1f} MB)' )
+    if remove_json:
+        os.remove( json_file )
+    return True
+
+def main( args ):
+
+    num_converted = 0
+    for root, _, files in os.walk( args.path ):
+        for observable_name in observable_names:
+            if f'{observable_name}.json' in files:
+                num_converted += convert( os.path.join( root, f'{observable_name}.json' ), args.remove_json )
+
+    print( f'Converted {num_converted} file(s).' )
+
+#####################
+
+if __name__ == '__main__':
+    main( parser.parse_args() )
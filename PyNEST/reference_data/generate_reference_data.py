@@ -11,7 +11,6 @@ Generation of reference data for the microcircuit model.
 '''
 
 #####################
-import time
 import nest
 import numpy as np
 
@@ -26,6 +25,9 @@ from microcircuit.stimulus_params import default_stim_dict as stim_dict
 ## import analysis parameters
 from params import params as ref_dict
 
+## import analysis of the reference data (for fused generation and analysis)
+import analyze_reference_data
+
 from pathlib import Path
 from argparse import ArgumentParser
 
@@ -51,54 +53,46 @@ net_dict["K_scaling"] = scaling_factor
 
 ## set pre-simulation time to 0 and desired simulation time
 sim_dict["t_presim"] = ref_dict["t_presim"]
+sim_dict["presim_mode"] = ref_dict["presim_mode"]
 sim_dict["t_sim"] = ref_dict["t_sim"] # simulate for 10.0s
 
 ## set number of local number of threads
 sim_dict["local_num_threads"] = ref_dict['local_num_threads']
 
-def main():
+## set recording backend of the spike recorders
+sim_dict["spike_record_to"] = ref_dict['spike_record_to']
+if sim_dict["spike_record_to"] == "memory" and not ref_dict['fused_analysis']:
+    raise ValueError("spike_record_to = 'memory' requires fused_analysis = True (see params.py).")
 
-    ## start timer 
-    time_start = time.time()
+def main():
 
     ## create instance of the network
     net = network.Network(sim_dict, net_dict, stim_dict)
-    time_network = time.time()
 
     ## create all nodes (neurons, devices)
     net.create()
-    time_create = time.time()
 
     ## connect nework
     net.connect()
-    time_connect = time.time()
 
     ## pre-simulation (warm-up phase)
-    net.simulate(sim_dict["t_presim"])
-    time_presimulate = time.time()
+    net.presimulate()
 
     ## simulation
     net.simulate(sim_dict["t_sim"])
-    time_simulate = time.time()
 
-    ## current memory consumption of the python process (in MB)
-    import psutil
-    mem = psutil.Process().memory_info().rss / (1024 * 1024)
-    #TODO store benchmark data in store_metadata
-    #net.benchmark_data = {}
-    #net.benchmark_data['memory'] = mem
 
     #####################
-    ## plot spikes and firing rate distribution
-    print()
-    print('##########################################')
-    print()
-    observation_interval = np.array([sim_dict["t_presim"], sim_dict["t_presim"] + sim_dict["t_sim"]])
-    net.evaluate(observation_interval , observation_interval )
-    print()
-    print('Raster plot                  : see %s ' % (sim_dict['data_path'] + 'raster_plot.png') )
-    print('Distributions of firing rates: see %s ' % (sim_dict['data_path'] + 'box_plot.png'   ) )
-    time_evaluate = time.time()
+    ## plot spikes and firing rate distribution (requires spike files)
+    if sim_dict["spike_record_to"] == "ascii":
+        print()
+        print('##########################################')
+        print()
+        observation_interval = np.array([net.t_presim, net.t_presim + sim_dict["t_sim"]])
+        net.evaluate(observation_interval , observation_interval )
+        print()
+        print('Raster plot                  : see %s ' % (sim_dict['data_path'] + 'raster_plot.png') )
+        print('Distributions of firing rates: see %s ' % (sim_dict['data_path'] + 'box_plot.png'   ) )
 
     #####################
     ## print timers and memory consumption
@@ -106,22 +100,25 @@ def main():
     print()
     print('##########################################')
     print()
-    print('Times of Rank %d:' % nest.Rank())
-    print('    Total time:')
-    print('    Time to initialize  : %.3fs' % (time_network - time_start))
-    print('    Time to create      : %.3fs' % (time_create - time_network))
-    print('    Time to connect     : %.3fs' % (time_connect - time_create))
-    print('    Time to presimulate : %.3fs' % (time_presimulate - time_connect))
-    print('    Time to simulate    : %.3fs' % (time_simulate - time_presimulate))
-    print('    Time to evaluate    : %.3fs' % (time_evaluate - time_simulate))
-    print()
-    print("Memory consumption: %dMB" % mem)
+    net.print_times()
     print()
     print('##########################################')
     print()
 
     net.store_metadata()
-    
+
+    #####################
+    ## fused analysis of the spikes in this process (see analyze_reference_data.py)
+    if ref_dict['fused_analysis']:
+        if sim_dict["spike_record_to"] == "memory":
+            spikes = net.spike_data()
+        else:
+            spikes = None  ## loaded from the spike files
+        if nest.Rank() == 0:
+            if spikes is not None:
+                spikes = dict(zip(net_dict['populations'], spikes))
+            analyze_reference_data.analyze(sim_dict["data_path"], spikes)
+
 #####################
 
 if __name__== '__main__':
@@ -23,6 +23,10 @@ params = {
     'RNG_seeds': ['12345' + str(i) for i in range(0, 5)],
     # pre-simulation time (for network stabilization) in ms
     't_presim': 500.0,
+    # pre-simulation mode ('fixed' or 'adaptive', see sim_params.py);
+    # in adaptive mode, 't_presim' is replaced by the actual pre-simulation
+    # time stored in presim.json
+    'presim_mode': 'fixed',
     # simulation time in ms
     't_sim': 1e+3,    
     #'t_sim': 1.0e+4,
@@ -32,6 +36,13 @@ params = {
     'local_num_threads': 4,
     # data path
     'data_path': 'data',
+    # fused generation and analysis: generate_reference_data.py analyzes the
+    # spikes in the same process (see analyze_reference_data.analyze()),
+    # instead of a separate run of analyze_reference_data.py
+    'fused_analysis': False,
+    # recording backend of the spike recorders: 'ascii' (spike files) or
+    # 'memory' (no spike files; requires 'fused_analysis')
+    'spike_record_to': 'ascii',
     ##
     #########################
     # analysis parameters
@@ -45,6 +56,12 @@ params = {
     'subsample_size': 50, 
     # bin size for generation of spike-count signals (for CC analysis)
     'binsize': 2.0,
+    # on-disk cache of the spike statistics (see helpers.StatisticsCache), keyed by
+    # the spike data, neurons, analysis interval and bin size; None disables it
+    'statistics_cache': '~/.cache/microcircuit/statistics',
+    # upper bound of the size of the statistics cache in bytes (least recently used
+    # statistics are removed first)
+    'statistics_cache_max_size': 2 * 2**30,
     ##
     #########################
     # plotting parameters
@@ -299,10 +299,10 @@ def plot_data_dists( observable_name: str, x_label: str, observable_hist_mat: di
 def main():
     data_path = sim_dict['data_path']
 
-    # Read in the data from json files
-    rates = helpers.json2dict( f'{data_path}rates.json' )
-    spike_cvs = helpers.json2dict( f'{data_path}spike_cvs.json' )
-    spike_ccs = helpers.json2dict( f'{data_path}spike_ccs.json' )
+    # Read in the data from npz (observables) and json files (KS distances)
+    rates = helpers.npz2dict( f'{data_path}rates.npz' )
+    spike_cvs = helpers.npz2dict( f'{data_path}spike_cvs.npz' )
+    spike_ccs = helpers.npz2dict( f'{data_path}spike_ccs.npz' )
 
     rate_ks_distances = helpers.json2dict( f'{data_path}rate_ks_distances.json' )
     spike_cvs_ks_distances = helpers.json2dict( f'{data_path}spike_cvs_ks_distances.json' )
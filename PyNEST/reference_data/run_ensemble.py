@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+#
+# run_ensemble.py
+#
+# This file is part of https://github.com/INM-6/microcircuit-PD14-model
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+'''
+Local ensemble runner: generation and analysis of the reference data for all
+RNG seeds on a single machine.
+----------------------------------------------------------------------------
+
+Runs generate_reference_data.py and analyze_reference_data.py for each seed in
+``params['RNG_seeds']`` in separate worker processes, several seeds at a time:
+
+* each running seed is pinned to its own, disjoint set of
+  ``params['local_num_threads']`` cores,
+* seeds are only started while the sum of their estimated memory (see
+  ``Network.estimate_resources()``) stays below a fraction of the available
+  memory,
+* stages are tracked by their signatures as in the Snakefile (see
+  signatures.py): a stage is run if one of its outputs (``nodes.json``,
+  ``<observable>.npz``) is missing or older than its signature file or its
+  other inputs, i.e., if its parameters, code or inputs changed since its
+  last run. Completed stages are skipped, such that the runner resumes after
+  failures or interruptions; the outputs of failed stages are removed. Only
+  the observables whose analysis is pending are computed. With
+  ``params['fused_analysis']``, generation and analysis form a single stage.
+  The output of each stage is stored in ``<stage>.log`` in the seed
+  directory.
+
+Usage:
+    python run_ensemble.py [--seeds <seeds>] [--cores <cores>] [--memory-fraction <fraction>] [--max-jobs <num>]
+'''
+
+#####################
+import copy
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+import psutil
+
+## import analysis parameters
+from params import params as ref_dict
+import signatures
+
+parser = ArgumentParser()
+parser.add_argument("--seeds", type=str, nargs="+", default=ref_dict["RNG_seeds"], help="RNG seeds")
+parser.add_argument("--cores", type=int, nargs="+", default=None,
+                    help="cores to use (default: all cores available to this process)")
+parser.add_argument("--memory-fraction", type=float, default=0.8,
+                    help="fraction of the available memory that running seeds may use")
+parser.add_argument("--max-jobs", type=int, default=None, help="maximal number of concurrently running seeds")
+parser.add_argument("--poll-interval", type=float, default=1.0, help="interval for checking running seeds (s)")
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+#####################
+
+def ensemble_path():
+    '''
+    Data path of the ensemble (as in the Snakefile).
+    '''
+    return os.path.join(ref_dict["data_path"], "data_T%ds" % int(ref_dict["t_sim"] * 1.0e-3))
+
+def seed_path(seed):
+    '''
+    Data path of a seed (as in the Snakefile).
+    '''
+    return os.path.join(ensemble_path(), "seed-%s" % seed)
+
+def outdated(inputs, outputs):
+    '''
+    True if an output is missing or older than an input (as in Snakemake).
+    '''
+    if not all(os.path.isfile(output) for output in outputs):
+        return True
+    return max(os.path.getmtime(file) for file in inputs) > min(os.path.getmtime(file) for file in outputs)
+
+def pending_stages(seed, files):
+    '''
+    Stages of a seed that have to be run: list of (script, further arguments, output files).
+    ----------------------------------------------------------------------------------------
+    Parameters:
+    - seed : str
+        RNG seed.
+    - files : dict
+        Signature files (see signatures.update_all()).
+    '''
+    nodes = os.path.join(seed_path(seed), "nodes.json")
+    observables = {name: os.path.join(seed_path(seed), name + ".npz") for name in signatures.observable_names}
+
+    if ref_dict["fused_analysis"]:
+        outputs = [nodes] + list(observables.values())
+        if outdated([files[("generate", seed)]], outputs):
+            return [("generate_reference_data.py", [], outputs)]
+        return []
+
+    stages = []
+    generate = outdated([files[("generate", seed)]], [nodes])
+    if generate:
+        stages.append(("generate_reference_data.py", [], [nodes]))
+    ## the analysis of all observables is pending if the data is (re)generated
+    names = [name for name, output in observables.items()
+             if generate or outdated([files[(name, seed)], nodes], [output])]
+    if len(names) > 0:
+        stages.append(("analyze_reference_data.py", ["--observables"] + names, [observables[name] for name in names]))
+    return stages
+
+def estimate_memory():
+    '''
+    Estimated memory (in bytes) of a single seed, from the network parameters in params.py.
+    '''
+    from microcircuit import network
+    from microcircuit.network_params import default_net_dict
+    from microcircuit.sim_params import default_sim_dict
+    from microcircuit.stimulus_params import default_stim_dict
+
+    net_dict = copy.deepcopy(default_net_dict)
+    sim_dict = copy.deepcopy(default_sim_dict)
+    net_dict["N_scaling"] = ref_dict["scaling_factor"]
+    net_dict["K_scaling"] = ref_dict["scaling_factor"]
+    sim_dict.update(
+        {
+            "t_presim": ref_dict["t_presim"],
+            "t_sim": ref_dict["t_sim"],
+            "local_num_threads": ref_dict["local_num_threads"],
+            "dry_run": True,
+            "print_time": False,
+        }
+    )
+    net = network.Network(sim_dict, net_dict, default_stim_dict)
+    estimate = net.estimate_resources(num_ranks=1)
+    memory = estimate["memory_per_rank"]
+    if ref_dict["spike_record_to"] == "memory":
+        ## spikes held in memory by the spike recorders and by the fused analysis
+        ## (senders and times, 8 bytes each, about three copies)
+        memory += 3 * 16 * estimate["spikes_per_second"] * (ref_dict["t_presim"] + ref_dict["t_sim"]) * 1e-3
+    return memory
+
+def core_sets(cores, cores_per_seed):
+    '''
+    Partition of the cores into disjoint sets of ``cores_per_seed`` cores.
+    '''
+    cores = sorted(cores)
+    return [cores[i:i + cores_per_seed] for i in range(0, len(cores) - cores_per_seed + 1, cores_per_seed)]
+
+class SeedRun:
+    '''
+    Worker process running the pending stages of a seed one after another on a fixed set of cores.
+    '''
+
+    def __init__(self, seed, cores, files):
+        self.seed = seed
+        self.cores = cores
+        self.path = seed_path(seed)
+        self.stages = pending_stages(seed, files)
+        self.process = None
+        self.log = None
+        os.makedirs(self.path, exist_ok=True)
+        self.start_stage()
+
+    def start_stage(self):
+        script, arguments, _ = self.stages[0]
+        env = dict(os.environ, OMP_NUM_THREADS=str(len(self.cores)))
+        self.log = open(os.path.join(self.path, script.replace("_reference_data.py", ".log")), "w")
+        print("Seed %s: %s on cores %s" % (self.seed, " ".join([script] + arguments), self.cores))
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(script_dir, script), "--seed", str(self.seed), "--path", self.path]
+            + arguments,
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+            env=env,
+            preexec_fn=lambda: os.sched_setaffinity(0, self.cores),
+        )
+
+    def poll(self):
+        '''
+        Advances the seed to its next stage; returns "running", "done" or "failed".
+        '''
+        returncode = self.process.poll()
+        if returncode is None:
+            return "running"
+        self.log.close()
+        if returncode != 0:
+            print("Seed %s: %s failed (exit code %d), see %s" % (self.seed, self.stages[0][0], returncode, self.log.name))
+            ## incomplete outputs must not be mistaken for up-to-date ones (as in Snakemake)
+            for output in self.stages[0][2]:
+                if os.path.isfile(output):
+                    os.remove(output)
+            return "failed"
+
+        self.stages.pop(0)
+        if len(self.stages) == 0:
+            print("Seed %s: done" % self.seed)
+            return "done"
+        self.start_stage()
+        return "running"
+
+def main(args):
+
+    unknown = [seed for seed in args.seeds if seed not in ref_dict["RNG_seeds"]]
+    if len(unknown) > 0:
+        raise ValueError("Seed(s) %s are not in RNG_seeds of params.py." % ", ".join(unknown))
+
+    ## signatures of all stages; the signature files are only rewritten if the signature changed
+    files = signatures.update_all(ref_dict, ensemble_path())
+    seeds = [seed for seed in args.seeds if len(pending_stages(seed, files)) > 0]
+    print("%d of %d seed(s) pending" % (len(seeds), len(args.seeds)))
+    if len(seeds) == 0:
+        return
+
+    cores = args.cores if args.cores is not None else sorted(os.sched_getaffinity(0))
+    free_core_sets = core_sets(cores, ref_dict["local_num_threads"])
+    if len(free_core_sets) == 0:
+        raise ValueError("%d core(s) are not sufficient for local_num_threads = %d."
+                         % (len(cores), ref_dict["local_num_threads"]))
+
+    memory_per_seed = estimate_memory()
+    memory_budget = args.memory_fraction * psutil.virtual_memory().available
+    if memory_per_seed > memory_budget:
+        raise MemoryError("The estimated memory of a seed (%.1f GB) exceeds the memory budget (%.1f GB)."
+                          % (memory_per_seed / 2**30, memory_budget / 2**30))
+    max_jobs = min(len(free_core_sets), int(memory_budget // memory_per_seed))
+    if args.max_jobs is not None:
+        max_jobs = min(max_jobs, args.max_jobs)
+    print("Running up to %d seed(s) concurrently, %d core(s) and %.1f GB (estimated) each"
+          % (max_jobs, ref_dict["local_num_threads"], memory_per_seed / 2**30))
+
+    running = []
+    failed = []
+    while len(seeds) > 0 or len(running) > 0:
+        while len(seeds) > 0 and len(running) < max_jobs:
+            running.append(SeedRun(seeds.pop(0), free_core_sets.pop(0), files))
+
+        time.sleep(args.poll_interval)
+        for run in list(running):
+            status = run.poll()
+            if status != "running":
+                running.remove(run)
+                free_core_sets.append(run.cores)
+                if status == "failed":
+                    failed.append(run.seed)
+
+    if len(failed) > 0:
+        print("Failed seed(s): %s. Rerun to resume." % ", ".join(str(seed) for seed in failed))
+        sys.exit(1)
+    print("All seeds done. Compute the ensemble statistics with compute_ensemble_statistics.py.")
+
+#####################
+
+if __name__ == '__main__':
+    main(parser.parse_args())
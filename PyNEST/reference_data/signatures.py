@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# signatures.py
+#
+# This file is part of https://github.com/INM-6/microcircuit-PD14-model
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+'''
+Signatures of the stages of the reference data workflow (see Snakefile).
+------------------------------------------------------------------------
+
+The signature of a stage is a hash of
+* the parameters in params.py the stage depends on (``stage_params``),
+* the code of the stage, i.e., its script and the modules of the microcircuit package it uses (``stage_code``),
+* the RNG seed (for stages of a single network realization), and
+* the signatures of the stages producing its inputs.
+
+Each signature is written to a file ``<stage>.sig``, but only if it changed, such that the modification time of the
+file reflects the last relevant change. With these files as inputs of the workflow rules, a stage is rerun only if its
+parameters, code or inputs changed; e.g., changing 'binsize' reruns the analysis of the spike correlations (and the
+subsequent ensemble statistics and plots), but neither the simulations nor the analysis of the rates and ISI CVs.
+'''
+
+#####################
+import hashlib
+import importlib.util
+import json
+import os
+
+## parameters (keys of params.py) affecting the outputs of each stage
+stage_params = {
+    'generate': ['scaling_factor', 't_presim', 'presim_mode', 't_sim', 'local_num_threads', 'spike_record_to'],
+    'rates': ['t_presim', 't_min', 't_sim'],
+    'spike_cvs': ['t_presim', 't_min', 't_sim'],
+    'spike_ccs': ['t_presim', 't_min', 't_sim', 'seed_subsampling', 'subsample_size', 'binsize'],
+    'ensemble_statistics': ['RNG_seeds'],
+    'plots': ['RNG_seeds', 't_sim', 'rate_lim', 'cv_lim', 'cc_lim', 'rate_binsize', 'cv_binsize', 'cc_binsize',
+              'binsize', 'max_fig_width'],
+}
+
+## code of each stage: scripts in this directory and modules of the microcircuit package (None: all modules)
+stage_code = {
+    'generate': (['generate_reference_data.py'], None),
+    'rates': (['analyze_reference_data.py'], ['helpers.py']),
+    'spike_cvs': (['analyze_reference_data.py'], ['helpers.py']),
+    'spike_ccs': (['analyze_reference_data.py'], ['helpers.py']),
+    'ensemble_statistics': (['compute_ensemble_statistics.py'], ['helpers.py']),
+    'plots': (['plot_reference_analysis.py'], ['helpers.py']),
+}
+
+## observables of the analysis of a single network realization, one stage each (see analyze_reference_data.py)
+observable_names = ['rates', 'spike_cvs', 'spike_ccs']
+
+script_dir = os.path.dirname( os.path.abspath( __file__ ) )
+
+#####################
+
+def package_dir() -> str:
+    '''
+    Directory of the installed microcircuit package (located without importing it).
+    '''
+    spec = importlib.util.find_spec( 'microcircuit' )
+    return list( spec.submodule_search_locations )[0]
+
+def code_files( stage: str ) -> list:
+    '''
+    Files containing the code of a stage.
+    '''
+    scripts, modules = stage_code[stage]
+    files = [ os.path.join( script_dir, script ) for script in scripts ]
+    if modules is None:
+        modules = sorted( name for name in os.listdir( package_dir() ) if name.endswith( '.py' ) )
+    files += [ os.path.join( package_dir(), module ) for module in modules ]
+    return files
+
+def signature( stages, ref_dict: dict, seed: str = None, inputs: list = () ) -> str:
+    '''
+    Signature of a stage, or of several stages run in one step (e.g. the fused generation and analysis).
+    ----------------------------------------------------------------------------------------------------
+    Parameters:
+    - stages : str or list
+        Name(s) of the stage(s) (keys of stage_params).
+    - ref_dict : dict
+        Parameters (params.py).
+    - seed : str (optional)
+        RNG seed of the network realization.
+    - inputs : list (optional)
+        Signatures of the stages producing the inputs.
+    ----------------------------------------------------------------------------------------------------
+    Returns:
+    - signature : str
+        Hexadecimal SHA-256 digest.
+    '''
+
+    if isinstance( stages, str ):
+        stages = [stages]
+
+    digest = hashlib.sha256()
+    params = {}
+    files = []
+    for stage in stages:
+        params.update( { key: ref_dict[key] for key in stage_params[stage] } )
+        files += [ file for file in code_files( stage ) if file not in files ]
+    digest.update( json.dumps( { 'stages': stages, 'params': params, 'seed': seed, 'inputs': list( inputs ) },
+                               sort_keys = True, default = str ).encode() )
+    for file in files:
+        digest.update( os.path.basename( file ).encode() )
+        with open( file, 'rb' ) as f:
+            digest.update( f.read() )
+    return digest.hexdigest()
+
+def update( filename: str, signature: str ) -> bool:
+    '''
+    Writes a signature file if the signature changed; returns True if the file was written.
+    '''
+
+    if os.path.isfile( filename ):
+        with open( filename, 'r' ) as f:
+            if f.read().strip() == signature:
+                return False
+    os.makedirs( os.path.dirname( os.path.abspath( filename ) ), exist_ok = True )
+    with open( filename, 'w' ) as f:
+        f.write( signature + '\n' )
+    return True
+
+def update_all( ref_dict: dict, path: str ) -> dict:
+    '''
+    Computes the signatures of all stages and updates the signature files.
+    ----------------------------------------------------------------------
+    The files are stored in 'path' (data_T<sim_time_in_s>s/) for the ensemble statistics and plots, and in
+    'path'/seed-<RNGseed>/ for the generation and analysis of each network realization. With
+    ref_dict['fused_analysis'], the generation and analysis of a network realization form a single stage
+    ('generate').
+    ----------------------------------------------------------------------
+    Parameters:
+    - ref_dict : dict
+        Parameters (params.py).
+    - path : str
+        Data path of the ensemble.
+    ----------------------------------------------------------------------
+    Returns:
+    - files : dict
+        Signature files by stage (and seed for stages of single network realizations).
+    '''
+
+    files = {}
+    seed_signatures = []
+    for seed in ref_dict['RNG_seeds']:
+        seed_path = os.path.join( path, f'seed-{seed}' )
+        if ref_dict['fused_analysis']:
+            generate = signature( ['generate'] + observable_names, ref_dict, seed )
+            analysis = { name: generate for name in observable_names }
+        else:
+            generate = signature( 'generate', ref_dict, seed )
+            analysis = { name: signature( name, ref_dict, seed, [generate] ) for name in observable_names }
+        files[( 'generate', seed )] = os.path.join( seed_path, 'generate.sig' )
+        update( files[( 'generate', seed )], generate )
+        if not ref_dict['fused_analysis']:
+            for name in observable_names:
+                files[( name, seed )] = os.path.join( seed_path, f'{name}.sig' )
+                update( files[( name, seed )], analysis[name] )
+        seed_signatures += [ analysis[name] for name in observable_names ]
+
+    ensemble_statistics = signature( 'ensemble_statistics', ref_dict, inputs = seed_signatures )
+    files['ensemble_statistics'] = os.path.join( path, 'ensemble_statistics.sig' )
+    update( files['ensemble_statistics'], ensemble_statistics )
+
+    plots = signature( 'plots', ref_dict, inputs = [ensemble_statistics] )
+    files['plots'] = os.path.join( path, 'plots.sig' )
+    update( files['plots'], plots )
+
+    return files
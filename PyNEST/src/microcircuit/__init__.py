@@ -27,4 +27,12 @@ PyNEST implementation of the cortical microcircuit model of Potjans & Diesmann (
 
 __version__ = '1.1-dev.1'
 
-from microcircuit.network import Network
+
+def __getattr__(name):
+    ## import the network lazily, such that the analysis modules (e.g.
+    ## microcircuit.helpers) can be used without NEST
+    if name == "Network":
+        from microcircuit.network import Network
+
+        return Network
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -28,13 +28,33 @@ PyNEST implementation of the cortical microcircuit model of Potjans & Diesmann (
 
 Usage: microcircuit [options] run
        microcircuit [options] config
+       microcircuit [options] estimate [--scaling=<factor>] [--ranks=<num>] [--threads=<num>] [--calibration=<file>]
+       microcircuit [options] merge-traces <path> [--output=<file>]
+       microcircuit [options] tune [--scaling=<factor>]
+       microcircuit [options] cache list [--cache-dir=<dir>]
+       microcircuit [options] cache purge [--cache-dir=<dir>] [--max-size=<bytes>] [<key>...]
+       microcircuit [options] runs register [--registry=<file>] <data_path>...
+       microcircuit [options] runs [--registry=<file>] [--order=<column>] [--limit=<num>] [<condition>...]
 
 Options:
-    -v, --verbose       increase output
-    -h, --help          print this text
+    -v, --verbose           increase output
+    -h, --help              print this text
+    --scaling=<factor>      scaling factor of neuron numbers and indegrees (N_scaling = K_scaling)
+    --ranks=<num>           number of MPI processes [default: 1]
+    --threads=<num>         number of threads per MPI process
+    --calibration=<file>    json file with coefficients of the memory model (see resources.calibrate())
+    --output=<file>         merged trace file [default: <path>/trace.json]
+    --cache-dir=<dir>       directory of the result cache (see result_cache.py) [default: ~/.cache/microcircuit/results]
+    --max-size=<bytes>      purge least recently used entries until the result cache fits into this size
+    --registry=<file>       SQLite database of the run registry (see registry.py) [default: ~/.cache/microcircuit/runs.sqlite]
+    --order=<column>        column to sort the runs by, descending with a leading '-' [default: id]
+    --limit=<num>           maximal number of runs to list
+
+Conditions select runs by the columns of the run registry, e.g.,
+    microcircuit runs "K_scaling=0.5" "real_time_factor<2"
 '''
 import logging
-import time
+import os
 
 import pprint
 from pprint import pformat
@@ -43,6 +63,11 @@ from docopt import docopt       # type: ignore
 import nest
 import numpy as np
 
+from microcircuit import benchmark
+from microcircuit import registry
+from microcircuit import resources
+from microcircuit import result_cache
+from microcircuit import tuner
 from microcircuit.network import Network
 from microcircuit.network_params import default_net_dict as net_dict
 from microcircuit.sim_params import default_sim_dict as sim_dict
@@ -60,8 +85,6 @@ def run_example():
 
     sim_dict['data_path'] = 'data_scale_%.2f/' % scaling_factor
 
-    time_start = time.time()
-
     ###############################################################################
     # Initialize the network with simulation, network and stimulation parameters,
     # then create and connect all nodes, and finally simulate.
@@ -73,19 +96,10 @@ def run_example():
     # transient has passed.
 
     net = Network(sim_dict, net_dict, stim_dict)
-    time_network = time.time()
-
     net.create()
-    time_create = time.time()
-
     net.connect()
-    time_connect = time.time()
-
-    net.simulate(sim_dict["t_presim"])
-    time_presimulate = time.time()
-
+    net.presimulate()
     net.simulate(sim_dict["t_sim"])
-    time_simulate = time.time()
 
     ###############################################################################
     # Plot a spike raster of the simulated neurons and a box plot of the firing
@@ -96,27 +110,103 @@ def run_example():
     # initialization artifacts.
 
     raster_plot_interval = np.array([stim_dict["th_start"] - 100.0, stim_dict["th_start"] + 100.0])
-    firing_rates_interval = np.array([sim_dict["t_presim"], sim_dict["t_presim"] + sim_dict["t_sim"]])
+    firing_rates_interval = np.array([net.t_presim, net.t_presim + sim_dict["t_sim"]])
     net.evaluate(raster_plot_interval, firing_rates_interval)
-    time_evaluate = time.time()
 
     ###############################################################################
     # Summarize time measurements. Rank 0 usually takes longest because of the
     # data evaluation and print calls.
 
-    print(
-        "\nTimes of Rank {}:\n".format(nest.Rank())
-        + "  Total time:          {:.3f} s\n".format(time_evaluate - time_start)
-        + "  Time to initialize:  {:.3f} s\n".format(time_network - time_start)
-        + "  Time to create:      {:.3f} s\n".format(time_create - time_network)
-        + "  Time to connect:     {:.3f} s\n".format(time_connect - time_create)
-        + "  Time to presimulate: {:.3f} s\n".format(time_presimulate - time_connect)
-        + "  Time to simulate:    {:.3f} s\n".format(time_simulate - time_presimulate)
-        + "  Time to evaluate:    {:.3f} s\n".format(time_evaluate - time_simulate)
-    )
+    net.print_times()
 
     net.store_metadata()
-    
+
+def estimate(args):
+    '''Estimate resources of a dry run of the network.'''
+
+    if args['--scaling'] is not None:
+        net_dict["N_scaling"] = float(args['--scaling'])
+        net_dict["K_scaling"] = float(args['--scaling'])
+    if args['--threads'] is not None:
+        sim_dict["local_num_threads"] = int(args['--threads'])
+    sim_dict["dry_run"] = True
+
+    calibration = None
+    if args['--calibration'] is not None:
+        calibration = resources.load_calibration(args['--calibration'])
+
+    net = Network(sim_dict, net_dict, stim_dict)
+    resources.print_resources(
+        net.estimate_resources(num_ranks=int(args['--ranks']), calibration=calibration),
+        t_sim=sim_dict["t_presim"] + sim_dict["t_sim"],
+    )
+
+def merge_traces(args):
+    '''Merge the timelines of all MPI processes of a run.'''
+
+    filenames = benchmark.trace_filenames(args['<path>'])
+    if len(filenames) == 0:
+        raise SystemExit("No trace files found in %s (run with sim_dict['trace'] = True)." % args['<path>'])
+
+    output = args['--output']
+    if output == '<path>/trace.json':
+        output = os.path.join(args['<path>'], 'trace.json')
+    benchmark.merge_traces(filenames, output)
+    print("Merged %d trace(s) into %s" % (len(filenames), output))
+
+def tune(args):
+    '''Select the numbers of threads and MPI processes for this machine.'''
+
+    if args['--scaling'] is not None:
+        net_dict["N_scaling"] = float(args['--scaling'])
+        net_dict["K_scaling"] = float(args['--scaling'])
+
+    configuration = tuner.tune(sim_dict, net_dict, stim_dict)
+    print()
+    print("Candidates:")
+    for result in configuration['candidates']:
+        if result['rtf'] is not None:
+            rtf = "%.3f" % result['rtf']
+        elif 'error' in result:
+            rtf = "failed"
+        else:
+            rtf = "skipped (memory)"
+        print("  %d MPI process(es) x %d thread(s): RTF %s" % (result['num_ranks'], result['local_num_threads'], rtf))
+    print("Selected: %d MPI process(es) x %d thread(s) (RTF %.3f)" % (
+        configuration['num_ranks'], configuration['local_num_threads'], configuration['rtf']))
+    print("Use sim_dict['local_num_threads'] = 'auto' to apply it.")
+
+def cache(args):
+    '''List or purge the entries of the result cache.'''
+
+    cache = result_cache.ResultCache(os.path.expanduser(args['--cache-dir']))
+    if args['list']:
+        result_cache.print_entries(cache)
+
+    if args['purge']:
+        if args['--max-size'] is not None:
+            removed = cache.evict(int(float(args['--max-size'])))
+        else:
+            removed = cache.purge(args['<key>'] if len(args['<key>']) > 0 else None)
+        for key in removed:
+            print("Removed %s" % key)
+        print("Removed %d entr%s." % (len(removed), "y" if len(removed) == 1 else "ies"))
+
+def runs(args):
+    '''Register runs in or select runs from the run registry.'''
+
+    registry_file = os.path.expanduser(args['--registry'])
+    if args['register']:
+        for data_path in args['<data_path>']:
+            registry.register_directory(data_path, registry_file)
+            print("Registered %s" % data_path)
+        return
+
+    selected = registry.query(args['<condition>'], order_by=args['--order'], limit=args['--limit'],
+                              registry_file=registry_file)
+    registry.print_runs(selected)
+    print("%d run(s)" % len(selected))
+
 def main():
     'Start main CLI entry point.'
     args = docopt(__doc__)
@@ -129,6 +219,21 @@ def main():
     if args['run']:        
         run_example()
         
+    if args['estimate']:
+        estimate(args)
+
+    if args['merge-traces']:
+        merge_traces(args)
+
+    if args['tune']:
+        tune(args)
+
+    if args['cache']:
+        cache(args)
+
+    if args['runs']:
+        runs(args)
+
     if args['config']:
 
         print()
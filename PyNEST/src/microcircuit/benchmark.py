@@ -0,0 +1,760 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Benchmark
+------------------------------------
+
+Measurement of the wall-clock time of the simulation phases (initialization,
+creation, connection, presimulation, simulation, evaluation) and of the
+real-time factor of a single MPI process, breakdown of the simulation
+phases into the phases of the NEST simulation loop, and the number of
+synaptic events processed, which together with a measurement of the
+consumed energy yields the energy per synaptic event, and the peak and final
+memory (resident set size) of each phase.
+
+The phases and their steps (e.g., the connection of individual projections,
+``nest.Prepare()`` and the individual ``nest.Simulate()`` calls) are
+recorded as a timeline in the trace event format, which can be viewed with
+Perfetto (https://ui.perfetto.dev) or ``chrome://tracing``. Each thread of
+NEST has its own lane with the time it spent in the phases of the simulation
+loop during each ``nest.Simulate()`` call. The timelines of the MPI processes
+are merged into a single file with ``merge_traces()``.
+
+"""
+
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+import psutil
+
+# simulation phases in the order of their execution
+phases = ["init", "create", "connect", "presimulate", "simulate", "evaluate"]
+
+# timers of the NEST kernel covering the phases of the simulation loop; all
+# but time_simulate and time_communicate_prepare are only available if NEST
+# is built with -Dwith-detailed-timers=ON
+kernel_timers = [
+    "time_simulate",
+    "time_update",
+    "time_gather_spike_data",
+    "time_collocate_spike_data",
+    "time_communicate_spike_data",
+    "time_deliver_spike_data",
+    "time_omp_synchronization_simulation",
+    "time_mpi_synchronization",
+    "time_communicate_prepare",
+    "time_gather_target_data",
+    "time_communicate_target_data",
+]
+
+# timers which NEST resets at the beginning of each nest.Simulate() call
+# (the remaining timers are cumulative)
+kernel_timers_reset_by_simulate = [
+    "time_simulate",
+    "time_update",
+    "time_gather_spike_data",
+    "time_collocate_spike_data",
+    "time_communicate_spike_data",
+    "time_deliver_spike_data",
+    "time_omp_synchronization_simulation",
+    "time_mpi_synchronization",
+]
+
+# thread ID of the timeline lane of NEST thread 0 (the lanes of the Python
+# threads are numbered from 0)
+nest_thread_lane = 1000
+
+
+class MemoryTracker:
+    """Tracks the peak memory (resident set size) of the process in intervals.
+
+    On Linux, the high-water mark of the resident set size (``VmHWM`` in
+    ``/proc/self/status``) is reset at the start of each interval by writing
+    ``5`` to ``/proc/self/clear_refs``, such that the high-water mark at the
+    end of the interval is its exact peak, also while NEST holds the global
+    interpreter lock (e.g., in ``nest.Connect()`` or ``nest.Prepare()``).
+    The high-water mark reached before a reset is attributed to the
+    enclosing intervals.
+
+    Where the high-water mark cannot be reset, the high-water mark of the
+    operating system (``ru_maxrss``) only reveals the peak of an interval if
+    it exceeds all previous peaks. Otherwise, the peak is taken from a
+    background thread sampling the resident set size every ``interval``
+    seconds while intervals are tracked; short peaks between samples may be
+    missed, and no samples are taken while NEST holds the global interpreter
+    lock.
+
+    Parameters
+    ----------
+    interval
+        Sampling interval (in s); ``None`` disables the background sampling.
+
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.active = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.hwm_resettable = True
+        self.hwm_max = 0
+
+    def rss(self):
+        """Returns the current resident set size (in bytes)."""
+        return self.process.memory_info().rss
+
+    def maxrss(self):
+        """Returns the high-water mark of the resident set size (in bytes)."""
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is given in kilobytes on Linux and in bytes on macOS
+        maxrss = maxrss if sys.platform == "darwin" else maxrss * 1024
+        # ru_maxrss is reset together with VmHWM
+        return max(maxrss, self.hwm_max, self.hwm() or 0)
+
+    def hwm(self):
+        """Returns the high-water mark since the last reset (in bytes), or ``None`` if not available."""
+        try:
+            with open("/proc/self/status", "r") as file:
+                for line in file:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def reset_hwm(self):
+        """Resets the high-water mark to the current resident set size; returns False if not possible."""
+        try:
+            with open("/proc/self/clear_refs", "w") as file:
+                file.write("5")
+        except OSError:
+            return False
+        return True
+
+    def start(self):
+        """Starts tracking an interval and returns its state."""
+        rss = self.rss()
+        state = {"peak": rss, "maxrss": self.maxrss()}
+        with self.lock:
+            state["hwm"] = self.__reset_hwm()
+            self.active.append(state)
+            if self.interval is not None and (self.thread is None or not self.thread.is_alive()):
+                self.thread = threading.Thread(target=self.__sample, daemon=True)
+                self.thread.start()
+        return state
+
+    def stop(self, state):
+        """Stops tracking an interval.
+
+        Parameters
+        ----------
+        state
+            State returned by ``start()``.
+
+        Returns
+        -------
+        memory
+            Dictionary with the peak and the final resident set size of the
+            interval (in bytes).
+
+        """
+        rss = self.rss()
+        with self.lock:
+            self.active.remove(state)
+            peak = max(state["peak"], rss)
+            if state["hwm"]:
+                # high-water mark since the start of the interval or since
+                # the start of a nested interval, whose preceding high-water
+                # mark is included in state["peak"]
+                peak = max(peak, self.hwm())
+            else:
+                maxrss = self.maxrss()
+                if maxrss > state["maxrss"]:
+                    peak = max(peak, maxrss)
+            # the memory counters of the kernel are approximate; the peak of
+            # the process must not be below the peak of any interval
+            self.hwm_max = max(self.hwm_max, peak)
+        return {"peak": peak, "end": rss}
+
+    def __reset_hwm(self):
+        if not self.hwm_resettable:
+            return False
+        hwm = self.hwm()
+        if hwm is None:
+            self.hwm_resettable = False
+            return False
+        self.hwm_max = max(self.hwm_max, hwm)
+        for state in self.active:
+            state["peak"] = max(state["peak"], hwm)
+        self.hwm_resettable = self.reset_hwm()
+        return self.hwm_resettable
+
+    def __sample(self):
+        while True:
+            time.sleep(self.interval)
+            rss = self.rss()
+            with self.lock:
+                if len(self.active) == 0:
+                    return
+                for state in self.active:
+                    state["peak"] = max(state["peak"], rss)
+
+
+class Benchmark:
+    """Collects the wall-clock times and memory of the simulation phases.
+
+    Repeated measurements of the same phase are accumulated; for the memory,
+    the maximal peak and the last final resident set size are kept.
+
+    Parameters
+    ----------
+    memory_sampling_interval
+        Sampling interval of the memory tracker (in s, see
+        ``MemoryTracker``).
+
+    """
+
+    def __init__(self, memory_sampling_interval=0.05):
+        self.times = {}
+        self.t_model = 0.0
+        self.time_start = time.time()
+        self.memory_tracker = MemoryTracker(memory_sampling_interval)
+        self.memory_start = self.memory_tracker.start()
+        self.memory = {}
+        self.trace_events = []
+        self.thread_ids = {}
+        self.nest_threads = set()
+        self.kernel_times = {}
+        self.kernel_calls = []
+        self.synaptic_events = {}
+        self.energy = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measures the wall-clock time of a phase.
+
+        Parameters
+        ----------
+        name
+            Name of the phase.
+
+        """
+        time_start = time.time()
+        memory_start = self.memory_tracker.start()
+        try:
+            yield
+        finally:
+            time_stop = time.time()
+            self.record(name, time_stop - time_start)
+            self.record_memory(name, memory_start)
+            self.add_trace_event(name, "phase", time_start, time_stop)
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        """Records a step of a phase in the timeline.
+
+        Parameters
+        ----------
+        name
+            Name of the step.
+        category
+            Category of the step (e.g., "connect", "simulate").
+        args
+            Additional information shown with the step.
+
+        """
+        time_start = time.time()
+        try:
+            yield args
+        finally:
+            self.add_trace_event(name, category, time_start, time.time(), args)
+
+    def add_trace_event(self, name, category, time_start, time_stop, args=None, thread_id=None):
+        """Adds a complete event to the timeline.
+
+        Parameters
+        ----------
+        name
+            Name of the event.
+        category
+            Category of the event.
+        time_start
+            Start time (in s since the epoch).
+        time_stop
+            Stop time (in s since the epoch).
+        args
+            Dictionary of additional information (optional).
+        thread_id
+            Lane of the event; by default, the lane of the calling Python
+            thread.
+
+        """
+        if thread_id is None:
+            thread_id = self.thread_ids.setdefault(threading.get_ident(), len(self.thread_ids))
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": time_start * 1e6,
+            "dur": (time_stop - time_start) * 1e6,
+            "tid": thread_id,
+        }
+        if args:
+            event["args"] = args
+        self.trace_events.append(event)
+
+    def add_kernel_trace_events(self, name, category, time_start, time_stop, kernel_times, num_threads):
+        """Adds a ``nest.Simulate()`` call to the lanes of the NEST threads.
+
+        On the lane of each NEST thread, an event spanning the call contains
+        consecutive events with the times the thread spent in the phases of
+        the simulation loop (the kernel timers measured per thread, see
+        ``kernel_timers``). As the timers accumulate over all steps of the
+        call, these events show the share of each phase rather than when it
+        took place.
+
+        Parameters
+        ----------
+        name
+            Name of the call.
+        category
+            Category of the call.
+        time_start
+            Start time (in s since the epoch).
+        time_stop
+            Stop time (in s since the epoch).
+        kernel_times
+            Kernel timers of the call (see ``kernel_timer_deltas()``).
+        num_threads
+            Number of threads of the MPI process.
+
+        """
+        for thread in range(num_threads):
+            self.nest_threads.add(thread)
+            thread_id = nest_thread_lane + thread
+            self.add_trace_event(name, category, time_start, time_stop, thread_id=thread_id)
+            time_phase = time_start
+            for timer in kernel_timers:
+                value = kernel_times.get(timer)
+                if timer == "time_simulate" or not isinstance(value, list) or len(value) <= thread:
+                    continue
+                self.add_trace_event(timer[len("time_"):], category, time_phase, time_phase + value[thread],
+                                     thread_id=thread_id)
+                time_phase += value[thread]
+
+    def trace(self, rank, host):
+        """Returns the timeline of the MPI process in the trace event format.
+
+        Parameters
+        ----------
+        rank
+            Rank of the MPI process, used as process ID.
+        host
+            Name of the host.
+
+        """
+        events = [
+            {"name": "process_name", "ph": "M", "pid": rank, "args": {"name": "rank {} ({})".format(rank, host)}},
+            {"name": "process_sort_index", "ph": "M", "pid": rank, "args": {"sort_index": rank}},
+        ]
+        for thread_id in self.thread_ids.values():
+            events.append(
+                {"name": "thread_name", "ph": "M", "pid": rank, "tid": thread_id,
+                 "args": {"name": "main" if thread_id == 0 else "thread {}".format(thread_id)}}
+            )
+        for thread in sorted(self.nest_threads):
+            events.append(
+                {"name": "thread_name", "ph": "M", "pid": rank, "tid": nest_thread_lane + thread,
+                 "args": {"name": "NEST thread {}".format(thread)}}
+            )
+        events += [dict(event, pid=rank) for event in self.trace_events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def record(self, name, duration):
+        """Adds a measured wall-clock time to a phase.
+
+        Parameters
+        ----------
+        name
+            Name of the phase.
+        duration
+            Wall-clock time (in s).
+
+        """
+        self.times[name] = self.times.get(name, 0.0) + duration
+
+    def record_memory(self, name, memory_start):
+        """Adds the memory of a phase.
+
+        Parameters
+        ----------
+        name
+            Name of the phase.
+        memory_start
+            State of the memory tracker at the start of the phase (see
+            ``MemoryTracker.start()``).
+
+        """
+        memory = self.memory_tracker.stop(memory_start)
+        if name in self.memory:
+            memory["peak"] = max(memory["peak"], self.memory[name]["peak"])
+        self.memory[name] = memory
+
+    def add_model_time(self, t_sim):
+        """Adds to the model time covered by the simulation phase.
+
+        Parameters
+        ----------
+        t_sim
+            Simulated model time (in ms).
+
+        """
+        self.t_model += t_sim
+
+    def add_kernel_times(self, phase, t_sim, before, after):
+        """Adds the kernel timers of a ``nest.Simulate()`` call.
+
+        Parameters
+        ----------
+        phase
+            Name of the phase the call belongs to.
+        t_sim
+            Simulated model time of the call (in ms).
+        before
+            Kernel timers before the call (see ``kernel_timer_deltas()``).
+        after
+            Kernel timers after the call.
+
+        """
+        deltas = kernel_timer_deltas(before, after)
+        self.kernel_calls.append({"phase": phase, "t_sim": t_sim, "kernel_times": deltas})
+        for name, value in deltas.items():
+            self.kernel_times.setdefault(phase, {})
+            self.kernel_times[phase][name] = (
+                np.add(self.kernel_times[phase][name], value).tolist()
+                if name in self.kernel_times[phase]
+                else value
+            )
+
+    def add_synaptic_events(self, phase, events):
+        """Adds the synaptic events processed in a phase.
+
+        Parameters
+        ----------
+        phase
+            Name of the phase.
+        events
+            Dictionary of the numbers of synaptic events per type of input
+            (see ``synaptic_events()``).
+
+        """
+        self.synaptic_events.setdefault(phase, {})
+        for name, value in events.items():
+            self.synaptic_events[phase][name] = self.synaptic_events[phase].get(name, 0.0) + value
+
+    def add_energy(self, phase, energy):
+        """Adds the energy consumed in a phase.
+
+        The energy is attributed to the host of the MPI process; MPI
+        processes on the same host should report the same reading (see
+        ``summarize()``).
+
+        Parameters
+        ----------
+        phase
+            Name of the phase.
+        energy
+            Consumed energy (in J).
+
+        """
+        self.energy[phase] = self.energy.get(phase, 0.0) + energy
+
+    def real_time_factor(self):
+        """Returns the real-time factor of the simulation phase.
+
+        The real-time factor is the ratio of the wall-clock time of the
+        simulation phase and the model time it covers.
+        ``None`` is returned if nothing has been simulated yet.
+
+        """
+        if self.t_model == 0.0 or "simulate" not in self.times:
+            return None
+        return self.times["simulate"] / (self.t_model * 1e-3)
+
+    def to_dict(self):
+        """Returns the measurements as a dictionary.
+
+        Returns
+        -------
+        results
+            Dictionary containing the times of all phases (in s), the total
+            time since the start of the measurement (in s), the model time of
+            the simulation phase (in ms), the real-time factor, the kernel
+            timers accumulated per phase, the kernel timers of the
+            individual ``nest.Simulate()`` calls (in s; lists contain one
+            value per thread), the synaptic events per phase, the
+            consumed energy per phase (in J), and the peak and final
+            resident set size per phase and of the process (in bytes).
+
+        """
+        return {
+            "times": {name: self.times[name] for name in phases + sorted(self.times) if name in self.times},
+            "time_total": time.time() - self.time_start,
+            "t_model": self.t_model,
+            "real_time_factor": self.real_time_factor(),
+            "kernel_times": self.kernel_times,
+            "kernel_calls": self.kernel_calls,
+            "synaptic_events": self.synaptic_events,
+            "energy": self.energy,
+            "memory": {name: self.memory[name] for name in phases + sorted(self.memory) if name in self.memory},
+            "memory_peak": self.memory_tracker.maxrss(),
+        }
+
+
+def synaptic_events(
+    spike_counts,
+    num_neurons,
+    num_synapses,
+    t_sim,
+    ext_indegrees=None,
+    bg_rate=0.0,
+    num_th_synapses=None,
+    th_rate=0.0,
+    t_th=0.0,
+):
+    """Computes the number of synaptic events processed in a time interval.
+
+    Each spike of a neuron of population ``j`` is transmitted by all of its
+    outgoing recurrent synapses, i.e., by ``sum(num_synapses[:, j]) /
+    num_neurons[j]`` synapses on average. The external inputs are
+    accounted for by their expected number of events: ``K_ext * bg_rate``
+    per neuron and second for the Poisson background input, and ``th_rate``
+    per thalamic synapse and second while the thalamic input is active.
+
+    Parameters
+    ----------
+    spike_counts
+        Number of spikes per population in the interval (all MPI
+        processes).
+    num_neurons
+        Number of neurons per population.
+    num_synapses
+        Matrix of recurrent synapse numbers (first index: target, second
+        index: source).
+    t_sim
+        Duration of the interval (in ms).
+    ext_indegrees
+        External indegrees per population (only for Poisson background
+        input).
+    bg_rate
+        Rate of the Poisson background input (in spikes/s).
+    num_th_synapses
+        Number of thalamic synapses per population (only for thalamic
+        input).
+    th_rate
+        Rate of the thalamic neurons (in spikes/s).
+    t_th
+        Time during which the thalamic input is active within the interval
+        (in ms).
+
+    Returns
+    -------
+    events
+        Dictionary with the numbers of synaptic events of the recurrent,
+        Poisson background and thalamic input, and their total.
+
+    """
+    out_degrees = np.sum(num_synapses, axis=0) / np.asarray(num_neurons, dtype=float)
+    events = {"recurrent": float(np.sum(np.asarray(spike_counts, dtype=float) * out_degrees))}
+    events["poisson"] = 0.0
+    if ext_indegrees is not None:
+        events["poisson"] = float(np.sum(np.asarray(num_neurons) * np.asarray(ext_indegrees)) * bg_rate * t_sim * 1e-3)
+    events["thalamic"] = 0.0
+    if num_th_synapses is not None:
+        events["thalamic"] = float(np.sum(num_th_synapses) * th_rate * t_th * 1e-3)
+    events["total"] = events["recurrent"] + events["poisson"] + events["thalamic"]
+    return events
+
+
+def kernel_timer_deltas(before, after):
+    """Computes the time spent in the phases of the simulation loop by one call.
+
+    Timers which NEST resets at the beginning of each ``nest.Simulate()``
+    call (``kernel_timers_reset_by_simulate``) are taken as they are after the
+    call, the differences are taken for all other timers.
+
+    Parameters
+    ----------
+    before
+        Dictionary of kernel timers (in s) before the call. Timers measured
+        per thread are lists.
+    after
+        Dictionary of kernel timers (in s) after the call.
+
+    Returns
+    -------
+    deltas
+        Dictionary of the times (in s) spent in each phase of the call.
+
+    """
+    deltas = {}
+    for name, value in after.items():
+        if name in kernel_timers_reset_by_simulate or name not in before:
+            delta = np.asarray(value, dtype=float)
+        else:
+            delta = np.asarray(value, dtype=float) - np.asarray(before[name], dtype=float)
+        deltas[name] = delta.tolist()
+    return deltas
+
+
+def summarize(rank_results):
+    """Summarizes the measurements of all MPI processes.
+
+    The time of each phase is the maximum across MPI processes, as the
+    slowest process determines the duration of the phase.
+
+    Parameters
+    ----------
+    rank_results
+        List of dictionaries returned by ``Benchmark.to_dict()``, one per MPI
+        process.
+
+    Returns
+    -------
+    summary
+        Dictionary with the maximal times of all phases (in s), the model
+        time (in ms), the real-time factor, the maximal kernel timers
+        per phase across MPI processes and threads (in s), the synaptic
+        events per phase and per second of wall-clock time, and, if energy
+        readings are available, the energy per phase (in J) and per
+        synaptic event (in J), and the peak and final resident set size per
+        phase (in bytes), both maximal across and summed over MPI processes.
+
+    The synaptic events are derived from the spike counts of all MPI
+    processes and are hence taken from the first MPI process. Energy
+    readings are summed across hosts; for MPI processes on the same host,
+    the maximal reading is used.
+
+    """
+    times = {}
+    kernel_times = {}
+    for results in rank_results:
+        for name, value in results["times"].items():
+            times[name] = max(times.get(name, 0.0), value)
+        for phase, timers in results.get("kernel_times", {}).items():
+            kernel_times.setdefault(phase, {})
+            for name, value in timers.items():
+                kernel_times[phase][name] = max(kernel_times[phase].get(name, 0.0), float(np.max(value)))
+
+    t_model = rank_results[0]["t_model"]
+    real_time_factor = None
+    if t_model > 0.0 and "simulate" in times:
+        real_time_factor = times["simulate"] / (t_model * 1e-3)
+
+    synaptic_events = rank_results[0].get("synaptic_events", {})
+    synaptic_events_per_second = {
+        phase: events["total"] / times[phase]
+        for phase, events in synaptic_events.items()
+        if times.get(phase, 0.0) > 0.0
+    }
+
+    energy_per_host = {}
+    for results in rank_results:
+        host = energy_per_host.setdefault(results.get("host"), {})
+        for phase, value in results.get("energy", {}).items():
+            host[phase] = max(host.get(phase, 0.0), value)
+    energy = {}
+    for host in energy_per_host.values():
+        for phase, value in host.items():
+            energy[phase] = energy.get(phase, 0.0) + value
+    energy_per_synaptic_event = {
+        phase: value / synaptic_events[phase]["total"]
+        for phase, value in energy.items()
+        if phase in synaptic_events and synaptic_events[phase]["total"] > 0.0
+    }
+
+    memory = {}
+    for results in rank_results:
+        for phase, values in results.get("memory", {}).items():
+            memory.setdefault(phase, {"peak_max": 0, "peak_sum": 0, "end_max": 0, "end_sum": 0})
+            for name in ["peak", "end"]:
+                memory[phase][name + "_max"] = max(memory[phase][name + "_max"], values[name])
+                memory[phase][name + "_sum"] += values[name]
+
+    return {
+        "times": times,
+        "time_total": max(results["time_total"] for results in rank_results),
+        "t_model": t_model,
+        "real_time_factor": real_time_factor,
+        "kernel_times": kernel_times,
+        "synaptic_events": synaptic_events,
+        "synaptic_events_per_second": synaptic_events_per_second,
+        "energy": energy,
+        "energy_per_synaptic_event": energy_per_synaptic_event,
+        "memory": memory,
+    }
+
+
+def merge_traces(filenames, filename):
+    """Merges the timelines of several MPI processes into a single file.
+
+    As all timelines use the wall-clock time of their host, waiting times
+    between MPI processes become visible if the clocks of the hosts are
+    synchronized.
+
+    Parameters
+    ----------
+    filenames
+        List of trace files (e.g., ``trace-<rank>.json`` written by
+        ``Network.store_benchmark()``).
+    filename
+        Name of the merged trace file.
+
+    """
+    events = []
+    for name in sorted(filenames):
+        with open(name, "r") as file:
+            events += json.load(file)["traceEvents"]
+
+    # timestamps relative to the earliest event of all MPI processes
+    time_start = min((event["ts"] for event in events if "ts" in event), default=0.0)
+    for event in events:
+        if "ts" in event:
+            event["ts"] -= time_start
+
+    with open(filename, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def trace_filenames(path):
+    """Returns the trace files of all MPI processes in a data directory."""
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path) if name.startswith("trace-") and name.endswith(".json")
+    )
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# connectivity.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Connectivity
+---------------------------------------
+
+Connection plan for the recurrent connections between the neuronal
+populations. The plan is derived once from the (scaled) synapse numbers,
+weights and delays, contains only non-empty projections, and submits them to
+NEST.
+
+"""
+
+import contextlib
+from collections import namedtuple
+
+import nest
+import numpy as np
+
+Projection = namedtuple(
+    "Projection",
+    ["target", "source", "num_synapses", "weight_mean", "weight_std", "delay_mean", "delay_std"],
+)
+Projection.__doc__ = """Recurrent projection from population ``source`` to population ``target``.
+
+Weights are drawn from a normal distribution with ``weight_mean`` and
+``weight_std``, truncated to keep the sign of ``weight_mean``. Delays are drawn
+from a normal distribution with ``delay_mean`` and ``delay_std``, truncated at
+the simulation resolution; for ``delay_std == 0``, all delays equal
+``delay_mean``.
+"""
+
+
+class ConnectionPlan:
+    """Precomputed recurrent projections between neuronal populations.
+
+    Projections without synapses are dropped. The connection and synapse
+    specifications are created once and reused (see ``specs()``).
+
+    Parameters
+    ----------
+    num_synapses
+        Matrix of synapse numbers (first index: target, second index: source).
+    weight_matrix_mean
+        Matrix of mean weights (in pA).
+    weight_rel_std
+        Relative standard deviation of the weights.
+    delay_matrix_mean
+        Matrix of mean delays (in ms).
+    delay_rel_std
+        Relative standard deviation of the delays.
+
+    """
+
+    def __init__(self, num_synapses, weight_matrix_mean, weight_rel_std, delay_matrix_mean, delay_rel_std):
+        self.projections = []
+        for i, j in zip(*np.nonzero(np.asarray(num_synapses) > 0)):
+            self.projections.append(
+                Projection(
+                    target=int(i),
+                    source=int(j),
+                    num_synapses=int(num_synapses[i][j]),
+                    weight_mean=float(weight_matrix_mean[i][j]),
+                    weight_std=float(abs(weight_matrix_mean[i][j] * weight_rel_std)),
+                    delay_mean=float(delay_matrix_mean[i][j]),
+                    delay_std=float(delay_matrix_mean[i][j] * delay_rel_std),
+                )
+            )
+        self.__specs = None
+
+    def __len__(self):
+        return len(self.projections)
+
+    def __iter__(self):
+        return iter(self.projections)
+
+    @property
+    def total_num_synapses(self):
+        """Total number of synapses of all projections."""
+        return sum(projection.num_synapses for projection in self.projections)
+
+    def specs(self):
+        """Returns the connection and synapse specifications of all projections.
+
+        The specifications, including the NEST parameter objects for the
+        random weights and delays, are created once and reused for later
+        calls. Each projection has its own parameter objects; sharing them
+        across projections would alter the network realisation obtained for a
+        given RNG seed.
+
+        Returns
+        -------
+        specs
+            List of tuples (projection, conn_spec, syn_spec).
+
+        """
+        if self.__specs is None:
+            self.__specs = [
+                (projection, self.__conn_spec(projection), self.__syn_spec(projection))
+                for projection in self.projections
+            ]
+        return self.__specs
+
+    def connect(self, pops, span=None, names=None):
+        """Submits all projections to NEST.
+
+        The projections are connected one after another with
+        ``nest.Connect()``.
+
+        Parameters
+        ----------
+        pops
+            List of neuronal populations (NodeCollections).
+        span
+            Function returning a context manager that records a step in a
+            timeline, called with the name, the category and additional
+            information of the step (see ``benchmark.Benchmark.span()``;
+            optional).
+        names
+            Names of the populations, used to name the steps (optional;
+            the indices of the populations by default).
+
+        """
+        if span is None:
+            span = lambda name, category, **args: contextlib.nullcontext()
+        if names is None:
+            names = range(len(pops))
+
+        for projection, conn_spec, syn_spec in self.specs():
+            name = "{} -> {}".format(names[projection.source], names[projection.target])
+            with span(name, "connect", num_synapses=projection.num_synapses):
+                nest.Connect(pops[projection.source], pops[projection.target], conn_spec=conn_spec, syn_spec=syn_spec)
+
+    def __conn_spec(self, projection):
+        return {"rule": "fixed_total_number", "N": projection.num_synapses}
+
+    def __syn_spec(self, projection):
+        if projection.weight_mean < 0:
+            w_min = -np.inf
+            w_max = 0.0
+        else:
+            w_min = 0.0
+            w_max = np.inf
+
+        ## this case distinction would not have been necessary if nest.random.normal(mean,std) permitted std=0
+        if projection.delay_std == 0:
+            delay = projection.delay_mean
+        else:
+            delay = nest.math.redraw(
+                nest.random.normal(mean=projection.delay_mean, std=projection.delay_std),
+                min=nest.resolution - 0.5 * nest.resolution,
+                max=np.inf,
+            )
+            # resulting minimum delay is equal to resolution, see:
+            # https://nest-simulator.readthedocs.io/en/latest/nest_behavior
+            # /random_numbers.html#rounding-effects-when-randomizing-delays
+
+        return {
+            "synapse_model": "static_synapse",
+            "weight": nest.math.redraw(
+                nest.random.normal(mean=projection.weight_mean, std=projection.weight_std),
+                min=w_min,
+                max=w_max,
+            ),
+            "delay": delay,
+        }
+
+
+def export_connectome(pops, plan, filename):
+    """Writes the local recurrent connections to a compressed NumPy file.
+
+    For each projection of the connection plan, the sources, targets,
+    weights and delays of all connections stored on the local MPI process are
+    exported. Node IDs are stored relative to the first node ID of the
+    respective population, such that the connectome can be restored in a
+    network with shifted node IDs.
+
+    Parameters
+    ----------
+    pops
+        List of neuronal populations (NodeCollections).
+    plan
+        Connection plan (``ConnectionPlan``).
+    filename
+        Name of the ``.npz`` file.
+
+    """
+    first_ids = np.array([pop[0].global_id for pop in pops])
+    arrays = {
+        "num_neurons": np.array([len(pop) for pop in pops]),
+        "projections": np.array([(projection.target, projection.source) for projection in plan], dtype=int),
+    }
+    for projection in plan:
+        conns = nest.GetConnections(source=pops[projection.source], target=pops[projection.target])
+        key = "%d_%d" % (projection.target, projection.source)
+        if len(conns) > 0:
+            data = conns.get(["source", "target", "weight", "delay"])
+            arrays[key + "_sources"] = np.atleast_1d(data["source"]) - first_ids[projection.source]
+            arrays[key + "_targets"] = np.atleast_1d(data["target"]) - first_ids[projection.target]
+            arrays[key + "_weights"] = np.atleast_1d(data["weight"]).astype(float)
+            arrays[key + "_delays"] = np.atleast_1d(data["delay"]).astype(float)
+        else:
+            arrays[key + "_sources"] = np.array([], dtype=int)
+            arrays[key + "_targets"] = np.array([], dtype=int)
+            arrays[key + "_weights"] = np.array([], dtype=float)
+            arrays[key + "_delays"] = np.array([], dtype=float)
+
+    np.savez_compressed(filename, **arrays)
+
+
+def connect_connectome(pops, filenames):
+    """Restores recurrent connections from files written by ``export_connectome()``.
+
+    The connections of all files are created with ``one_to_one`` array
+    connects. As NEST only creates the connections whose targets are local,
+    each MPI process can read all files, and the number of MPI processes and
+    threads may differ from the exporting run.
+
+    Parameters
+    ----------
+    pops
+        List of neuronal populations (NodeCollections).
+    filenames
+        List of ``.npz`` files.
+
+    """
+    first_ids = np.array([pop[0].global_id for pop in pops])
+    num_neurons = np.array([len(pop) for pop in pops])
+    for filename in filenames:
+        with np.load(filename) as arrays:
+            if not np.array_equal(arrays["num_neurons"], num_neurons):
+                raise ValueError(
+                    "Population sizes of connectome {} ({}) do not match the network ({}).".format(
+                        filename, arrays["num_neurons"], num_neurons
+                    )
+                )
+            for target, source in arrays["projections"]:
+                key = "%d_%d" % (target, source)
+                if len(arrays[key + "_sources"]) == 0:
+                    continue
+                nest.Connect(
+                    (arrays[key + "_sources"] + first_ids[source]).astype(np.uint64),
+                    (arrays[key + "_targets"] + first_ids[target]).astype(np.uint64),
+                    conn_spec="one_to_one",
+                    syn_spec={
+                        "synapse_model": "static_synapse",
+                        "weight": arrays[key + "_weights"],
+                        "delay": arrays[key + "_delays"],
+                    },
+                )
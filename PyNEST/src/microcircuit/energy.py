@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# energy.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Energy Measurement
+---------------------------------------------
+
+Energy meters measuring the energy consumed during the simulation phases.
+A meter provides readings of its (cumulative) energy counters with
+``read()``; the energy consumed between two readings is obtained with
+``energy()``.
+
+Available meters:
+
+* ``RAPLEnergyMeter``: energy counters of the Running Average Power Limit
+  (RAPL) interface exposed by the Linux powercap framework in
+  ``/sys/class/powercap``. Covers CPU packages and DRAM of the local host, but
+  not other components (e.g., network, storage, cooling, power supply).
+* ``FakeEnergyMeter``: deterministic meter with a constant power, for tests
+  and machines without energy counters.
+
+"""
+
+import abc
+import glob
+import os
+
+
+class EnergyMeter(abc.ABC):
+    """Interface of energy meters."""
+
+    @abc.abstractmethod
+    def read(self):
+        """Returns a reading of the energy counters."""
+
+    @abc.abstractmethod
+    def energy(self, before, after):
+        """Returns the energy consumed between two readings (in J)."""
+
+
+class RAPLEnergyMeter(EnergyMeter):
+    """Energy meter based on the RAPL counters of the Linux powercap framework.
+
+    The energy of all RAPL zones whose names start with one of ``domains``
+    is summed. The counters wrap around at ``max_energy_range_uj``; a single
+    wraparound between two readings is corrected, so the time between two
+    readings has to be shorter than the wraparound period (typically minutes
+    to hours, depending on the power).
+
+    Note that reading ``energy_uj`` requires root privileges on many
+    systems.
+
+    Parameters
+    ----------
+    root
+        Root directory of the powercap framework.
+    domains
+        Prefixes of the names of the RAPL zones to include. The default
+        includes the CPU packages (``package-<n>``), which contain cores and
+        uncore, and the DRAM subzones.
+
+    """
+
+    def __init__(self, root="/sys/class/powercap", domains=("package", "dram")):
+        self.zones = []
+        for path in sorted(glob.glob(os.path.join(root, "intel-rapl:*"))):
+            name_file = os.path.join(path, "name")
+            if not os.path.isfile(name_file):
+                continue
+            with open(name_file, "r") as file:
+                name = file.read().strip()
+            if name.startswith(tuple(domains)):
+                with open(os.path.join(path, "max_energy_range_uj"), "r") as file:
+                    max_energy_range = int(file.read())
+                self.zones.append((path, name, max_energy_range))
+
+        if len(self.zones) == 0:
+            raise RuntimeError("No RAPL zones {} found in {}.".format(list(domains), root))
+
+    def read(self):
+        """Returns the energy counters of all zones (in µJ)."""
+        counters = []
+        for path, name, _ in self.zones:
+            try:
+                with open(os.path.join(path, "energy_uj"), "r") as file:
+                    counters.append(int(file.read()))
+            except PermissionError:
+                raise PermissionError(
+                    "Reading the RAPL counter of zone {} ({}) requires root privileges.".format(name, path)
+                )
+        return counters
+
+    def energy(self, before, after):
+        """Returns the energy consumed between two readings (in J)."""
+        energy = 0
+        for (_, _, max_energy_range), counter_before, counter_after in zip(self.zones, before, after):
+            delta = counter_after - counter_before
+            if delta < 0:
+                delta += max_energy_range + 1
+            energy += delta
+        return energy * 1e-6
+
+
+class FakeEnergyMeter(EnergyMeter):
+    """Energy meter with a constant power.
+
+    The meter does not depend on the wall-clock time, so that its energies
+    are reproducible: the readings are the times of a given clock, e.g., the
+    simulated model time, or otherwise a counter which advances by 1 s with
+    each reading.
+
+    Parameters
+    ----------
+    power
+        Power (in W).
+    clock
+        Function returning the time (in s), or ``None`` for the reading
+        counter.
+
+    """
+
+    def __init__(self, power=100.0, clock=None):
+        self.power = power
+        self.clock = clock
+        self.num_readings = 0
+
+    def read(self):
+        """Returns the time (in s)."""
+        if self.clock is not None:
+            return self.clock()
+        self.num_readings += 1
+        return float(self.num_readings)
+
+    def energy(self, before, after):
+        """Returns the energy consumed between two readings (in J)."""
+        return self.power * (after - before)
+
+
+def create_meter(name, clock=None):
+    """Creates an energy meter.
+
+    Parameters
+    ----------
+    name
+        Type of the energy meter, either "rapl" or "fake", or ``None``.
+    clock
+        Clock of the fake meter (see ``FakeEnergyMeter``).
+
+    Returns
+    -------
+    meter
+        Energy meter, or ``None`` if ``name`` is ``None``.
+
+    """
+    if name is None:
+        return None
+    elif name == "rapl":
+        return RAPLEnergyMeter()
+    elif name == "fake":
+        return FakeEnergyMeter(clock=clock)
+    else:
+        raise ValueError("energy_meter is incorrect. " + 'Valid options are None, "rapl" and "fake".')
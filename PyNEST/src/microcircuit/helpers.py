@@ -29,13 +29,21 @@ microcircuit.
 
 """
 
+import hashlib
+import inspect
 import os
+import sys
+import warnings
 
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Polygon
 import json
-import nest
+
+try:
+    import nest
+except ImportError:  ## the analysis functions do not require NEST
+    nest = None
 
 if "DISPLAY" not in os.environ:
     import matplotlib
@@ -245,6 +253,123 @@ def compute_rheo_base_current(V_th, E_L, C_m, tau_m):
     return I_rh
 
 
+def mpi_allreduce_sum(values):
+    """Sums an array of values across all MPI processes.
+
+    Recording devices only register events of neurons local to the MPI
+    process. Quantities derived from them on the fly need to be summed across
+    processes such that all processes take identical decisions.
+    Runs with a single MPI process do not require ``mpi4py``.
+
+    Parameters
+    ----------
+    values
+        Array of values of the local MPI process.
+
+    Returns
+    -------
+    total
+        Array of values summed across all MPI processes.
+
+    """
+    values = np.asarray(values, dtype=float)
+    if nest is None or nest.NumProcesses() == 1:
+        return values
+
+    from mpi4py import MPI
+
+    total = np.empty_like(values)
+    MPI.COMM_WORLD.Allreduce(values, total, op=MPI.SUM)
+    return total
+
+
+def mpi_gather(obj):
+    """Gathers a Python object of each MPI process on MPI process 0.
+
+    Runs with a single MPI process do not require ``mpi4py``.
+
+    Parameters
+    ----------
+    obj
+        Picklable object of the local MPI process.
+
+    Returns
+    -------
+    objs
+        List of the objects of all MPI processes on MPI process 0, ``None``
+        on all other MPI processes.
+
+    """
+    if nest is None or nest.NumProcesses() == 1:
+        return [obj]
+
+    from mpi4py import MPI
+
+    return MPI.COMM_WORLD.gather(obj, root=0)
+
+
+def mpi_bcast(obj):
+    """Broadcasts a Python object from MPI process 0 to all MPI processes.
+
+    Runs with a single MPI process do not require ``mpi4py``.
+
+    Parameters
+    ----------
+    obj
+        Picklable object on MPI process 0 (ignored on all other MPI
+        processes).
+
+    Returns
+    -------
+    obj
+        Object of MPI process 0.
+
+    """
+    if nest is None or nest.NumProcesses() == 1:
+        return obj
+
+    from mpi4py import MPI
+
+    return MPI.COMM_WORLD.bcast(obj, root=0)
+
+
+def presimulation_is_stationary(rates, counts, rtol, noise_z):
+    """Checks the stationarity criterion of the adaptive presimulation.
+
+    Two consecutive windows are considered stationary if, for all
+    populations, the absolute change of the population rate is smaller than
+    the larger of ``rtol`` times the mean rate of both windows and ``noise_z``
+    times the standard deviation of the rate difference expected from Poisson
+    counting noise.
+
+    Parameters
+    ----------
+    rates
+        Population rates (in spikes/s) of the two windows, shape (2, num_pops).
+    counts
+        Population spike counts of the two windows, shape (2, num_pops).
+    rtol
+        Relative tolerance of the rate change.
+    noise_z
+        Tolerated rate change in units of the counting noise.
+
+    Returns
+    -------
+    stationary
+        True if the criterion holds for all populations.
+
+    """
+    rates = np.asarray(rates, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+
+    change = np.abs(rates[1] - rates[0])
+    mean_rate = np.mean(rates, axis=0)
+    # a rate r estimated from c spikes has a Poisson error of r / sqrt(c)
+    noise = mean_rate * np.sqrt(2.0 / np.maximum(counts.mean(axis=0), 1.0))
+    tolerance = np.maximum(rtol * mean_rate, noise_z * noise)
+    return bool(np.all(change <= tolerance))
+
+
 def plot_raster(path, name, begin, end, N_scaling):
     """Creates a spike raster plot of the network activity.
 
@@ -552,6 +677,142 @@ def __load_spike_times(path, name, begin, end):
     return sd_names, node_ids, data
 
 
+def load_imbalance(path, name, num_vps, indegrees=None, candidate_num_vps=None, threshold=1.1):
+    """Analyzes the load imbalance across virtual processes.
+
+    Neurons are distributed round-robin across virtual processes (VPs): the
+    neuron with node ID ``n`` is local to VP ``n % num_vps``. Each VP records
+    the spikes of its local neurons to its own spike recorder file
+    (``<name>-<recorder id>-<vp>.dat``). From these files and the population
+    node ID ranges in ``population_nodeids.dat``, the numbers of neurons,
+    emitted spikes and incoming synapses per VP are determined. The number
+    of incoming synapses per VP is an estimate based on the mean indegree of
+    each population, and determines, together with the presynaptic spikes,
+    the work of the spike delivery; the emitted spikes determine the work of
+    collocating and communicating spikes.
+
+    The imbalance of a quantity is the ratio of its maximum and mean across
+    VPs; the slowest VP determines the duration of each simulation step.
+    For alternative numbers of VPs, the spike imbalance is predicted from
+    the measured spikes of each neuron.
+
+    Parameters
+    ----------
+    path
+        Path where the spike recorder files and ``population_nodeids.dat``
+        are stored.
+    name
+        Name of the spike recorder, typically ``spike_recorder``.
+    num_vps
+        Number of virtual processes of the run.
+    indegrees
+        Mean number of incoming recurrent synapses of a neuron per population
+        (optional).
+    candidate_num_vps
+        Alternative numbers of VPs for which the imbalance is predicted
+        (default: powers of 2 up to ``4 * num_vps``).
+    threshold
+        Imbalance up to which the load is considered balanced.
+
+    Returns
+    -------
+    report
+        Dictionary with the numbers of neurons, spikes and incoming synapses
+        per VP, their imbalance, the predicted spike imbalance per candidate
+        number of VPs, and recommendations.
+
+    """
+    _, _, node_ids = __gather_metadata(path, name)
+    node_ids = np.atleast_2d(node_ids)
+
+    # spikes per neuron, read from the files of each VP
+    first_id = node_ids[0, 0]
+    spikes_per_neuron = np.zeros(node_ids[-1, 1] - first_id + 1)
+    spikes_per_vp_files = np.zeros(num_vps)
+    for fn in sorted(os.listdir(path)):
+        if not (fn.startswith(name) and fn.endswith(".dat")):
+            continue
+        vp = int(fn[: -len(".dat")].split("-")[-1])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # files without spikes
+            senders = np.loadtxt(os.path.join(path, fn), skiprows=3, usecols=0, ndmin=1, dtype=int)
+        spikes_per_vp_files[vp] += len(senders)
+        np.add.at(spikes_per_neuron, senders - first_id, 1)
+
+    neuron_ids = np.arange(first_id, node_ids[-1, 1] + 1)
+    vps = neuron_ids % num_vps
+    neurons_per_vp = np.bincount(vps, minlength=num_vps)
+    spikes_per_vp = np.bincount(vps, weights=spikes_per_neuron, minlength=num_vps)
+    if not np.array_equal(spikes_per_vp, spikes_per_vp_files):
+        warnings.warn("Spikes per VP file do not match the round-robin distribution; is num_vps correct?")
+
+    def imbalance(values):
+        mean = np.mean(values)
+        return float(np.max(values) / mean) if mean > 0 else 1.0
+
+    report = {
+        "num_vps": num_vps,
+        "neurons_per_vp": neurons_per_vp,
+        "spikes_per_vp": spikes_per_vp,
+        "imbalance": {"neurons": imbalance(neurons_per_vp), "spikes": imbalance(spikes_per_vp)},
+    }
+
+    if indegrees is not None:
+        indegree_per_neuron = np.zeros(len(neuron_ids))
+        for (first, last), indegree in zip(node_ids, indegrees):
+            indegree_per_neuron[first - first_id : last - first_id + 1] = indegree
+        synapses_per_vp = np.bincount(vps, weights=indegree_per_neuron, minlength=num_vps)
+        report["synapses_per_vp"] = synapses_per_vp
+        report["imbalance"]["synapses"] = imbalance(synapses_per_vp)
+
+    # predicted spike imbalance for alternative numbers of VPs
+    if candidate_num_vps is None:
+        candidate_num_vps = [2**k for k in range(int(np.log2(4 * num_vps)) + 1)]
+    report["candidates"] = {
+        int(n): imbalance(np.bincount(neuron_ids % n, weights=spikes_per_neuron, minlength=n))
+        for n in candidate_num_vps
+    }
+
+    recommendations = []
+    for quantity, value in report["imbalance"].items():
+        if value > threshold:
+            recommendations.append(
+                "The {} per VP are imbalanced by a factor of {:.2f}; the slowest VP is {:.0f}% slower "
+                "than the average in the corresponding phases.".format(quantity, value, (value - 1.0) * 100)
+            )
+    balanced = [n for n, value in report["candidates"].items() if value <= threshold]
+    if len(balanced) > 0:
+        recommendations.append(
+            "Up to {} VPs, the spike load stays balanced (imbalance <= {}); choose the numbers of MPI processes "
+            "and threads such that their product does not exceed this value, and prefer threads over MPI "
+            "processes on a single node.".format(max(balanced), threshold)
+        )
+    else:
+        recommendations.append(
+            "None of the candidate numbers of VPs yields a balanced spike load; the network is too small to "
+            "be distributed evenly, use fewer VPs or a longer simulation to reduce fluctuations."
+        )
+    report["recommendations"] = recommendations
+    return report
+
+
+def print_load_imbalance(report):
+    """Prints a report of ``load_imbalance()``."""
+    print("Load across {} virtual processes (VPs):".format(report["num_vps"]))
+    print("  VP   neurons    spikes" + ("    synapses" if "synapses_per_vp" in report else ""))
+    for vp in range(report["num_vps"]):
+        line = "  {:<4} {:>7d} {:>9.0f}".format(vp, report["neurons_per_vp"][vp], report["spikes_per_vp"][vp])
+        if "synapses_per_vp" in report:
+            line += " {:>11.0f}".format(report["synapses_per_vp"][vp])
+        print(line)
+    print("Imbalance (max / mean): " + ", ".join(
+        "{}: {:.3f}".format(quantity, value) for quantity, value in report["imbalance"].items()))
+    print("Predicted spike imbalance: " + ", ".join(
+        "{} VPs: {:.3f}".format(n, value) for n, value in report["candidates"].items()))
+    for recommendation in report["recommendations"]:
+        print("  - " + recommendation)
+
+
 #################################################
 def get_data_file_list(path, label):
     """
@@ -676,7 +937,7 @@ def load_spike_data(path, label, time_interval=None, pop=None, skip_rows=3):
                     "Warning: time_interval must be a tuple or None. All spikes are loaded."
                 )
 
-        if type(pop) == nest.NodeCollection or type(pop) == list:
+        if (nest is not None and type(pop) == nest.NodeCollection) or type(pop) == list:
             spikes_subset = []
             for cn, nid in enumerate(pop):  ## loop over all neurons
                 print(
@@ -753,6 +1014,133 @@ def json2dict(filename):
     return dictionary
 
 
+##########################################################################
+def encode_node_ids(nodes):
+    """
+    Encodes node IDs compactly for storage in json files (see load_nodes()).
+
+    Contiguous node IDs (e.g. a population created by a single nest.Create() call) are encoded as
+    their first and last ID, other node IDs as a list.
+
+    Arguments:
+    ----------
+    nodes:    nest.NodeCollection or list
+              Node IDs (in ascending order).
+
+    Returns:
+    --------
+    encoded:  dict or list
+              Dictionary {"first": <first ID>, "last": <last ID>} or list of node IDs.
+
+    """
+
+    if len(nodes) == 0:
+        return []
+    if nest is not None and isinstance(nodes, nest.NodeCollection):
+        first, last = nodes[0].global_id, nodes[-1].global_id
+    else:
+        first, last = int(nodes[0]), int(nodes[-1])
+    if last - first + 1 == len(nodes):
+        return {"first": first, "last": last}
+    return list(nodes.tolist() if hasattr(nodes, "tolist") else nodes)
+
+
+##########################################################################
+def load_nodes(filename):
+    """
+    Reads node IDs (nodes.json) written by Network.store_metadata().
+
+    Ranges of node IDs (see encode_node_ids()) are returned as python range objects, which are expanded
+    only on demand (e.g. by numpy.asarray()). Lists of node IDs (written by earlier versions) are
+    returned as they are.
+
+    Arguments:
+    ----------
+    filename: str
+              Name of json file.
+
+    Returns:
+    --------
+    nodes:    dict
+              Dictionary of node IDs (range or list) per population or device.
+
+    """
+
+    nodes = json2dict(filename)
+    for name, ids in nodes.items():
+        if isinstance(ids, dict):
+            nodes[name] = range(ids["first"], ids["last"] + 1)
+
+    return nodes
+
+
+##########################################################################
+def dict2npz(dictionary, filename, dtype=np.float32):
+    """
+    Writes a (nested) python dictionary of arrays to a compressed binary npz file.
+
+    Nested dictionaries (e.g. [seed][population]) are stored with keys joined by "/".
+    All arrays are converted to the given data type.
+
+    Arguments:
+    ----------
+    dictionary: dict
+                Python dictionary of arrays or lists of numbers, or of such dictionaries.
+
+    filename:   str
+                Name of npz file.
+
+    dtype:      numpy.dtype (optional)
+                Data type of the stored arrays. The default is float32.
+
+    Returns:
+    --------
+    -
+
+    """
+
+    def flatten(dictionary, prefix=""):
+        arrays = {}
+        for key, value in dictionary.items():
+            if isinstance(value, dict):
+                arrays.update(flatten(value, prefix + str(key) + "/"))
+            else:
+                arrays[prefix + str(key)] = np.asarray(value, dtype=dtype)
+        return arrays
+
+    with open(filename, "wb") as file:
+        np.savez_compressed(file, **flatten(dictionary))
+
+
+##########################################################################
+def npz2dict(filename):
+    """
+    Read a (nested) python dictionary of arrays from an npz file written by dict2npz().
+
+    Arguments:
+    ----------
+    filename: str
+              Name of npz file.
+
+    Returns:
+    --------
+    dictionary: dict
+                Python dictionary of numpy arrays (keys are strings).
+
+    """
+
+    dictionary = {}
+    with np.load(filename) as data:
+        for name in data.files:
+            keys = name.split("/")
+            node = dictionary
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = data[name]
+
+    return dictionary
+
+
 #################################################
 def truncate_spike_data(spikes, interval):
     """
@@ -780,12 +1168,11 @@ def truncate_spike_data(spikes, interval):
     assert "times" in spikes
     assert len(spikes["senders"]) == len(spikes["times"])
 
-    ind1 = np.where(spikes["times"] >= interval[0])[0]
-    ind2 = np.where(spikes["times"][ind1] <= interval[1])[0]
+    ind = (spikes["times"] >= interval[0]) & (spikes["times"] <= interval[1])
 
     spikes_trunc = {}
-    spikes_trunc["senders"] = spikes["senders"][ind2]
-    spikes_trunc["times"] = spikes["times"][ind2]
+    spikes_trunc["senders"] = spikes["senders"][ind]
+    spikes_trunc["times"] = spikes["times"][ind]
 
     return spikes_trunc
 
@@ -971,6 +1358,204 @@ def pairwise_spike_count_correlations(spikes, pop, interval, binsize):
     return np.array(ccs)
 
 
+#################################################
+## default location and size (bytes) of the on-disk cache of spike statistics (see StatisticsCache)
+default_statistics_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "microcircuit", "statistics")
+default_statistics_cache_size = 2 * 2**30
+
+
+def spike_data_fingerprint(spikes=None, path=None, label=None):
+    """
+    Computes a fingerprint of spike data, either of spike files or of spikes in memory.
+
+    For spike files, the fingerprint is derived from the names, sizes and modification times of the files
+    (see get_data_file_list()), such that the files need not be read. For spikes in memory, it is derived
+    from the content of the arrays.
+
+    Parameters:
+    -----------
+    spikes:                dict (optional)
+                           Dictionary containing 'senders' IDs and spike 'times'.
+
+    path:                  str (optional)
+                           Path to folder containing spike files.
+
+    label:                 str (optional)
+                           Spike file label (file name root).
+
+    Returns:
+    --------
+    fingerprint:           str
+                           Hexadecimal SHA-256 digest.
+
+    """
+
+    digest = hashlib.sha256()
+    if spikes is not None:
+        for name in ["senders", "times"]:
+            values = np.ascontiguousarray(spikes[name])
+            digest.update("{}:{}:{}|".format(name, values.dtype.str, values.shape).encode())
+            digest.update(values.tobytes())
+    else:
+        for file_name in get_data_file_list(path, label):
+            status = os.stat(os.path.join(path, file_name))
+            digest.update("{}:{}:{}|".format(file_name, status.st_size, status.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+class StatisticsCache:
+    """
+    On-disk memoisation of spike statistics (e.g. time_averaged_single_neuron_firing_rates(),
+    single_neuron_isi_cvs(), pairwise_spike_count_correlations()).
+
+    Results are stored as npy files named by a key combining the function, the source code of the module defining
+    it (see code_version()), the fingerprint of the spike data (see spike_data_fingerprint()), the IDs of the
+    observed neurons, the observation interval and further arguments (e.g. the bin size). When the total size of the cache exceeds 'max_size', the least recently
+    used results are removed.
+
+    Parameters:
+    -----------
+    path:                  str
+                           Directory of the cache.
+
+    max_size:              int
+                           Upper bound of the total size of the cache (bytes).
+
+    """
+
+    def __init__(self, path=default_statistics_cache_dir, max_size=default_statistics_cache_size):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.code_versions = {}
+
+    def code_version(self, func):
+        """
+        Returns a hash of the source code of the module defining func, such that results of a statistic are
+        recomputed when the statistic or one of the functions it uses is changed.
+        """
+
+        module = inspect.getmodule(func)
+        if module not in self.code_versions:
+            try:
+                source = inspect.getsource(module)
+            except (OSError, TypeError):  ## source not available
+                source = repr(getattr(getattr(func, "__code__", None), "co_code", None))
+            self.code_versions[module] = hashlib.sha256(source.encode()).hexdigest()
+        return self.code_versions[module]
+
+    def key(self, func, fingerprint, pop, interval, *args):
+        """
+        Returns the key of a statistic (hexadecimal SHA-256 digest).
+        """
+
+        digest = hashlib.sha256()
+        digest.update("{}.{}|{}|{}|".format(func.__module__, func.__qualname__, self.code_version(func),
+                                            fingerprint).encode())
+        digest.update(np.asarray(list(pop), dtype=np.int64).tobytes())
+        digest.update("|{!r}|{!r}".format([float(t) for t in interval], [float(arg) for arg in args]).encode())
+        return digest.hexdigest()
+
+    def compute(self, func, fingerprint, spikes, pop, interval, *args):
+        """
+        Returns func(spikes, pop, interval, *args), from the cache if available.
+
+        Parameters:
+        -----------
+        func:                  function
+                               Statistic with the signature func(spikes, pop, interval, *args).
+
+        fingerprint:           str
+                               Fingerprint of the spike data (see spike_data_fingerprint()).
+
+        spikes:                dict or function
+                               Dictionary containing 'senders' IDs and spike 'times', or function returning it;
+                               the function is only called if the statistic is not cached, such that cached
+                               statistics do not require loading the spike data.
+
+        pop:                   numpy.ndarray
+                               Array of IDs of observed neurons.
+
+        interval:              tuple
+                               Tuple containing left and right bound of time interval (ms).
+
+        args:                  Further arguments of func (e.g. binsize).
+
+        Returns:
+        --------
+        result:                numpy.ndarray
+                               Result of func.
+
+        """
+
+        file_name = os.path.join(self.path, self.key(func, fingerprint, pop, interval, *args) + ".npy")
+        if os.path.isfile(file_name):
+            try:
+                result = np.load(file_name)
+            except (OSError, ValueError):  ## incomplete file, e.g. of an interrupted run
+                pass
+            else:
+                os.utime(file_name)  ## mark as recently used
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        if callable(spikes):
+            spikes = spikes()
+        result = np.asarray(func(spikes, pop, interval, *args), dtype=float)
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_file_name = file_name + ".{}.tmp".format(os.getpid())
+        with open(tmp_file_name, "wb") as file:
+            np.save(file, result)
+        os.replace(tmp_file_name, file_name)
+        self.evict()
+        return result
+
+    def size(self):
+        """
+        Returns the total size of the cache (bytes).
+        """
+
+        return sum(size for _, _, size in self.__entries())
+
+    def evict(self, max_size=None):
+        """
+        Removes the least recently used results until the cache fits into max_size (default: self.max_size).
+        """
+
+        max_size = self.max_size if max_size is None else max_size
+        entries = sorted(self.__entries())
+        size = sum(entry_size for _, _, entry_size in entries)
+        for _, file_name, entry_size in entries:
+            if size <= max_size:
+                break
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:  ## removed by a concurrent process
+                pass
+            size -= entry_size
+
+    def __entries(self):
+        """
+        Returns (last access time, file name, size) of all cached results.
+        """
+
+        if not os.path.isdir(self.path):
+            return []
+        entries = []
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(".npy"):
+                file_name = os.path.join(self.path, file_name)
+                try:
+                    status = os.stat(file_name)
+                except FileNotFoundError:
+                    continue
+                entries.append((status.st_mtime, file_name, status.st_size))
+        return entries
+
+
 #################################################
 def data_distribution(data, label, unit="", hist_bin=None):
     """
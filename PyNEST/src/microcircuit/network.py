@@ -29,13 +29,23 @@ build and simulate the network.
 
 """
 
+import glob
 import os
+import time
 import warnings
 
 import nest
 import numpy as np
 
+from microcircuit import benchmark
+from microcircuit import connectivity
+from microcircuit import energy
 from microcircuit import helpers
+from microcircuit import provenance
+from microcircuit import registry
+from microcircuit import resources
+from microcircuit import result_cache
+from microcircuit import tuner
 
 class Network:
     """Provides functions to setup NEST, to create and connect all nodes of
@@ -43,6 +53,14 @@ class Network:
 
     Instantiating a Network object derives dependent parameters and already
     initializes the NEST kernel.
+    With ``sim_dict['dry_run']`` set to ``True``, only the parameters are
+    derived; the NEST kernel is not initialized, no data directory is
+    created, and the network cannot be built. A dry run serves to estimate
+    the required resources (see ``estimate_resources()``).
+    With ``sim_dict['result_cache']`` set, the output files of a previous
+    run with identical parameters, NEST version and number of virtual
+    processes are restored from the result cache (see ``result_cache.py``);
+    the network is then neither built nor simulated.
 
     Parameters
     ---------
@@ -63,9 +81,18 @@ class Network:
         self.net_dict = net_dict
         self.stim_dict = stim_dict
 
+        # wall-clock times and memory of the simulation phases
+        self.benchmark = benchmark.Benchmark(sim_dict["memory_sampling_interval"])
+        self.kernel_timers = None
+        # spikes recorded per population and phase, summed across MPI processes
+        self.spike_counts = {}
+        # the fake meter integrates its power over the simulated model time (in s)
+        self.energy_meter = energy.create_meter(sim_dict["energy_meter"], clock=lambda: nest.biological_time * 1e-3)
+
         # data directory
         self.data_path = sim_dict["data_path"]
-        if nest.Rank() == 0:
+        self.dry_run = sim_dict["dry_run"]
+        if nest.Rank() == 0 and not self.dry_run:
             if os.path.isdir(self.data_path):
                 message = "  Directory already existed."
                 if self.sim_dict["overwrite_files"]:
@@ -75,11 +102,42 @@ class Network:
                 message = "  Directory has been created."
             print("Data will be written to: {}\n{}\n".format(self.data_path, message))
 
+        # presimulation time, set by presimulate()
+        self.t_presim = None
+        self.presim_rates = []
+
         # derive parameters based on input dictionaries
         self.__derive_parameters()
 
+        # number of threads per MPI process; MPI process 0 selects it for the
+        # number of MPI processes on its host, such that all MPI processes use
+        # the same number of threads
+        if sim_dict["local_num_threads"] == "auto":
+            hosts = helpers.mpi_gather(os.uname().nodename)
+            local_num_threads = None
+            if hosts is not None:
+                local_num_threads = tuner.local_num_threads(self, hosts.count(hosts[0]))
+            self.local_num_threads = helpers.mpi_bcast(local_num_threads)
+            if nest.Rank() == 0:
+                print("Using {} thread(s) per MPI process.".format(self.local_num_threads))
+        else:
+            self.local_num_threads = sim_dict["local_num_threads"]
+
         # initialize the NEST kernel
-        self.__setup_nest()
+        if not self.dry_run:
+            self.__setup_nest()
+
+        # look up the results of an identical run in the result cache
+        self.result_cache = None
+        self.cache_key = None
+        self.cached = False
+        if self.sim_dict["result_cache"] is not None and not self.dry_run:
+            self.__lookup_result_cache()
+
+        time_stop = time.time()
+        self.benchmark.record("init", time_stop - self.benchmark.time_start)
+        self.benchmark.record_memory("init", self.benchmark.memory_start)
+        self.benchmark.add_trace_event("init", "phase", self.benchmark.time_start, time_stop)
 
     def create(self):
         """Creates all network nodes.
@@ -87,15 +145,20 @@ class Network:
         Neuronal populations and recording and stimulation devices are created.
 
         """
-        self.__create_neuronal_populations()
-        if len(self.sim_dict["rec_dev"]) > 0:
-            self.__create_recording_devices()
-        if self.net_dict["bg_input_type"] == "poisson":
-            self.__create_poisson_bg_input()
-        if self.stim_dict["dc_transient"]:
-            self.__create_dc_stim_input()
-        if self.stim_dict["thalamic_input"]:
-            self.__create_thalamic_stim_input()
+        if self.dry_run:
+            raise RuntimeError("The network cannot be created in a dry run.")
+        if self.cached:
+            return
+        with self.benchmark.phase("create"):
+            self.__create_neuronal_populations()
+            if len(self.sim_dict["rec_dev"]) > 0:
+                self.__create_recording_devices()
+            if self.net_dict["bg_input_type"] == "poisson":
+                self.__create_poisson_bg_input()
+            if self.stim_dict["dc_transient"]:
+                self.__create_dc_stim_input()
+            if self.stim_dict["thalamic_input"]:
+                self.__create_thalamic_stim_input()
         
 
     def connect(self):
@@ -115,21 +178,91 @@ class Network:
         we induce it here explicitly by calling ``nest.Prepare()``.
 
         """
-        self.__connect_neuronal_populations()
+        if self.dry_run:
+            raise RuntimeError("The network cannot be connected in a dry run.")
+        if self.cached:
+            return
+
+        with self.benchmark.phase("connect"):
+            self.__connect_neuronal_populations()
+
+            if len(self.sim_dict["rec_dev"]) > 0:
+                self.__connect_recording_devices()
+            if self.net_dict["bg_input_type"] == "poisson":
+                self.__connect_poisson_bg_input()
+            if self.stim_dict["dc_transient"]:
+                self.__connect_dc_stim_input()
+            if self.stim_dict["thalamic_input"]:
+                self.__connect_thalamic_stim_input()
+
+            with self.benchmark.span("nest.Prepare", "connect"):
+                nest.Prepare()
+            with self.benchmark.span("nest.Cleanup", "connect"):
+                nest.Cleanup()
+
+    def estimate_resources(self, num_ranks=1, local_num_threads=None, calibration=None):
+        """Estimates the resources required to simulate the network.
+
+        The estimate is based on the numbers of neurons and synapses derived
+        from the parameters and does not require the network to be built
+        (see ``resources.estimate_resources()``). Firing rates are taken from
+        ``net_dict['full_mean_rates']``.
 
-        if len(self.sim_dict["rec_dev"]) > 0:
-            self.__connect_recording_devices()
-        if self.net_dict["bg_input_type"] == "poisson":
-            self.__connect_poisson_bg_input()
-        if self.stim_dict["dc_transient"]:
-            self.__connect_dc_stim_input()
-        if self.stim_dict["thalamic_input"]:
-            self.__connect_thalamic_stim_input()
+        Parameters
+        ----------
+        num_ranks
+            Number of MPI processes.
+        local_num_threads
+            Number of threads per MPI process (default: the number of
+            threads of the network).
+        calibration
+            Coefficients of the memory model (default:
+            ``resources.default_calibration``).
+
+        Returns
+        -------
+        estimate
+            Dictionary with the estimated memory per MPI process, recording
+            volume and synaptic events per simulated second.
 
-        nest.Prepare()
-        nest.Cleanup()
+        """
+        if local_num_threads is None:
+            local_num_threads = self.local_num_threads
+
+        # with distributed delays, the minimal delay equals the resolution
+        if self.net_dict["delay_rel_std"] > 0:
+            min_delay = self.sim_dict["sim_resolution"]
+        else:
+            min_delay = np.min(self.net_dict["delay_matrix_mean"])
+
+        # connections from or to devices, one per neuron and device type
+        num_devices = len(self.sim_dict["rec_dev"])
+        num_devices += self.net_dict["bg_input_type"] == "poisson"
+        num_devices += self.stim_dict["dc_transient"]
+        num_device_connections = num_devices * np.sum(self.num_neurons)
+        num_th_synapses = None
+        if self.stim_dict["thalamic_input"]:
+            num_device_connections += self.stim_dict["num_th_neurons"]
+            num_th_synapses = self.num_th_synapses
+
+        return resources.estimate_resources(
+            self.num_neurons,
+            self.num_synapses,
+            self.ext_indegrees,
+            self.net_dict["full_mean_rates"],
+            self.net_dict["bg_input_type"],
+            self.net_dict["bg_rate"],
+            min_delay,
+            num_device_connections=num_device_connections,
+            num_th_synapses=num_th_synapses,
+            num_ranks=num_ranks,
+            local_num_threads=local_num_threads,
+            calibration=calibration,
+        )
 
     def store_metadata(self):
+        if self.cached:
+            return
         if self.sim_dict['store_metadata']:
             print(
 f"""
@@ -148,24 +281,183 @@ Storing simulation metadata to {self.sim_dict['data_path']}
             helpers.dict2json(self.stim_dict, self.sim_dict['data_path'] + '/' + 'stim_dict.json')
             helpers.dict2json(self.net_dict, self.sim_dict['data_path'] + '/' + 'net_dict.json')
 
-            ### nodes (populations, readout neurons, recording/stimulus devices)
+            ### presimulation (actual warm-up time, relevant for analysis windows)
+            if self.t_presim is not None:
+                presim = {
+                    'presim_mode': self.sim_dict['presim_mode'],
+                    't_presim': self.t_presim,
+                    'window_rates': np.array(self.presim_rates),
+                }
+                helpers.dict2json(presim, self.sim_dict['data_path'] + '/' + 'presim.json')
+
+            ### benchmark (wall-clock times of the simulation phases, real-time factor)
+            benchmark_data = self.store_benchmark()
+
+            ### nodes (populations, readout neurons, recording/stimulus devices),
+            ### as ID ranges (see helpers.load_nodes())
             nodes = {}
             for i, pop in enumerate(self.pops):
                 pop_name = self.net_dict['populations'][i]
-                nodes[str(pop_name)] = pop.tolist()
+                nodes[str(pop_name)] = helpers.encode_node_ids(pop)
 
-            for i, spike_recorder in enumerate(self.spike_recorders):
-                pop_name = self.net_dict['populations'][i]
-                nodes[f'spike_recorder_{pop_name}'] = spike_recorder.tolist()
+            if "spike_recorder" in self.sim_dict["rec_dev"]:
+                for i, spike_recorder in enumerate(self.spike_recorders):
+                    pop_name = self.net_dict['populations'][i]
+                    nodes[f'spike_recorder_{pop_name}'] = helpers.encode_node_ids(spike_recorder)
 
             helpers.dict2json(nodes, self.sim_dict['data_path'] + '/' + 'nodes.json')
 
-            ### python packages and versions
-            os.system('pip freeze > requirements.txt; mv requirements.txt %s' % self.sim_dict['data_path'])
+            ### provenance (python packages and versions, NEST build, system, MPI layout)
+            provenance_data = provenance.collect(self.sim_dict['provenance_cache'])
+            if provenance_data is not None:
+                helpers.dict2json(provenance_data, self.sim_dict['data_path'] + '/' + 'provenance.json')
+                provenance.write_requirements(
+                    provenance_data['packages'], self.sim_dict['data_path'] + '/' + 'requirements.txt'
+                )
+
+            ### run registry (key parameters, times, memory and rates, see registry.py)
+            if benchmark_data is not None and self.sim_dict['run_registry'] is not None:
+                record = registry.run_record(
+                    self.data_path, self.sim_dict, self.net_dict, self.stim_dict, benchmark_data,
+                    rates=self.population_rates(), nest_version=nest.__version__,
+                )
+                registry.register(record, self.sim_dict['run_registry'])
+
+        ### output files of the run (see sim_dict['result_cache'])
+        self.store_result()
+
+    def store_result(self):
+        """Stores the output files of the run in the result cache.
+
+        Only runs consisting of the presimulation and a simulation of
+        ``sim_dict['t_sim']`` are stored, as later runs with the same key
+        restore the files instead of simulating. Called by
+        ``store_metadata()``; has no effect without
+        ``sim_dict['result_cache']``.
+
+        """
+        if self.result_cache is None or self.cached or nest.Rank() != 0:
+            return
+        if self.t_presim is None or self.benchmark.t_model != self.sim_dict["t_sim"]:
+            return
+        description = "N_scaling={} K_scaling={} t_sim={} ms rng_seed={}".format(
+            self.net_dict["N_scaling"], self.net_dict["K_scaling"], self.sim_dict["t_sim"], self.sim_dict["rng_seed"]
+        )
+        if self.result_cache.store(self.cache_key, self.data_path, description):
+            print("Results stored in the result cache (key {}).".format(self.cache_key[:16]))
+
+    def store_benchmark(self):
+        """Writes the benchmark results of all MPI processes to ``benchmark.json``.
+
+        The file contains the wall-clock times of the simulation phases, the
+        real-time factor, the kernel timers, the synaptic events, the energy
+        readings (see ``self.benchmark.add_energy()``) and the memory of each
+        MPI process, the numbers of neurons and connections of the network
+        (see ``resources.load_measurements()``), and a summary across MPI
+        processes including the synaptic events per second and the energy
+        per synaptic event (see ``benchmark.summarize()``). The synaptic
+        events are derived from the recorded spikes; without spike
+        recorders, they and the energy per synaptic event are omitted.
+
+        With ``sim_dict['trace']``, each MPI process additionally writes its
+        timeline to ``trace-<rank>.json`` (see ``benchmark.merge_traces()``).
+        Phases which are not completed when this function is called (e.g.,
+        ``evaluate()``) are not included.
+
+        Returns
+        -------
+        data
+            Content of ``benchmark.json`` on MPI process 0; ``None`` on all
+            other MPI processes.
+
+        """
+        results = self.benchmark.to_dict()
+        results["rank"] = nest.Rank()
+        results["host"] = os.uname().nodename
+        rank_results = helpers.mpi_gather(results)
+
+        if self.sim_dict["trace"]:
+            helpers.dict2json(
+                self.benchmark.trace(results["rank"], results["host"]),
+                os.path.join(self.data_path, "trace-{}.json".format(nest.Rank())),
+            )
+
+        if nest.Rank() == 0:
+            data = {
+                "num_ranks": nest.NumProcesses(),
+                "local_num_threads": nest.local_num_threads,
+                "total_num_virtual_procs": nest.total_num_virtual_procs,
+                "num_neurons": int(np.sum(self.num_neurons)),
+                "num_synapses": nest.num_connections,
+                "summary": benchmark.summarize(rank_results),
+                "ranks": rank_results,
+            }
+            helpers.dict2json(data, os.path.join(self.data_path, "benchmark.json"))
+            return data
+        return None
+
+    def population_rates(self):
+        """Returns the mean firing rate of each population during the simulation phase.
+
+        The rates are derived from the spike counts of the spike recorders
+        during the calls of ``simulate()``, without reading spike files.
+
+        Returns
+        -------
+        rates
+            Dictionary of the rates (in spikes/s) per population, or ``None``
+            without spike recorders or before ``simulate()``.
+
+        """
+        if (
+            "spike_recorder" not in self.sim_dict["rec_dev"]
+            or "simulate" not in self.spike_counts
+            or self.benchmark.t_model <= 0.0
+        ):
+            return None
+        rates = self.spike_counts["simulate"] / (self.num_neurons * self.benchmark.t_model * 1e-3)
+        return dict(zip(self.net_dict["populations"], rates.tolist()))
+
+    def print_times(self):
+        """Prints the wall-clock times and memory of the simulation phases of the local MPI process."""
+        results = self.benchmark.to_dict()
+        message = "\nTimes of Rank {}:\n".format(nest.Rank())
+        message += "  {:<20} {:.3f} s\n".format("Total time:", results["time_total"])
+        for name, value in results["times"].items():
+            label = "Time to {}:".format("initialize" if name == "init" else name)
+            message += "  {:<20} {:.3f} s\n".format(label, value)
+        if results["real_time_factor"] is not None:
+            message += "  {:<20} {:.3f}\n".format("Real-time factor:", results["real_time_factor"])
+        MB = 1024.0**2
+        message += "  {:<20} {:.0f} MB\n".format("Peak memory:", results["memory_peak"] / MB)
+        for name, memory in results["memory"].items():
+            message += "    {:<18} {:.0f} MB (peak), {:.0f} MB (end)\n".format(
+                name + ":", memory["peak"] / MB, memory["end"] / MB
+            )
+        if "simulate" in results["synaptic_events"]:
+            message += "  {:<20} {:.3e} per s\n".format(
+                "Synaptic events:", results["synaptic_events"]["simulate"]["total"] / results["times"]["simulate"]
+            )
+        print(message)
+
+    def export_connectome(self):
+        """Exports the recurrent connectome.
+
+        Sources, targets, weights and delays of all recurrent connections are
+        written per projection to compressed NumPy files
+        ``connectome-<rank>.npz`` in the data directory, one per MPI process.
+        A network with identical connectivity can be built by setting
+        ``sim_dict['connectome_path']`` to this directory.
+
+        """
+        if self.cached:
+            return
+        if nest.Rank() == 0:
+            print("Exporting recurrent connectome to {}.".format(self.data_path))
+
+        filename = os.path.join(self.data_path, "connectome-{}.npz".format(nest.Rank()))
+        connectivity.export_connectome(self.pops, self.connection_plan, filename)
 
-            ### store system metadata
-            #os.system('cd %s; gathermetadata system_metadata' % self.sim_dict['data_path'])
-            
     def simulate(self, t_sim):
         """Simulates the microcircuit.
 
@@ -175,10 +467,65 @@ Storing simulation metadata to {self.sim_dict['data_path']}
             Simulation time (in ms).
 
         """
+        if self.cached:
+            if t_sim != self.sim_dict["t_sim"]:
+                raise ValueError("Results restored from the result cache cover t_sim = {} ms only.".format(
+                    self.sim_dict["t_sim"]))
+            return
+
         if nest.Rank() == 0:
             print("Simulating {} ms.".format(t_sim))
 
-        nest.Simulate(t_sim)
+        with self.benchmark.phase("simulate"):
+            self.__simulate(t_sim, "simulate")
+        self.benchmark.add_model_time(t_sim)
+
+    def presimulate(self):
+        """Simulates the presimulation (warm-up) phase.
+
+        With ``sim_dict['presim_mode'] == 'fixed'``, the network is simulated
+        for ``sim_dict['t_presim']``.
+        With ``sim_dict['presim_mode'] == 'adaptive'``, the network is
+        simulated in windows of ``sim_dict['t_presim_window']`` until the
+        population rates are stationary or ``sim_dict['t_presim_max']`` is
+        reached (see ``helpers.presimulation_is_stationary()``).
+        The rates are obtained from the spike recorders, which therefore need
+        to be part of ``sim_dict['rec_dev']``.
+
+        The resulting presimulation time is stored in ``self.t_presim`` and
+        written to ``presim.json`` by ``store_metadata()``. Analysis windows
+        should start at this time.
+
+        Returns
+        -------
+        t_presim
+            Presimulation time (in ms).
+
+        """
+        if self.cached:
+            self.t_presim = self.sim_dict["t_presim"]
+            presim_file = os.path.join(self.data_path, "presim.json")
+            if os.path.isfile(presim_file):
+                presim = helpers.json2dict(presim_file)
+                self.t_presim = presim["t_presim"]
+                self.presim_rates = presim["window_rates"]
+            return self.t_presim
+
+        with self.benchmark.phase("presimulate"):
+            if self.sim_dict["presim_mode"] == "fixed":
+                if nest.Rank() == 0:
+                    print("Simulating {} ms.".format(self.sim_dict["t_presim"]))
+                self.__simulate(self.sim_dict["t_presim"], "presimulate")
+                self.t_presim = self.sim_dict["t_presim"]
+            elif self.sim_dict["presim_mode"] == "adaptive":
+                self.__presimulate_adaptive()
+            else:
+                raise ValueError("presim_mode is incorrect. " + 'Valid options are "fixed" and "adaptive".')
+
+        if nest.Rank() == 0:
+            print("Presimulation time: {} ms".format(self.t_presim))
+
+        return self.t_presim
 
     def evaluate(self, raster_plot_interval, firing_rates_interval):
         """Displays simulation results.
@@ -186,6 +533,8 @@ Storing simulation metadata to {self.sim_dict['data_path']}
         Creates a spike raster plot.
         Calculates the firing rate of each population and displays them as a
         box plot.
+        Reports the load imbalance across virtual processes (see
+        ``analyze_load_imbalance()``).
 
         Parameters
         ----------
@@ -201,19 +550,206 @@ Storing simulation metadata to {self.sim_dict['data_path']}
             None
 
         """
+        if self.sim_dict["spike_record_to"] != "ascii":
+            raise ValueError('evaluate() requires spike files, i.e., sim_dict["spike_record_to"] = "ascii".')
+        with self.benchmark.phase("evaluate"):
+            if nest.Rank() == 0:
+                print("Interval to plot spikes: {} ms".format(raster_plot_interval))
+                helpers.plot_raster(
+                    self.data_path,
+                    "spike_recorder",
+                    raster_plot_interval[0],
+                    raster_plot_interval[1],
+                    self.net_dict["N_scaling"],
+                )
+
+                print("Interval to compute firing rates: {} ms".format(firing_rates_interval))
+                helpers.firing_rates(self.data_path, "spike_recorder", firing_rates_interval[0], firing_rates_interval[1])
+                helpers.boxplot(self.data_path, self.net_dict["populations"])
+
+            self.analyze_load_imbalance()
+
+    def analyze_load_imbalance(self):
+        """Analyzes the load imbalance across virtual processes.
+
+        The numbers of neurons, recorded spikes and incoming synapses per
+        virtual process, their imbalance and recommendations for the number of
+        virtual processes are printed and written to
+        ``load_imbalance.json`` (see ``helpers.load_imbalance()``).
+        Requires spike recorders.
+
+        """
+        if nest.Rank() != 0 or "spike_recorder" not in self.sim_dict["rec_dev"]:
+            return
+        if self.sim_dict["spike_record_to"] != "ascii":
+            return
+
+        report = helpers.load_imbalance(
+            self.data_path,
+            "spike_recorder",
+            nest.total_num_virtual_procs,
+            indegrees=np.sum(self.num_synapses, axis=1) / self.num_neurons,
+        )
+        helpers.print_load_imbalance(report)
+        helpers.dict2json(report, os.path.join(self.data_path, "load_imbalance.json"))
+
+    def spike_data(self):
+        """Returns the spikes recorded in memory.
+
+        Requires spike recorders with ``sim_dict['spike_record_to'] ==
+        'memory'``. The spikes of all MPI processes are gathered on MPI
+        process 0. In contrast to ``helpers.load_spike_data()``, no spike
+        files are written and read.
+
+        Returns
+        -------
+        spikes
+            List with one dictionary per population containing the 'senders'
+            and the 'times' of the spikes, sorted by time, on MPI process 0;
+            ``None`` on all other MPI processes.
+
+        """
+        if "spike_recorder" not in self.sim_dict["rec_dev"] or self.sim_dict["spike_record_to"] != "memory":
+            raise ValueError('spike_data() requires spike recorders with sim_dict["spike_record_to"] = "memory".')
+
+        events = helpers.mpi_gather([(e["senders"], e["times"]) for e in self.spike_recorders.get("events")])
+        if events is None:
+            return None
+
+        spikes = []
+        for i in np.arange(self.num_pops):
+            senders = np.concatenate([rank_events[i][0] for rank_events in events])
+            times = np.concatenate([rank_events[i][1] for rank_events in events])
+            ind = np.argsort(times, kind="stable")
+            spikes.append({"senders": senders[ind], "times": times[ind]})
+        return spikes
+
+    def __simulate(self, t_sim, phase):
+        """Advances the simulation by ``t_sim`` (in ms).
+
+        The kernel timers (and the energy meter, if any) are read before and
+        after the call, and the time spent in each phase of the simulation
+        loop (and the consumed energy) is added to the benchmark data of
+        ``phase``. The synaptic events are derived from the recorded spikes
+        and are therefore only added with spike recorders.
+
+        """
+        t_start = nest.biological_time
+        n_events_old = self.__spike_counts()
+        before = self.__kernel_timers()
+        if self.energy_meter is not None:
+            energy_before = self.energy_meter.read()
+        time_start = time.time()
+        nest.Simulate(t_sim)
+        time_stop = time.time()
+        if self.energy_meter is not None:
+            self.benchmark.add_energy(phase, self.energy_meter.energy(energy_before, self.energy_meter.read()))
+        self.benchmark.add_kernel_times(phase, t_sim, before, self.__kernel_timers())
+        self.benchmark.add_trace_event(
+            "nest.Simulate",
+            phase,
+            time_start,
+            time_stop,
+            {"t_start": t_start, "t_sim": t_sim, "kernel_times": self.benchmark.kernel_calls[-1]["kernel_times"]},
+        )
+        self.benchmark.add_kernel_trace_events(
+            "nest.Simulate", phase, time_start, time_stop, self.benchmark.kernel_calls[-1]["kernel_times"],
+            nest.local_num_threads,
+        )
+        if n_events_old is not None:
+            spike_counts = self.__spike_counts() - n_events_old
+            self.benchmark.add_synaptic_events(phase, self.__synaptic_events(t_start, t_sim, spike_counts))
+            self.spike_counts[phase] = self.spike_counts.get(phase, 0.0) + spike_counts
+
+    def __spike_counts(self):
+        """Returns the number of spikes registered per population so far.
+
+        The counts are summed across MPI processes. Without spike recorders,
+        ``None`` is returned.
+
+        """
+        if "spike_recorder" not in self.sim_dict["rec_dev"]:
+            return None
+        return helpers.mpi_allreduce_sum(self.spike_recorders.n_events)
+
+    def __synaptic_events(self, t_start, t_sim, spike_counts):
+        """Returns the synaptic events processed in an interval of ``t_sim`` starting at ``t_start``.
+
+        See ``benchmark.synaptic_events()``.
+
+        """
+        ext_indegrees = self.ext_indegrees if self.net_dict["bg_input_type"] == "poisson" else None
+        num_th_synapses = None
+        t_th = 0.0
+        if self.stim_dict["thalamic_input"]:
+            num_th_synapses = self.num_th_synapses
+            th_stop = self.stim_dict["th_start"] + self.stim_dict["th_duration"]
+            t_th = max(min(th_stop, t_start + t_sim) - max(self.stim_dict["th_start"], t_start), 0.0)
+        return benchmark.synaptic_events(
+            spike_counts,
+            self.num_neurons,
+            self.num_synapses,
+            t_sim,
+            ext_indegrees=ext_indegrees,
+            bg_rate=self.net_dict["bg_rate"],
+            num_th_synapses=num_th_synapses,
+            th_rate=self.stim_dict["th_rate"],
+            t_th=t_th,
+        )
+
+    def __kernel_timers(self):
+        """Returns the kernel timers available in the NEST installation."""
+        if self.kernel_timers is None:
+            status = nest.GetKernelStatus()
+            self.kernel_timers = [name for name in benchmark.kernel_timers if name in status]
+        return dict(zip(self.kernel_timers, nest.GetKernelStatus(self.kernel_timers)))
+
+    def __presimulate_adaptive(self):
+        """Presimulates until the population rates are stationary.
+
+        The population rates are computed from the number of events
+        registered by the spike recorders in consecutive windows.
+
+        """
+        if "spike_recorder" not in self.sim_dict["rec_dev"]:
+            raise ValueError('Adaptive presimulation requires "spike_recorder" in rec_dev.')
+
+        # windows of equal length (required by the stationarity criterion),
+        # such that the presimulation does not exceed t_presim_max
+        t_window = min(self.sim_dict["t_presim_window"], self.sim_dict["t_presim_max"])
+        num_windows_max = max(int(np.floor(self.sim_dict["t_presim_max"] / t_window + 1e-9)), 1)
+
         if nest.Rank() == 0:
-            print("Interval to plot spikes: {} ms".format(raster_plot_interval))
-            helpers.plot_raster(
-                self.data_path,
-                "spike_recorder",
-                raster_plot_interval[0],
-                raster_plot_interval[1],
-                self.net_dict["N_scaling"],
-            )
+            print("Presimulating adaptively in windows of {} ms (at most {} ms).".format(
+                t_window, num_windows_max * t_window))
+
+        counts = []
+        num_stationary = 0
+        n_events_old = np.array(self.spike_recorders.n_events)
+        for _ in range(num_windows_max):
+            self.__simulate(t_window, "presimulate")
+            n_events = np.array(self.spike_recorders.n_events)
+            counts.append(helpers.mpi_allreduce_sum(n_events - n_events_old))
+            n_events_old = n_events
+            self.presim_rates.append(counts[-1] * 1000.0 / (t_window * self.num_neurons))
+
+            if len(counts) > 1:
+                if helpers.presimulation_is_stationary(
+                    self.presim_rates[-2:],
+                    counts[-2:],
+                    self.sim_dict["presim_rate_rtol"],
+                    self.sim_dict["presim_noise_z"],
+                ):
+                    num_stationary += 1
+                else:
+                    num_stationary = 0
+            if num_stationary >= self.sim_dict["presim_stationary_windows"]:
+                break
+        else:
+            if nest.Rank() == 0:
+                warnings.warn("\nPopulation rates did not become stationary within the presimulation time.")
 
-            print("Interval to compute firing rates: {} ms".format(firing_rates_interval))
-            helpers.firing_rates(self.data_path, "spike_recorder", firing_rates_interval[0], firing_rates_interval[1])
-            helpers.boxplot(self.data_path, self.net_dict["populations"])
+        self.t_presim = len(counts) * t_window
 
     def __derive_parameters(self):
         """
@@ -288,6 +824,15 @@ Storing simulation metadata to {self.sim_dict['data_path']}
         self.weight_matrix_mean = PSC_matrix_mean
         self.weight_ext = PSC_ext
         self.DC_amp = DC_amp
+
+        # recurrent projections (empty projections are dropped)
+        self.connection_plan = connectivity.ConnectionPlan(
+            self.num_synapses,
+            self.weight_matrix_mean,
+            self.net_dict["weight_rel_std"],
+            self.net_dict["delay_matrix_mean"],
+            self.net_dict["delay_rel_std"],
+        )
         
         # thalamic input
         if self.stim_dict["thalamic_input"]:
@@ -316,7 +861,7 @@ Storing simulation metadata to {self.sim_dict['data_path']}
         """
         nest.ResetKernel()
 
-        nest.local_num_threads = self.sim_dict["local_num_threads"]
+        nest.local_num_threads = self.local_num_threads
         nest.resolution = self.sim_dict["sim_resolution"]
         nest.rng_seed = self.sim_dict["rng_seed"]
         nest.overwrite_files = self.sim_dict["overwrite_files"]
@@ -329,6 +874,37 @@ Storing simulation metadata to {self.sim_dict['data_path']}
             print("RNG seed: {}".format(rng_seed))
             print("Total number of virtual processes: {}".format(vps))
 
+    def __lookup_result_cache(self):
+        """Restores the output files of an identical run from the result cache.
+
+        The key combines the parameters, the source code of the package, the
+        NEST version and the number of virtual processes (see
+        ``result_cache.cache_key()``). MPI process 0
+        copies the cached files to the data directory; all MPI processes
+        agree on whether the run is restored (``self.cached``).
+        Requires spike files, i.e., ``sim_dict['spike_record_to'] == 'ascii'``.
+
+        """
+        if self.sim_dict["spike_record_to"] != "ascii":
+            raise ValueError('The result cache requires spike files, i.e., sim_dict["spike_record_to"] = "ascii".')
+
+        self.result_cache = result_cache.ResultCache(
+            self.sim_dict["result_cache"], self.sim_dict["result_cache_max_size"]
+        )
+        self.cache_key = result_cache.cache_key(
+            self.sim_dict, self.net_dict, self.stim_dict, nest.__version__, nest.total_num_virtual_procs
+        )
+        restored = False
+        if nest.Rank() == 0:
+            restored = self.result_cache.restore(self.cache_key, self.data_path)
+        self.cached = bool(helpers.mpi_allreduce_sum([restored])[0] > 0)
+
+        if nest.Rank() == 0:
+            if self.cached:
+                print("Results restored from the result cache (key {}).".format(self.cache_key[:16]))
+            else:
+                print("No cached results (key {}).".format(self.cache_key[:16]))
+
     def __create_neuronal_populations(self):
         """Creates the neuronal populations.
 
@@ -336,11 +912,28 @@ Storing simulation metadata to {self.sim_dict['data_path']}
         to them. The initial membrane potential of the neurons is drawn from
         normal distributions dependent on the parameter ``V0_type``.
 
+        If ``sim_dict['batched_create']`` is ``True``, all populations are
+        created at once (see ``__create_neuronal_populations_batched()``).
+
         The first and last neuron id of each population is written to file.
         """
         if nest.Rank() == 0:
             print("Creating neuronal populations.")
 
+        if self.sim_dict["batched_create"]:
+            self.__create_neuronal_populations_batched()
+        else:
+            self.__create_neuronal_populations_sequentially()
+
+        # write node ids to file
+        if nest.Rank() == 0:
+            fn = os.path.join(self.data_path, "population_nodeids.dat")
+            with open(fn, "w+") as f:
+                for pop in self.pops:
+                    f.write("{} {}\n".format(pop[0].global_id, pop[-1].global_id))
+
+    def __create_neuronal_populations_sequentially(self):
+        """Creates and parameterizes the neuronal populations one by one."""
         self.pops = []
         for i in np.arange(self.num_pops):
             population = nest.Create(self.net_dict["neuron_model"], self.num_neurons[i])
@@ -374,12 +967,46 @@ Storing simulation metadata to {self.sim_dict['data_path']}
 
             self.pops.append(population)
 
-        # write node ids to file
-        if nest.Rank() == 0:
-            fn = os.path.join(self.data_path, "population_nodeids.dat")
-            with open(fn, "w+") as f:
-                for pop in self.pops:
-                    f.write("{} {}\n".format(pop[0].global_id, pop[-1].global_id))
+    def __create_neuronal_populations_batched(self):
+        """Creates all neuronal populations with a single ``nest.Create()`` call.
+
+        Population-specific parameters (``I_e``) and the initial membrane
+        potentials are passed as per-neuron arrays. The initial membrane
+        potentials are drawn from a NumPy random number generator seeded with
+        ``sim_dict['rng_seed']``, such that all MPI processes obtain identical
+        arrays. The populations are contiguous slices of the created nodes.
+
+        """
+        if self.net_dict["V0_type"] == "optimized":
+            V0_mean = np.array(self.net_dict["neuron_params"]["V0_mean"]["optimized"])
+            V0_std = np.array(self.net_dict["neuron_params"]["V0_std"]["optimized"])
+        elif self.net_dict["V0_type"] == "original":
+            V0_mean = np.full(self.num_pops, self.net_dict["neuron_params"]["V0_mean"]["original"])
+            V0_std = np.full(self.num_pops, self.net_dict["neuron_params"]["V0_std"]["original"])
+        else:
+            raise ValueError("V0_type is incorrect. " + 'Valid options are "optimized" and "original".')
+
+        # population index of each neuron
+        pop_index = np.repeat(np.arange(self.num_pops), self.num_neurons)
+        rng = np.random.default_rng(self.sim_dict["rng_seed"])
+
+        neurons = nest.Create(
+            self.net_dict["neuron_model"],
+            len(pop_index),
+            params={
+                "tau_syn_ex": self.net_dict["neuron_params"]["tau_syn"],
+                "tau_syn_in": self.net_dict["neuron_params"]["tau_syn"],
+                "E_L": self.net_dict["neuron_params"]["E_L"],
+                "V_th": self.net_dict["neuron_params"]["V_th"],
+                "V_reset": self.net_dict["neuron_params"]["V_reset"],
+                "t_ref": self.net_dict["neuron_params"]["t_ref"],
+                "I_e": self.DC_amp[pop_index],
+                "V_m": rng.normal(V0_mean[pop_index], V0_std[pop_index]),
+            },
+        )
+
+        bounds = np.concatenate(([0], np.cumsum(self.num_neurons)))
+        self.pops = [neurons[bounds[i] : bounds[i + 1]] for i in np.arange(self.num_pops)]
 
     def __create_recording_devices(self):
         """Creates one recording device of each kind per population.
@@ -393,7 +1020,9 @@ Storing simulation metadata to {self.sim_dict['data_path']}
         if "spike_recorder" in self.sim_dict["rec_dev"]:
             if nest.Rank() == 0:
                 print("  Creating spike recorders.")
-            sd_dict = {"record_to": "ascii", "label": os.path.join(self.data_path, "spike_recorder")}
+            sd_dict = {"record_to": self.sim_dict["spike_record_to"]}
+            if self.sim_dict["spike_record_to"] == "ascii":
+                sd_dict["label"] = os.path.join(self.data_path, "spike_recorder")
             self.spike_recorders = nest.Create("spike_recorder", n=self.num_pops, params=sd_dict)
 
         if "voltmeter" in self.sim_dict["rec_dev"]:
@@ -470,53 +1099,27 @@ Storing simulation metadata to {self.sim_dict['data_path']}
         self.dc_stim_input = nest.Create("dc_generator", n=self.num_pops, params=dc_dict)
 
     def __connect_neuronal_populations(self):
-        """Creates the recurrent connections between neuronal populations."""
-        if nest.Rank() == 0:
-            print("Connecting neuronal populations recurrently.")
+        """Creates the recurrent connections between neuronal populations.
 
-        for i, target_pop in enumerate(self.pops):
-            for j, source_pop in enumerate(self.pops):
+        The projections are taken from the connection plan derived in
+        ``__derive_parameters()`` (see ``connectivity.ConnectionPlan``).
+        If ``sim_dict['connectome_path']`` is set, the connections are instead
+        restored from the connectome files exported by ``export_connectome()``.
 
-                ## this case distinction would not have been necessary if nest.random.normal(mean,std) permitted std=0
-                if self.net_dict["delay_rel_std"]==0:
-                    delay = self.net_dict["delay_matrix_mean"][i][j]
-                else:
-                    delay = nest.math.redraw(
-                        nest.random.normal(
-                            mean=self.net_dict["delay_matrix_mean"][i][j],
-                            std=(self.net_dict["delay_matrix_mean"][i][j] * self.net_dict["delay_rel_std"])
-                        ),
-                        min=nest.resolution - 0.5 * nest.resolution,
-                        max=np.inf
-                    )
-                    # resulting minimum delay is equal to resolution, see:
-                    # https://nest-simulator.readthedocs.io/en/latest/nest_behavior
-                    # /random_numbers.html#rounding-effects-when-randomizing-delays
+        """
+        if self.sim_dict["connectome_path"] is not None:
+            filenames = sorted(glob.glob(os.path.join(self.sim_dict["connectome_path"], "connectome-*.npz")))
+            if len(filenames) == 0:
+                raise FileNotFoundError("No connectome files found in {}.".format(self.sim_dict["connectome_path"]))
+            if nest.Rank() == 0:
+                print("Connecting neuronal populations recurrently from {} connectome file(s).".format(len(filenames)))
+            connectivity.connect_connectome(self.pops, filenames)
+            return
+
+        if nest.Rank() == 0:
+            print("Connecting neuronal populations recurrently ({} projections).".format(len(self.connection_plan)))
 
-                
-                if self.num_synapses[i][j] >= 0.0:
-                    conn_dict_rec = {"rule": "fixed_total_number", "N": self.num_synapses[i][j]}
-
-                    if self.weight_matrix_mean[i][j] < 0:
-                        w_min = -np.inf
-                        w_max = 0.0
-                    else:
-                        w_min = 0.0
-                        w_max = np.inf
-
-                    syn_dict = {
-                        "synapse_model": "static_synapse",
-                        "weight": nest.math.redraw(
-                            nest.random.normal(
-                                mean=self.weight_matrix_mean[i][j],
-                                std=abs(self.weight_matrix_mean[i][j] * self.net_dict["weight_rel_std"]),
-                            ),
-                            min=w_min,
-                            max=w_max,
-                        ),
-                        "delay": delay,
-                    }
-                    nest.Connect(source_pop, target_pop, conn_spec=conn_dict_rec, syn_spec=syn_dict)
+        self.connection_plan.connect(self.pops, span=self.benchmark.span, names=self.net_dict["populations"])
 
     def __connect_recording_devices(self):
         """Connects the recording devices to the microcircuit."""
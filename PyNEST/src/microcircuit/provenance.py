@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# provenance.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Provenance
+-------------------------------------
+
+In-process collection of the provenance of a simulation: installed python
+packages, NEST version and build configuration, host, CPU and memory, and
+the layout of MPI processes and threads.
+
+The package inventory is read with ``importlib.metadata`` instead of
+``pip freeze`` and cached per python environment. The cache is invalidated
+when any directory on ``sys.path`` changes, i.e., when packages are
+installed or removed.
+
+"""
+
+import datetime
+import hashlib
+import importlib.metadata
+import json
+import os
+import platform
+import sys
+
+import nest
+
+from microcircuit import helpers, tuner
+
+# default location of the cache of package inventories
+default_cache_file = os.path.join(os.path.expanduser("~"), ".cache", "microcircuit", "provenance.json")
+
+
+def environment_key():
+    """Returns an identifier of the state of the python environment.
+
+    The identifier depends on the python executable and the modification
+    times of all directories on ``sys.path``, which change when packages are
+    installed or removed.
+
+    """
+    entries = [sys.executable, sys.prefix]
+    for path in sys.path:
+        if os.path.isdir(path):
+            entries.append("{}:{}".format(path, os.stat(path).st_mtime_ns))
+    return hashlib.sha256("|".join(entries).encode()).hexdigest()[:16]
+
+
+def package_inventory(cache_file=default_cache_file):
+    """Returns the installed python packages.
+
+    Parameters
+    ----------
+    cache_file
+        Cache of package inventories, one per python executable; ``None``
+        disables the cache.
+
+    Returns
+    -------
+    packages
+        List of dictionaries with the name and version of each distribution,
+        sorted by name. For distributions installed more than once, the one
+        found first on ``sys.path`` is listed (as by ``pip freeze``).
+
+    """
+    key = environment_key()
+    cache = {}
+    if cache_file is not None and os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "r") as file:
+                cache = json.load(file)
+        except ValueError:
+            cache = {}
+        entry = cache.get(sys.executable)
+        if entry is not None and entry["key"] == key:
+            return entry["packages"]
+
+    packages = {}
+    for distribution in importlib.metadata.distributions():
+        name = distribution.metadata["Name"]
+        if name is not None and name.lower() not in packages:
+            packages[name.lower()] = {"name": name, "version": distribution.version}
+    packages = [packages[name] for name in sorted(packages)]
+
+    if cache_file is not None:
+        cache[sys.executable] = {"key": key, "packages": packages}
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        with open(cache_file, "w") as file:
+            json.dump(cache, file, indent=4)
+    return packages
+
+
+def nest_info():
+    """Returns the NEST version and build configuration."""
+    build_info = dict(nest.GetKernelStatus("build_info"))
+    for key in ["exitcode", "test_exitcodes"]:
+        build_info.pop(key, None)
+    return {"version": nest.__version__, "build_info": build_info}
+
+
+def system_info():
+    """Returns the host, operating system, python version, CPU and memory of the local machine."""
+    info = {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python": "{} {}".format(platform.python_implementation(), platform.python_version()),
+        "python_executable": sys.executable,
+    }
+    info.update(tuner.machine_info())
+    return info
+
+
+def mpi_layout():
+    """Returns the layout of MPI processes and threads.
+
+    Gathers the host of each MPI process; has to be called on all MPI
+    processes.
+
+    Returns
+    -------
+    layout
+        Dictionary with the numbers of MPI processes, threads per process
+        and virtual processes, and the host of each MPI process, on MPI
+        process 0; ``None`` on all other MPI processes.
+
+    """
+    hosts = helpers.mpi_gather(platform.node())
+    if hosts is None:
+        return None
+    return {
+        "num_processes": nest.NumProcesses(),
+        "local_num_threads": nest.local_num_threads,
+        "total_num_virtual_procs": nest.total_num_virtual_procs,
+        "hosts": hosts,
+    }
+
+
+def collect(cache_file=default_cache_file):
+    """Collects the provenance of the current simulation.
+
+    Has to be called on all MPI processes (see ``mpi_layout()``).
+
+    Parameters
+    ----------
+    cache_file
+        Cache of package inventories (see ``package_inventory()``).
+
+    Returns
+    -------
+    provenance
+        Dictionary with the time, the python packages, the NEST build, the
+        system and the MPI layout, on MPI process 0; ``None`` on all other
+        MPI processes.
+
+    """
+    layout = mpi_layout()
+    if layout is None:
+        return None
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "packages": package_inventory(cache_file),
+        "nest": nest_info(),
+        "system": system_info(),
+        "mpi": layout,
+    }
+
+
+def write_requirements(packages, filename):
+    """Writes a package inventory in the format of ``pip freeze``."""
+    with open(filename, "w") as file:
+        for package in packages:
+            file.write("{}=={}\n".format(package["name"], package["version"]))
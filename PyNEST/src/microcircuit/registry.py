@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+#
+# registry.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Run Registry
+---------------------------------------
+
+Registry of simulation runs in a local SQLite database. Each run is stored
+as one row with its key parameters, seed, wall-clock times, real-time
+factor, peak memory, population firing rates and data directory, such that
+runs can be selected without parsing the json files of each data
+directory, e.g.::
+
+    registry.query(["K_scaling=0.5", "real_time_factor<2"])
+
+Runs are registered by ``Network.store_metadata()`` (see
+``sim_dict['run_registry']``); data directories of earlier runs can be
+added with ``register_directory()``.
+
+"""
+
+import datetime
+import json
+import os
+import re
+import sqlite3
+
+from microcircuit import helpers
+
+# default location of the run registry of 'microcircuit runs'; runs are only
+# registered by Network.store_metadata() if sim_dict['run_registry'] is set
+default_registry_file = os.path.join(os.path.expanduser("~"), ".cache", "microcircuit", "runs.sqlite")
+
+# columns of the registry and their SQL types; 'rates' holds the firing rates
+# per population as json
+columns = [
+    ("data_path", "TEXT UNIQUE"),
+    ("time", "TEXT"),
+    ("N_scaling", "REAL"),
+    ("K_scaling", "REAL"),
+    ("rng_seed", "INTEGER"),
+    ("t_presim", "REAL"),
+    ("t_sim", "REAL"),
+    ("sim_resolution", "REAL"),
+    ("bg_input_type", "TEXT"),
+    ("thalamic_input", "INTEGER"),
+    ("num_ranks", "INTEGER"),
+    ("local_num_threads", "INTEGER"),
+    ("total_num_virtual_procs", "INTEGER"),
+    ("nest_version", "TEXT"),
+    ("host", "TEXT"),
+    ("time_total", "REAL"),
+    ("time_init", "REAL"),
+    ("time_create", "REAL"),
+    ("time_connect", "REAL"),
+    ("time_presimulate", "REAL"),
+    ("time_simulate", "REAL"),
+    ("real_time_factor", "REAL"),
+    ("memory_peak", "INTEGER"),
+    ("mean_rate", "REAL"),
+    ("rates", "TEXT"),
+]
+column_names = [name for name, _ in columns]
+
+# seconds to wait for a lock held by another process
+lock_timeout = 60.0
+
+
+def connect(registry_file=default_registry_file):
+    """Opens the registry and creates its table if needed."""
+    os.makedirs(os.path.dirname(os.path.abspath(registry_file)), exist_ok=True)
+    connection = sqlite3.connect(registry_file, timeout=lock_timeout)
+    connection.row_factory = sqlite3.Row
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT, {})".format(
+            ", ".join("{} {}".format(name, sql_type) for name, sql_type in columns)
+        )
+    )
+    return connection
+
+
+def run_record(data_path, sim_dict, net_dict, stim_dict, benchmark_data, rates=None, nest_version=None):
+    """Collects the registry entry of a run.
+
+    Parameters
+    ----------
+    data_path
+        Data directory of the run.
+    sim_dict, net_dict, stim_dict
+        Parameters of the run.
+    benchmark_data
+        Benchmark results of all MPI processes (see
+        ``Network.store_benchmark()``), or ``None`` for runs without
+        benchmark results; the times, the real-time factor, the memory and
+        the numbers of MPI processes and virtual processes are then left
+        empty, and the simulation time is taken from ``sim_dict``.
+    rates
+        Optional dictionary of the mean firing rate of each population during
+        the simulation phase (in spikes/s).
+    nest_version
+        Version of NEST.
+
+    Returns
+    -------
+    record
+        Dictionary with one value per column (see ``columns``).
+
+    """
+    if benchmark_data is None:
+        benchmark_data = {"summary": {"t_model": sim_dict["t_sim"], "times": {}}, "ranks": []}
+        if isinstance(sim_dict.get("local_num_threads"), int):
+            benchmark_data["local_num_threads"] = sim_dict["local_num_threads"]
+    summary = benchmark_data["summary"]
+    ranks = benchmark_data["ranks"]
+    record = {
+        "data_path": os.path.abspath(data_path),
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "N_scaling": net_dict["N_scaling"],
+        "K_scaling": net_dict["K_scaling"],
+        "rng_seed": sim_dict["rng_seed"],
+        "t_presim": sim_dict["t_presim"],
+        "t_sim": summary["t_model"],
+        "sim_resolution": sim_dict["sim_resolution"],
+        "bg_input_type": net_dict["bg_input_type"],
+        "thalamic_input": int(bool(stim_dict["thalamic_input"])) if stim_dict is not None else None,
+        "num_ranks": benchmark_data.get("num_ranks"),
+        "local_num_threads": benchmark_data.get("local_num_threads"),
+        "total_num_virtual_procs": benchmark_data.get("total_num_virtual_procs"),
+        "nest_version": nest_version,
+        "host": ranks[0].get("host") if len(ranks) > 0 else None,
+        "time_total": summary.get("time_total"),
+        "real_time_factor": summary.get("real_time_factor"),
+        "memory_peak": max((results["memory_peak"] for results in ranks), default=None),
+        "mean_rate": None,
+        "rates": None,
+    }
+    for phase in ["init", "create", "connect", "presimulate", "simulate"]:
+        record["time_" + phase] = summary["times"].get(phase)
+    if rates is not None:
+        record["mean_rate"] = float(sum(rates.values()) / len(rates))
+        record["rates"] = json.dumps({str(pop): float(rate) for pop, rate in rates.items()})
+    return record
+
+
+def register(record, registry_file=default_registry_file):
+    """Adds a run to the registry; an earlier entry with the same data directory is replaced.
+
+    Returns
+    -------
+    run_id
+        Row ID of the run.
+
+    """
+    values = [record.get(name) for name in column_names]
+    with connect(registry_file) as connection:
+        cursor = connection.execute(
+            "INSERT OR REPLACE INTO runs ({}) VALUES ({})".format(
+                ", ".join(column_names), ", ".join("?" * len(column_names))
+            ),
+            values,
+        )
+        run_id = cursor.lastrowid
+    connection.close()
+    return run_id
+
+
+def register_directory(data_path, registry_file=default_registry_file):
+    """Adds the run stored in a data directory to the registry.
+
+    Reads ``sim_dict.json``, ``net_dict.json`` and, if present,
+    ``stim_dict.json``, ``benchmark.json`` and ``provenance.json`` of a run
+    of an earlier version, or of a run without registry. Firing rates are
+    not available from these files. Without ``benchmark.json`` (runs of
+    versions before the benchmark results were stored), the times, the
+    real-time factor and the memory are left empty, and the time of the run
+    is taken from ``sim_dict.json``.
+
+    Returns
+    -------
+    run_id
+        Row ID of the run.
+
+    """
+    def load(name):
+        filename = os.path.join(data_path, name)
+        return helpers.json2dict(filename) if os.path.isfile(filename) else None
+
+    for name in ["sim_dict.json", "net_dict.json"]:
+        if not os.path.isfile(os.path.join(data_path, name)):
+            raise FileNotFoundError("{} is not a data directory of a run: {} is missing.".format(data_path, name))
+
+    nest_version = None
+    provenance_data = load("provenance.json")
+    if provenance_data is not None:
+        nest_version = provenance_data["nest"]["version"]
+    benchmark_data = load("benchmark.json")
+    record = run_record(
+        data_path,
+        load("sim_dict.json"),
+        load("net_dict.json"),
+        load("stim_dict.json"),
+        benchmark_data,
+        nest_version=nest_version,
+    )
+    time_file = "benchmark.json" if benchmark_data is not None else "sim_dict.json"
+    record["time"] = datetime.datetime.fromtimestamp(
+        os.path.getmtime(os.path.join(data_path, time_file))
+    ).isoformat(timespec="seconds")
+    return register(record, registry_file)
+
+
+def parse_condition(condition):
+    """Converts a condition such as ``'real_time_factor<2'`` to an SQL expression and its value.
+
+    Supported operators are ``=``, ``!=``, ``<``, ``<=``, ``>`` and ``>=``;
+    the column has to be one of ``column_names`` or ``id``.
+
+    """
+    match = re.fullmatch(r"\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.*?)\s*", condition)
+    if match is None:
+        raise ValueError("Invalid condition: {}".format(condition))
+    name, operator, value = match.groups()
+    if name not in column_names + ["id"]:
+        raise ValueError("Unknown column {} in condition {}.".format(name, condition))
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    return "{} {} ?".format(name, operator), value
+
+
+def query(conditions=(), order_by="id", limit=None, registry_file=default_registry_file):
+    """Selects runs from the registry.
+
+    Parameters
+    ----------
+    conditions
+        List of conditions, all of which have to hold (see
+        ``parse_condition()``), e.g., ``["K_scaling=0.5",
+        "real_time_factor<2"]``.
+    order_by
+        Column to sort by; a leading ``-`` sorts in descending order.
+    limit
+        Maximal number of runs.
+    registry_file
+        SQLite database of the registry.
+
+    Returns
+    -------
+    runs
+        List of dictionaries, one per run, with the firing rates per
+        population decoded from json.
+
+    """
+    expressions = []
+    values = []
+    for condition in conditions:
+        expression, value = parse_condition(condition)
+        expressions.append(expression)
+        values.append(value)
+
+    descending = order_by.startswith("-")
+    order_by = order_by.lstrip("-")
+    if order_by not in column_names + ["id"]:
+        raise ValueError("Unknown column {}.".format(order_by))
+
+    sql = "SELECT * FROM runs"
+    if len(expressions) > 0:
+        sql += " WHERE " + " AND ".join(expressions)
+    sql += " ORDER BY {}{}".format(order_by, " DESC" if descending else "")
+    if limit is not None:
+        sql += " LIMIT {:d}".format(int(limit))
+
+    connection = connect(registry_file)
+    runs = [dict(row) for row in connection.execute(sql, values)]
+    connection.close()
+    for run in runs:
+        if run["rates"] is not None:
+            run["rates"] = json.loads(run["rates"])
+    return runs
+
+
+def remove(conditions, registry_file=default_registry_file):
+    """Removes the runs matching all conditions (see ``query()``) from the registry; returns their number."""
+    if len(conditions) == 0:
+        raise ValueError("At least one condition is required to remove runs.")
+    expressions, values = zip(*[parse_condition(condition) for condition in conditions])
+    with connect(registry_file) as connection:
+        cursor = connection.execute("DELETE FROM runs WHERE " + " AND ".join(expressions), values)
+        num_removed = cursor.rowcount
+    connection.close()
+    return num_removed
+
+
+def print_runs(runs):
+    """Prints a table of runs."""
+    header = "{:>5}  {:<19}  {:>6}  {:>6}  {:>8}  {:>8}  {:>3}x{:<3}  {:>7}  {:>8}  {:>7}  {}"
+    print(header.format("id", "time", "N_sc", "K_sc", "seed", "t_sim", "MPI", "thr", "RTF", "mem (MB)", "rate", "data_path"))
+
+    def number(value, precision):
+        return "-" if value is None else "{:.{}f}".format(value, precision)
+
+    for run in runs:
+        print(header.format(
+            run["id"],
+            run["time"] or "-",
+            number(run["N_scaling"], 3),
+            number(run["K_scaling"], 3),
+            run["rng_seed"],
+            number(run["t_sim"], 0),
+            run["num_ranks"],
+            run["local_num_threads"],
+            number(run["real_time_factor"], 3),
+            number(run["memory_peak"] / 1024.0**2 if run["memory_peak"] is not None else None, 0),
+            number(run["mean_rate"], 2),
+            run["data_path"],
+        ))
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+#
+# resources.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Resource Estimation
+----------------------------------------------
+
+Estimates of the memory consumption, the volume of recorded data and the
+number of synaptic events of a simulation, obtained without building the
+network.
+
+The memory model is linear in the number of neurons and synapses per MPI
+process. Its coefficients are calibrated with measured runs (see
+``calibrate()`` and ``load_measurements()``, which reads the measurements
+from the ``benchmark.json`` files of stored runs). The default calibration
+is provisional: it is a fit to the memory requirements of single-process
+runs with 4 threads listed in the README (scaling factors 0.1, 0.2, 0.5 and
+1) and should be replaced by a calibration with runs on the target machine.
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+# provisional calibration (see above)
+default_calibration = {
+    # memory of a process independent of the network size (in bytes)
+    "base": 59.7e6,
+    # additional memory per thread (in bytes); not resolved by the default
+    # calibration, which only contains runs with 4 threads
+    "per_thread": 0.0,
+    # memory per neuron local to the process (in bytes)
+    "per_neuron": 47248.0,
+    # memory per synapse local to the process (in bytes)
+    "per_synapse": 36.7,
+    # memory per entry of the spike communication buffers (in bytes)
+    "per_spike": 8.0,
+    # size of a recorded spike in the ASCII output files (in bytes)
+    "per_recorded_spike": 17.0,
+}
+
+
+def estimate_resources(
+    num_neurons,
+    num_synapses,
+    ext_indegrees,
+    rates,
+    bg_input_type,
+    bg_rate,
+    min_delay,
+    num_device_connections=0,
+    num_th_synapses=None,
+    num_ranks=1,
+    local_num_threads=1,
+    calibration=None,
+):
+    """Estimates memory per MPI process, recording volume and synaptic events.
+
+    Parameters
+    ----------
+    num_neurons
+        Number of neurons per population.
+    num_synapses
+        Matrix of recurrent synapse numbers (first index: target, second
+        index: source).
+    ext_indegrees
+        External indegrees per population.
+    rates
+        Expected firing rates per population (in spikes/s).
+    bg_input_type
+        Type of background input, either "poisson" or "dc".
+    bg_rate
+        Rate of the external Poisson input (in spikes/s).
+    min_delay
+        Minimal delay, i.e., the communication interval (in ms).
+    num_device_connections
+        Number of connections from or to devices (recorders, generators).
+    num_th_synapses
+        Number of thalamic synapses per population (optional).
+    num_ranks
+        Number of MPI processes.
+    local_num_threads
+        Number of threads per MPI process.
+    calibration
+        Coefficients of the memory model (see ``default_calibration``).
+
+    Returns
+    -------
+    estimate
+        Dictionary with the estimated memory per MPI process (in bytes) for
+        neurons, synapses and spike buffers and in total, the recorded data
+        and the synaptic events per simulated second.
+
+    """
+    if calibration is None:
+        calibration = default_calibration
+
+    num_neurons = np.asarray(num_neurons, dtype=float)
+    num_synapses = np.asarray(num_synapses, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+
+    total_num_neurons = np.sum(num_neurons)
+    total_num_synapses = np.sum(num_synapses) + num_device_connections
+    if num_th_synapses is not None:
+        total_num_synapses += np.sum(num_th_synapses)
+
+    # spikes per second emitted by the network
+    spike_rate = np.sum(num_neurons * rates)
+
+    # synaptic events per second: recurrent synapses transmit the spikes of
+    # their source population; Poisson input adds K_ext * bg_rate events per
+    # neuron
+    synaptic_events = np.sum(num_synapses * rates[np.newaxis, :])
+    if bg_input_type == "poisson":
+        synaptic_events += np.sum(num_neurons * np.asarray(ext_indegrees) * bg_rate)
+
+    # the spike buffers of each process hold the spikes of all processes in
+    # one communication interval, for sending and receiving
+    spikes_per_interval = spike_rate * min_delay * 1e-3
+    memory_spike_buffers = 2.0 * calibration["per_spike"] * spikes_per_interval
+
+    memory_neurons = calibration["per_neuron"] * total_num_neurons / num_ranks
+    memory_synapses = calibration["per_synapse"] * total_num_synapses / num_ranks
+    memory_base = calibration["base"] + calibration["per_thread"] * local_num_threads
+
+    estimate = {
+        "num_ranks": num_ranks,
+        "local_num_threads": local_num_threads,
+        "num_neurons": int(total_num_neurons),
+        "num_synapses": int(total_num_synapses),
+        "memory_base_per_rank": memory_base,
+        "memory_neurons_per_rank": memory_neurons,
+        "memory_synapses_per_rank": memory_synapses,
+        "memory_spike_buffers_per_rank": memory_spike_buffers,
+        "memory_per_rank": memory_base + memory_neurons + memory_synapses + memory_spike_buffers,
+        "spikes_per_second": spike_rate,
+        "recording_per_second": calibration["per_recorded_spike"] * spike_rate,
+        "recording_per_second_per_rank": calibration["per_recorded_spike"] * spike_rate / num_ranks,
+        "synaptic_events_per_second": synaptic_events,
+    }
+    return estimate
+
+
+def print_resources(estimate, t_sim=None):
+    """Prints a resource estimate.
+
+    Parameters
+    ----------
+    estimate
+        Dictionary returned by ``estimate_resources()``.
+    t_sim
+        Simulation time (in ms); if given, the total volume of recorded data
+        is printed as well.
+
+    """
+    MB = 1024.0**2
+    print("Resource estimate for {} MPI process(es) with {} thread(s) each:".format(
+        estimate["num_ranks"], estimate["local_num_threads"]))
+    print("  Number of neurons:          {}".format(estimate["num_neurons"]))
+    print("  Number of synapses:         {}".format(estimate["num_synapses"]))
+    print("  Memory per MPI process:     {:.0f} MB".format(estimate["memory_per_rank"] / MB))
+    print("    base:                     {:.0f} MB".format(estimate["memory_base_per_rank"] / MB))
+    print("    neurons:                  {:.0f} MB".format(estimate["memory_neurons_per_rank"] / MB))
+    print("    synapses:                 {:.0f} MB".format(estimate["memory_synapses_per_rank"] / MB))
+    print("    spike buffers:            {:.1f} MB".format(estimate["memory_spike_buffers_per_rank"] / MB))
+    print("  Recorded data:              {:.1f} MB per simulated second".format(
+        estimate["recording_per_second"] / MB))
+    if t_sim is not None:
+        print("                              {:.1f} MB for {} ms".format(
+            estimate["recording_per_second"] * t_sim * 1e-3 / MB, t_sim))
+    print("  Synaptic events:            {:.3e} per simulated second".format(
+        estimate["synaptic_events_per_second"]))
+
+
+def calibrate(measurements):
+    """Calibrates the memory model with measured runs.
+
+    The coefficients ``base``, ``per_thread``, ``per_neuron`` and
+    ``per_synapse`` are obtained by a least-squares fit of the measured peak
+    memory per MPI process. Coefficients of quantities that do not vary
+    across the measurements cannot be resolved and are set to zero (for
+    ``per_thread``) or absorbed in ``base``.
+
+    Parameters
+    ----------
+    measurements
+        List of dictionaries with entries ``num_neurons`` and ``num_synapses``
+        (totals of the network), ``num_ranks``, ``local_num_threads`` and
+        ``memory`` (measured memory per MPI process in bytes).
+
+    Returns
+    -------
+    calibration
+        Coefficients of the memory model.
+
+    """
+    columns = {
+        "base": [1.0 for m in measurements],
+        "per_thread": [float(m["local_num_threads"]) for m in measurements],
+        "per_neuron": [m["num_neurons"] / m["num_ranks"] for m in measurements],
+        "per_synapse": [m["num_synapses"] / m["num_ranks"] for m in measurements],
+    }
+    memory = np.array([m["memory"] for m in measurements], dtype=float)
+
+    # only fit coefficients of quantities that vary across the measurements
+    names = ["base"] + [name for name in ["per_thread", "per_neuron", "per_synapse"] if np.ptp(columns[name]) > 0]
+    if len(measurements) < len(names):
+        raise ValueError("At least {} measurements are required for the calibration.".format(len(names)))
+
+    matrix = np.array([columns[name] for name in names]).T
+    coefficients = np.linalg.lstsq(matrix, memory, rcond=None)[0]
+
+    calibration = dict(default_calibration)
+    calibration.update({"per_thread": 0.0, "per_neuron": 0.0, "per_synapse": 0.0})
+    calibration.update(zip(names, coefficients.tolist()))
+    return calibration
+
+
+def load_measurements(data_paths):
+    """Reads measurements for ``calibrate()`` from stored runs.
+
+    For each data directory, the numbers of MPI processes, threads, neurons
+    and connections and the peak memory (maximum across MPI processes) are
+    taken from ``benchmark.json`` (see ``Network.store_benchmark()``).
+    Directories without ``benchmark.json``, or with a ``benchmark.json``
+    written by versions that did not store the numbers of neurons and
+    connections, are skipped.
+
+    Parameters
+    ----------
+    data_paths
+        List of data directories of stored runs.
+
+    Returns
+    -------
+    measurements
+        List of dictionaries as expected by ``calibrate()``.
+
+    """
+    measurements = []
+    for data_path in data_paths:
+        filename = os.path.join(data_path, "benchmark.json")
+        if not os.path.isfile(filename):
+            continue
+        with open(filename, "r") as file:
+            data = json.load(file)
+        if "num_neurons" not in data or "num_synapses" not in data:
+            continue
+        measurements.append(
+            {
+                "num_neurons": data["num_neurons"],
+                "num_synapses": data["num_synapses"],
+                "num_ranks": data["num_ranks"],
+                "local_num_threads": data["local_num_threads"],
+                "memory": max(results["memory_peak"] for results in data["ranks"]),
+            }
+        )
+    return measurements
+
+
+def save_calibration(calibration, filename):
+    """Writes the coefficients of the memory model to a json file."""
+    with open(filename, "w") as file:
+        json.dump(calibration, file, indent=4)
+
+
+def load_calibration(filename):
+    """Reads the coefficients of the memory model from a json file.
+
+    Missing coefficients are taken from ``default_calibration``.
+
+    """
+    calibration = dict(default_calibration)
+    with open(filename, "r") as file:
+        calibration.update(json.load(file))
+    return calibration
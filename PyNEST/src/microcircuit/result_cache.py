@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+#
+# result_cache.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Result Cache
+---------------------------------------
+
+Content-addressed cache of simulation results. The output files of a run
+(spike files, metadata, benchmark) are stored under a key derived from a
+canonical hash of the simulation, network and stimulus parameters, the source
+code of the microcircuit package, the NEST version and the number of virtual
+processes. A later run with the same key
+restores the stored files instead of building and simulating the network
+(see ``sim_dict['result_cache']``).
+
+The size of the cache is bounded; the least recently used entries are
+evicted first.
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# default location of the result cache
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "microcircuit", "results")
+
+# default upper bound of the size of the result cache (in bytes)
+default_max_size = 10 * 2**30
+
+# directory of the source files of the microcircuit package
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+# simulation parameters which do not affect the results (output locations,
+# measurement and bookkeeping options); 'local_num_threads' is replaced by the
+# number of virtual processes
+ignored_sim_keys = [
+    "data_path",
+    "overwrite_files",
+    "print_time",
+    "local_num_threads",
+    "result_cache",
+    "result_cache_max_size",
+    "trace",
+    "energy_meter",
+    "memory_sampling_interval",
+    "run_registry",
+    "provenance_cache",
+    "store_metadata",
+    "dry_run",
+]
+
+
+def canonical(value):
+    """Converts parameters to a canonical, json-serializable representation.
+
+    Dictionaries are sorted by key, tuples are converted to lists, and NumPy
+    arrays are represented by their data type, shape and values, such that
+    equal parameters yield equal representations independent of their
+    container types and the order of insertion.
+
+    """
+    if isinstance(value, dict):
+        return {str(key): canonical(value[key]) for key in sorted(value, key=str)}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return {"dtype": value.dtype.str, "shape": list(value.shape), "values": canonical(value.tolist())}
+    if isinstance(value, np.generic):
+        return canonical(value.item())
+    if isinstance(value, float):
+        # repr() is the shortest representation which round-trips exactly
+        return {"float": repr(value)}
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    return {type(value).__name__: str(value)}
+
+
+def code_version(path=package_dir):
+    """Returns a hash of the source files of the microcircuit package.
+
+    Results stored by a different version of the code (e.g., after a change
+    of ``network.py`` or ``connectivity.py``) are thereby not restored.
+
+    Parameters
+    ----------
+    path
+        Directory of the source files.
+
+    Returns
+    -------
+    version
+        Hexadecimal SHA-256 digest of the names and contents of the python
+        files in ``path``.
+
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".py"):
+            digest.update(name.encode())
+            with open(os.path.join(path, name), "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def cache_key(sim_dict, net_dict, stim_dict, nest_version, num_vps):
+    """Returns the key of a simulation in the result cache.
+
+    The key includes the version of the code (see ``code_version()``).
+
+    Parameters
+    ----------
+    sim_dict
+        Simulation parameters; parameters which do not affect the results
+        (see ``ignored_sim_keys``) are excluded.
+    net_dict
+        Network parameters.
+    stim_dict
+        Stimulus parameters.
+    nest_version
+        Version of NEST.
+    num_vps
+        Total number of virtual processes.
+
+    Returns
+    -------
+    key
+        Hexadecimal SHA-256 digest.
+
+    """
+    sim_dict = {key: value for key, value in sim_dict.items() if key not in ignored_sim_keys}
+    parameters = {
+        "sim_dict": sim_dict,
+        "net_dict": net_dict,
+        "stim_dict": stim_dict,
+        "code_version": code_version(),
+        "nest_version": nest_version,
+        "num_vps": num_vps,
+    }
+    text = json.dumps(canonical(parameters), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """Directory of cached simulation results.
+
+    Each entry is a subdirectory named by its key containing the output
+    files of a run. The index ``index.json`` records the size, the time of
+    creation and the time of the last access of each entry.
+
+    Parameters
+    ----------
+    path
+        Directory of the cache.
+    max_size
+        Upper bound of the total size of the entries (in bytes).
+
+    """
+
+    def __init__(self, path=default_cache_dir, max_size=default_max_size):
+        self.path = path
+        self.max_size = max_size
+        self.index_file = os.path.join(path, "index.json")
+
+    def load_index(self):
+        """Reads the index of the cache; entries without data are dropped."""
+        if not os.path.isfile(self.index_file):
+            return {}
+        with open(self.index_file, "r") as file:
+            index = json.load(file)
+        return {key: entry for key, entry in index.items() if os.path.isdir(self.entry_path(key))}
+
+    def save_index(self, index):
+        """Writes the index of the cache."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.index_file, "w") as file:
+            json.dump(index, file, indent=4)
+
+    def entry_path(self, key):
+        """Returns the directory of an entry."""
+        return os.path.join(self.path, key)
+
+    def entries(self):
+        """Returns the entries, most recently used first.
+
+        Returns
+        -------
+        entries
+            List of dictionaries with the 'key', 'size' (in bytes), 'created',
+            'last_access' (in s since the epoch), 'num_files' and
+            'description' of each entry.
+
+        """
+        index = self.load_index()
+        entries = [dict(index[key], key=key) for key in index]
+        return sorted(entries, key=lambda entry: entry["last_access"], reverse=True)
+
+    def size(self):
+        """Returns the total size of the entries (in bytes)."""
+        return sum(entry["size"] for entry in self.load_index().values())
+
+    def lookup(self, key):
+        """Returns the directory of an entry and marks it as used, or ``None`` if there is no entry."""
+        index = self.load_index()
+        if key not in index:
+            return None
+        index[key]["last_access"] = time.time()
+        self.save_index(index)
+        return self.entry_path(key)
+
+    def store(self, key, data_path, description=""):
+        """Stores the files in ``data_path`` as an entry.
+
+        Subdirectories of ``data_path`` are not stored. An existing entry
+        with the same key is replaced. Afterwards, the least recently used
+        entries are evicted until the cache fits into ``max_size``.
+
+        Parameters
+        ----------
+        key
+            Key of the entry (see ``cache_key()``).
+        data_path
+            Directory containing the output files.
+        description
+            Short description shown by ``microcircuit cache list``.
+
+        Returns
+        -------
+        stored
+            ``False`` if the files alone exceed ``max_size`` and are therefore
+            not stored.
+
+        """
+        filenames = sorted(
+            name for name in os.listdir(data_path) if os.path.isfile(os.path.join(data_path, name))
+        )
+        size = sum(os.path.getsize(os.path.join(data_path, name)) for name in filenames)
+        if size > self.max_size:
+            return False
+
+        self.remove(key)
+        entry_path = self.entry_path(key)
+        os.makedirs(entry_path)
+        for name in filenames:
+            shutil.copy2(os.path.join(data_path, name), entry_path)
+
+        index = self.load_index()
+        now = time.time()
+        index[key] = {
+            "size": size,
+            "num_files": len(filenames),
+            "created": now,
+            "last_access": now,
+            "description": description,
+        }
+        self.save_index(index)
+        self.evict(self.max_size)
+        return True
+
+    def restore(self, key, data_path):
+        """Copies the files of an entry to ``data_path``; returns ``False`` if there is no entry."""
+        entry_path = self.lookup(key)
+        if entry_path is None:
+            return False
+        os.makedirs(data_path, exist_ok=True)
+        for name in os.listdir(entry_path):
+            shutil.copy2(os.path.join(entry_path, name), data_path)
+        return True
+
+    def remove(self, key):
+        """Removes an entry; returns ``False`` if there is no entry."""
+        index = self.load_index()
+        found = os.path.isdir(self.entry_path(key))
+        if found:
+            shutil.rmtree(self.entry_path(key))
+        if key in index:
+            del index[key]
+            self.save_index(index)
+        return found
+
+    def evict(self, max_size):
+        """Removes the least recently used entries until the cache fits into ``max_size``.
+
+        Returns
+        -------
+        keys
+            Keys of the removed entries.
+
+        """
+        removed = []
+        entries = self.entries()
+        size = sum(entry["size"] for entry in entries)
+        while size > max_size and len(entries) > 0:
+            entry = entries.pop()
+            self.remove(entry["key"])
+            size -= entry["size"]
+            removed.append(entry["key"])
+        return removed
+
+    def purge(self, keys=None):
+        """Removes the given entries (abbreviated keys are accepted), or all entries.
+
+        Returns
+        -------
+        keys
+            Keys of the removed entries.
+
+        """
+        removed = []
+        for entry in self.entries():
+            if keys is None or any(entry["key"].startswith(key) for key in keys):
+                self.remove(entry["key"])
+                removed.append(entry["key"])
+        return removed
+
+
+def print_entries(cache):
+    """Prints the entries of a result cache, most recently used first."""
+    entries = cache.entries()
+    MB = 1024.0**2
+    print("Result cache {}: {} entries, {:.1f} MB of {:.1f} MB".format(
+        cache.path, len(entries), sum(entry["size"] for entry in entries) / MB, cache.max_size / MB
+    ))
+    for entry in entries:
+        print("  {}  {:>10.1f} MB  {:>5} files  last used {}  {}".format(
+            entry["key"][:16],
+            entry["size"] / MB,
+            entry["num_files"],
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_access"])),
+            entry["description"],
+        ))
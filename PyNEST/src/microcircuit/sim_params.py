@@ -35,6 +35,27 @@ default_sim_dict = {
     # simulation time.
     # presimulation time (in ms)
     "t_presim": 500.0,
+    # presimulation mode, options are:
+    # 'fixed': presimulate for 't_presim' (default)
+    # 'adaptive': presimulate in windows of 't_presim_window' and stop as soon
+    #             as the population rates are stationary, but not later than
+    #             't_presim_max'
+    "presim_mode": "fixed",
+    # adaptive presimulation: length of the windows in which population rates
+    # are monitored (in ms)
+    "t_presim_window": 50.0,
+    # adaptive presimulation: upper bound of the presimulation time (in ms)
+    "t_presim_max": 1000.0,
+    # adaptive presimulation: the rates are considered stationary if, for all
+    # populations, the rate change between consecutive windows is smaller than
+    # the larger of 'presim_rate_rtol' times the mean rate and
+    # 'presim_noise_z' times the standard deviation expected from Poisson
+    # counting noise
+    "presim_rate_rtol": 0.05,
+    "presim_noise_z": 3.0,
+    # adaptive presimulation: number of consecutive window pairs for which the
+    # stationarity criterion has to hold
+    "presim_stationary_windows": 3,
     # simulation time (in ms)
     "t_sim": 1000.0,
     # resolution of the simulation (in ms)
@@ -43,6 +64,11 @@ default_sim_dict = {
     # be added to record membrane voltages of the neurons. Nothing will be
     # recorded if an empty list is given.
     "rec_dev": ["spike_recorder"],
+    # recording backend of the spike recorders: 'ascii' writes the spikes to
+    # files in data_path (required by evaluate()), 'memory' keeps them in
+    # memory for analysis in the same process (see Network.spike_data()),
+    # without any spike files.
+    "spike_record_to": "ascii",
     # path to save the output data
     "data_path": os.path.join(os.getcwd(), "data/"),
     # Seed for NEST
@@ -53,7 +79,21 @@ default_sim_dict = {
     # may not run correctly if there is < 4 virtual processes
     # (i.e., a thread in an MPI process)
     # If you have 4 or more MPI processes, then you can set this value to 1.
+    # With 'auto', the configuration selected by 'microcircuit tune' for this
+    # machine and network size is used (see tuner.py); without a tuned
+    # configuration, the physical cores are divided among the MPI processes.
     "local_num_threads": 4,
+    # if True, all neurons are created with a single nest.Create() call and
+    # their parameters, including the initial membrane potentials, are passed
+    # as per-neuron arrays; the populations are slices of the created nodes.
+    # Note that the initial membrane potentials are then drawn with a NumPy
+    # random number generator seeded with 'rng_seed' and therefore differ from
+    # the ones of the default, population-wise creation.
+    "batched_create": False,
+    # directory containing a recurrent connectome exported with
+    # Network.export_connectome(); if given, the recurrent connections are
+    # restored from it instead of being drawn randomly
+    "connectome_path": None,
     # recording interval of the membrane potential (in ms)
     "rec_V_int": 1.0,
     # if True, data will be overwritten,
@@ -64,4 +104,53 @@ default_sim_dict = {
     "print_time": True,
     # store meta data
     "store_metadata": True,
+    # cache of the inventory of installed python packages stored with the
+    # meta data (see provenance.py), or None to collect it for every run
+    "provenance_cache": os.path.join(os.path.expanduser("~"), ".cache", "microcircuit", "provenance.json"),
+    # energy meter measuring the energy consumed during the (pre)simulation
+    # phase, options are:
+    # None: no energy measurement (default)
+    # 'rapl': RAPL counters of the CPU packages and DRAM of each host, read
+    #         from /sys/class/powercap (Linux only, usually requires root
+    #         privileges)
+    # 'fake': constant power of 100 W over the simulated model time, which
+    #         yields deterministic energies, for testing
+    # The energy per synaptic event is stored in benchmark.json.
+    "energy_meter": None,
+    # interval (in s) in which the memory (resident set size) is sampled to
+    # determine the peak memory of each phase where the high-water mark of the
+    # operating system cannot be reset per phase (see
+    # benchmark.MemoryTracker); if None, only the high-water mark and the
+    # memory at the start and the end of each phase are used
+    "memory_sampling_interval": 0.05,
+    # if True, each MPI process writes a timeline of the simulation phases
+    # (including the connection of each projection, nest.Prepare() and each
+    # nest.Simulate() call) in the trace event format to trace-<rank>.json,
+    # with one lane per NEST thread showing the time spent in the phases of
+    # the simulation loop (kernel timers per thread, which require NEST built
+    # with -Dwith-detailed-timers=ON) during each nest.Simulate() call; merge
+    # them with 'microcircuit merge-traces <path>'
+    "trace": False,
+    # directory of the result cache (see result_cache.py), or None to disable
+    # it; runs with identical parameters, NEST version and number of virtual
+    # processes restore the output files stored by an earlier run instead of
+    # building and simulating the network (requires spike_record_to='ascii').
+    # The default location is result_cache.default_cache_dir.
+    "result_cache": None,
+    # upper bound of the size of the result cache (in bytes); the least
+    # recently used entries are evicted first
+    "result_cache_max_size": 10 * 2**30,
+    # SQLite database in which store_metadata() registers each run with its
+    # key parameters, times, real-time factor, memory and population rates
+    # (see registry.py and 'microcircuit runs'), or None to disable it
+    # (default). The location queried by 'microcircuit runs' by default is
+    # registry.default_registry_file (~/.cache/microcircuit/runs.sqlite).
+    # Note that SQLite relies on file locking, which is unreliable on network
+    # file systems (e.g., shared home directories of HPC systems); use a
+    # database on a local file system there.
+    "run_registry": None,
+    # if True, the network is not built and the NEST kernel is not
+    # initialized; only the parameters are derived, e.g., to estimate the
+    # required resources with Network.estimate_resources()
+    "dry_run": False,
 }
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+#
+# tuner.py
+#
+# This file is part of NEST.
+#
+# Copyright (C) 2004 The NEST Initiative
+#
+# NEST is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# NEST is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NEST.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""PyNEST Microcircuit: Tuner
+-------------------------------
+
+Selection of the number of threads and MPI processes for the local machine.
+
+The tuner probes the machine (physical cores, NUMA nodes, available memory),
+discards configurations whose estimated memory exceeds the available memory
+(see ``resources.estimate_resources()``), and runs short calibration
+simulations of the configured network for the remaining configurations,
+each in a separate process. The configuration with the smallest real-time
+factor is cached per machine fingerprint and network size, such that later
+runs with ``sim_dict['local_num_threads'] = 'auto'`` use it without
+calibration.
+
+"""
+
+import copy
+import glob
+import hashlib
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+
+import psutil
+
+# default location of the cache of tuned configurations
+default_cache_file = os.path.join(os.path.expanduser("~"), ".cache", "microcircuit", "tuner.json")
+
+# fraction of the available memory that the estimated memory may use
+memory_safety_factor = 0.8
+
+
+def machine_info():
+    """Probes the local machine.
+
+    Returns
+    -------
+    machine
+        Dictionary with the CPU model, the numbers of physical and logical
+        cores, the number of NUMA nodes, and the total and available memory
+        (in bytes).
+
+    """
+    model = platform.processor() or platform.machine()
+    if os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo", "r") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key.strip() == "model name":
+                    model = value.strip()
+                    break
+
+    memory = psutil.virtual_memory()
+    return {
+        "cpu_model": model,
+        "physical_cores": psutil.cpu_count(logical=False) or psutil.cpu_count(),
+        "logical_cores": psutil.cpu_count(),
+        "numa_nodes": max(len(glob.glob("/sys/devices/system/node/node[0-9]*")), 1),
+        "memory_total": memory.total,
+        "memory_available": memory.available,
+    }
+
+
+def fingerprint(machine):
+    """Returns an identifier of the machine.
+
+    The identifier depends on the CPU model, the numbers of cores and NUMA
+    nodes, and the total memory, but not on the currently available memory.
+
+    """
+    key = "{}|{}|{}|{}|{}".format(
+        machine["cpu_model"],
+        machine["physical_cores"],
+        machine["logical_cores"],
+        machine["numa_nodes"],
+        machine["memory_total"] // 2**30,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def network_key(net):
+    """Returns an identifier of the network size of a ``Network``."""
+    return "N_scaling={}|K_scaling={}|num_neurons={}|num_synapses={}".format(
+        net.net_dict["N_scaling"],
+        net.net_dict["K_scaling"],
+        int(net.num_neurons.sum()),
+        int(net.num_synapses.sum()),
+    )
+
+
+def candidate_configurations(machine):
+    """Returns the candidate configurations for a machine.
+
+    The candidates use all physical cores or powers of 2 below, with one
+    MPI process, or one MPI process per NUMA node.
+
+    Returns
+    -------
+    candidates
+        List of tuples (number of MPI processes, threads per MPI process).
+
+    """
+    cores = machine["physical_cores"]
+    total_vps = {cores}
+    vps = 1
+    while vps < cores:
+        total_vps.add(vps)
+        vps *= 2
+
+    candidates = set()
+    for num_ranks in sorted({1, machine["numa_nodes"]}):
+        for vps in total_vps:
+            if vps % num_ranks == 0:
+                candidates.add((num_ranks, vps // num_ranks))
+    return sorted(candidates)
+
+
+def load_cache(cache_file=default_cache_file):
+    """Reads the cache of tuned configurations."""
+    if not os.path.isfile(cache_file):
+        return {}
+    with open(cache_file, "r") as file:
+        return json.load(file)
+
+
+def save_cache(cache, cache_file=default_cache_file):
+    """Writes the cache of tuned configurations."""
+    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+    with open(cache_file, "w") as file:
+        json.dump(cache, file, indent=4)
+
+
+def cached_configuration(net, cache_file=default_cache_file, machine=None):
+    """Returns the cached configuration of a network on the local machine, or ``None``."""
+    if machine is None:
+        machine = machine_info()
+    return load_cache(cache_file).get(fingerprint(machine), {}).get(network_key(net))
+
+
+def local_num_threads(net, num_ranks, cache_file=default_cache_file):
+    """Returns the number of threads per MPI process for a network.
+
+    If a tuned configuration is cached for the machine and the network size,
+    its number of threads is used, scaled to the actual number of MPI
+    processes. Otherwise, the physical cores are divided among the MPI
+    processes.
+
+    Parameters
+    ----------
+    net
+        Network (``Network``).
+    num_ranks
+        Number of MPI processes on the local machine.
+    cache_file
+        Cache of tuned configurations.
+
+    """
+    machine = machine_info()
+    configuration = cached_configuration(net, cache_file, machine)
+    if configuration is not None:
+        total_vps = configuration["num_ranks"] * configuration["local_num_threads"]
+    else:
+        total_vps = machine["physical_cores"]
+    return max(total_vps // num_ranks, 1)
+
+
+def tune(
+    sim_dict,
+    net_dict,
+    stim_dict,
+    t_presim=100.0,
+    t_sim=200.0,
+    mpirun="mpirun -np {ranks}",
+    cache_file=default_cache_file,
+    candidates=None,
+):
+    """Selects the configuration with the smallest real-time factor.
+
+    Parameters
+    ----------
+    sim_dict, net_dict, stim_dict
+        Parameters of the network.
+    t_presim
+        Presimulation time of the calibration simulations (in ms).
+    t_sim
+        Simulation time of the calibration simulations (in ms).
+    mpirun
+        Command prefix to start calibration simulations with more than one
+        MPI process.
+    cache_file
+        Cache of tuned configurations.
+    candidates
+        List of tuples (number of MPI processes, threads per MPI process);
+        the default is ``candidate_configurations()``.
+
+    Returns
+    -------
+    configuration
+        Dictionary with the selected number of MPI processes and threads, its
+        real-time factor, and the results of all candidates. Candidates which
+        exceed the available memory or whose calibration simulation failed
+        have no real-time factor (``None``); the latter contain the error
+        message (``error``).
+
+    """
+    from microcircuit.network import Network
+
+    machine = machine_info()
+    sim_dict_dry = copy.deepcopy(sim_dict)
+    sim_dict_dry["dry_run"] = True
+    net = Network(sim_dict_dry, net_dict, stim_dict)
+
+    if candidates is None:
+        candidates = candidate_configurations(machine)
+
+    results = []
+    for num_ranks, threads in candidates:
+        memory = net.estimate_resources(num_ranks=num_ranks, local_num_threads=threads)["memory_per_rank"]
+        result = {"num_ranks": num_ranks, "local_num_threads": threads, "memory": memory * num_ranks, "rtf": None}
+        if memory * num_ranks > memory_safety_factor * machine["memory_available"]:
+            print("Skipping {} MPI process(es) x {} thread(s): estimated memory exceeds the available memory.".format(
+                num_ranks, threads))
+        else:
+            print("Calibrating {} MPI process(es) x {} thread(s).".format(num_ranks, threads))
+            try:
+                result["rtf"] = calibration_run(
+                    sim_dict, net_dict, stim_dict, num_ranks, threads, t_presim, t_sim, mpirun
+                )
+            except RuntimeError as error:
+                print("Calibration of {} MPI process(es) x {} thread(s) failed:\n{}".format(num_ranks, threads, error))
+                result["error"] = str(error)
+        results.append(result)
+
+    feasible = [result for result in results if result["rtf"] is not None]
+    if len(feasible) == 0:
+        if any("error" in result for result in results):
+            raise RuntimeError("No calibration simulation succeeded (see the errors of the candidates above).")
+        raise RuntimeError("The network does not fit into the available memory of this machine.")
+    best = min(feasible, key=lambda result: result["rtf"])
+
+    configuration = {
+        "num_ranks": best["num_ranks"],
+        "local_num_threads": best["local_num_threads"],
+        "rtf": best["rtf"],
+        "machine": machine,
+        "candidates": results,
+    }
+    cache = load_cache(cache_file)
+    cache.setdefault(fingerprint(machine), {})[network_key(net)] = configuration
+    save_cache(cache, cache_file)
+    return configuration
+
+
+def calibration_run(sim_dict, net_dict, stim_dict, num_ranks, threads, t_presim, t_sim, mpirun):
+    """Runs a short simulation in a separate process and returns its real-time factor.
+
+    A RuntimeError containing the end of the error output is raised if the
+    simulation fails.
+
+    """
+    with tempfile.TemporaryDirectory() as path:
+        sim_dict = copy.deepcopy(sim_dict)
+        sim_dict.update(
+            {
+                "data_path": path + "/",
+                "local_num_threads": threads,
+                "t_presim": t_presim,
+                "presim_mode": "fixed",
+                "t_sim": t_sim,
+                "rec_dev": [],
+                "print_time": False,
+                "store_metadata": False,
+                "dry_run": False,
+                "trace": False,
+                "energy_meter": None,
+            }
+        )
+        parameters = os.path.join(path, "parameters.pkl")
+        with open(parameters, "wb") as file:
+            pickle.dump({"sim_dict": sim_dict, "net_dict": net_dict, "stim_dict": stim_dict}, file)
+
+        command = [sys.executable, "-m", "microcircuit.tuner", parameters]
+        if num_ranks > 1:
+            command = mpirun.format(ranks=num_ranks).split() + command
+        process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if process.returncode != 0:
+            stderr = "\n".join(process.stderr.strip().splitlines()[-20:])
+            raise RuntimeError("Exit code {}:\n{}".format(process.returncode, stderr))
+
+        with open(os.path.join(path, "benchmark.json"), "r") as file:
+            return json.load(file)["summary"]["real_time_factor"]
+
+
+def _calibration_worker(parameters):
+    from microcircuit.network import Network
+
+    with open(parameters, "rb") as file:
+        dicts = pickle.load(file)
+
+    net = Network(dicts["sim_dict"], dicts["net_dict"], dicts["stim_dict"])
+    net.create()
+    net.connect()
+    net.presimulate()
+    net.simulate(dicts["sim_dict"]["t_sim"])
+    net.store_benchmark()
+
+
+if __name__ == "__main__":
+    _calibration_worker(sys.argv[1])
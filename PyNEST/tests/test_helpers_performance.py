@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#
+# test_helpers_performance.py
+#
+# This file is part of https://github.com/INM-6/microcircuit-PD14-model
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+'''
+Performance regression tests of the analysis functions in microcircuit.helpers.
+
+The tests do not require NEST. They generate synthetic spike files in the
+format of the NEST ASCII recording backend (Poisson spike trains) at several
+scales, time the loading and the analysis of the spike data, and compare the
+run times with the baselines in baselines/helpers_performance.json.
+
+Run times are normalized by the run time of a fixed numpy reference workload,
+such that the baselines are (roughly) transferable across machines. A test
+fails if a normalized run time exceeds its baseline by more than a tolerance
+factor.
+
+Environment variables:
+
+* MICROCIRCUIT_PERF_SCALES: comma-separated list of scales (default
+  "small,medium"; "large" takes minutes),
+* MICROCIRCUIT_PERF_TOLERANCE: tolerance factor (default 3),
+* MICROCIRCUIT_PERF_UPDATE: if set to 1, the baselines are (re)written
+  instead of compared. Scales without a baseline are skipped otherwise.
+'''
+
+#####################
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+## does not import NEST
+from microcircuit import helpers
+
+#####################
+
+baseline_file = os.path.join(os.path.dirname(__file__), "baselines", "helpers_performance.json")
+
+## synthetic data sets: number of neurons, duration (ms), firing rate (spikes/s),
+## number of spike files (virtual processes), number of neurons in correlation analysis
+scales = {
+    "small": {"num_neurons": 500, "duration": 2000.0, "rate": 5.0, "num_files": 4, "num_cc_neurons": 100},
+    "medium": {"num_neurons": 2000, "duration": 5000.0, "rate": 5.0, "num_files": 8, "num_cc_neurons": 200},
+    "large": {"num_neurons": 20000, "duration": 10000.0, "rate": 5.0, "num_files": 16, "num_cc_neurons": 500},
+}
+
+label = "spike_recorder"
+binsize = 2.0  ## bin size of spike counts (ms)
+repetitions = 3  ## the minimum run time across repetitions is compared
+min_baseline = 0.5  ## shorter (normalized) run times are dominated by timing noise
+
+selected_scales = os.environ.get("MICROCIRCUIT_PERF_SCALES", "small,medium").split(",")
+tolerance = float(os.environ.get("MICROCIRCUIT_PERF_TOLERANCE", 3.0))
+update = os.environ.get("MICROCIRCUIT_PERF_UPDATE", "0") == "1"
+
+#####################
+
+
+def write_spike_files(path, num_neurons, duration, rate, num_files, seed=12345):
+    '''
+    Write Poisson spike trains in the format of the NEST ASCII recording backend.
+
+    Neuron n is recorded by virtual process n % num_files, as in NEST.
+    '''
+    rng = np.random.default_rng(seed)
+    senders = np.arange(1, num_neurons + 1)
+    counts = rng.poisson(rate * duration * 1e-3, num_neurons)
+    spike_senders = np.repeat(senders, counts)
+    spike_times = np.round(rng.uniform(0.1, duration, counts.sum()), 1)
+    order = np.argsort(spike_times, kind="stable")
+    spike_senders = spike_senders[order]
+    spike_times = spike_times[order]
+
+    header = "NEST version: 3\nRecordingBackendASCII\nsender\ttime_ms"
+    for vp in range(num_files):
+        ind = spike_senders % num_files == vp
+        np.savetxt(
+            os.path.join(path, "%s-%d-%d.dat" % (label, num_neurons + 1, vp)),
+            np.column_stack([spike_senders[ind], spike_times[ind]]),
+            fmt=["%d", "%.3f"],
+            delimiter="\t",
+            header=header,
+        )
+    return senders
+
+
+def best_time(function, *args, **kwargs):
+    '''
+    Minimum run time (s) of a function across repetitions, and its result.
+    '''
+    times = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def reference_time():
+    '''
+    Run time (s) of the numpy reference workload.
+    '''
+    rng = np.random.default_rng(0)
+    data = rng.uniform(size=500000)
+
+    def workload():
+        np.sort(data)
+        np.histogram(data, 1000)
+        np.where(data < 0.5)
+
+    return best_time(workload)[0]
+
+
+def load_baselines():
+    if not os.path.isfile(baseline_file):
+        return {}
+    with open(baseline_file, "r") as file:
+        return json.load(file)
+
+
+def store_baselines(scale, timings):
+    baselines = load_baselines()
+    baselines[scale] = timings
+    os.makedirs(os.path.dirname(baseline_file), exist_ok=True)
+    with open(baseline_file, "w") as file:
+        json.dump(baselines, file, indent=4, sort_keys=True)
+
+
+def normalized_timings(path, num_neurons, duration, num_cc_neurons, **kwargs):
+    '''
+    Run times of the analysis functions, normalized by the run time of the reference workload.
+    '''
+    pop = np.arange(1, num_neurons + 1)
+    cc_pop = pop[:num_cc_neurons]
+    interval = (0.0, duration)
+
+    timings = {}
+    timings["load_spike_data"], spikes = best_time(helpers.load_spike_data, path, label, time_interval=interval)
+    timings["time_averaged_single_neuron_firing_rates"], rates = best_time(
+        helpers.time_averaged_single_neuron_firing_rates, spikes, pop, interval
+    )
+    timings["single_neuron_isi_cvs"], cvs = best_time(helpers.single_neuron_isi_cvs, spikes, pop, interval)
+    timings["generate_spike_counts"], _ = best_time(helpers.generate_spike_counts, spikes, cc_pop, interval, binsize)
+    timings["pairwise_spike_count_correlations"], ccs = best_time(
+        helpers.pairwise_spike_count_correlations, spikes, cc_pop, interval, binsize
+    )
+    timings["data_distribution"], _ = best_time(helpers.data_distribution, np.array(rates), "rates", "spikes/s")
+
+    ## sanity checks of the results
+    assert len(spikes["times"]) > 0
+    assert len(rates) == num_neurons
+    assert len(cvs) > 0
+    assert len(ccs) == num_cc_neurons * (num_cc_neurons - 1) // 2
+
+    t_ref = reference_time()
+    return {name: round(t / t_ref, 4) for name, t in timings.items()}
+
+
+#####################
+
+
+@pytest.mark.parametrize("scale", [scale for scale in scales if scale in selected_scales])
+def test_helpers_performance(scale, tmp_path):
+    '''
+    Checks that the analysis functions do not run slower than their baselines.
+    '''
+    baselines = load_baselines().get(scale)
+    if baselines is None and not update:
+        pytest.skip("No baseline for scale '%s' in %s; record it with MICROCIRCUIT_PERF_UPDATE=1." % (scale, baseline_file))
+
+    parameters = scales[scale]
+    write_spike_files(
+        str(tmp_path), parameters["num_neurons"], parameters["duration"], parameters["rate"], parameters["num_files"]
+    )
+    timings = normalized_timings(str(tmp_path) + "/", **parameters)
+
+    if update:
+        store_baselines(scale, timings)
+        return
+
+    regressions = [
+        "%s: %.2f (baseline %.2f)" % (name, timings[name], baselines[name])
+        for name in sorted(timings)
+        if name in baselines and timings[name] > tolerance * max(baselines[name], min_baseline)
+    ]
+    assert len(regressions) == 0, "Normalized run times exceed %g times the baselines:\n%s" % (
+        tolerance,
+        "\n".join(regressions),
+    )
@@ -11,12 +11,27 @@ Unit test including network creation, connection and simulation.
 '''
 
 #####################
+import copy
+import importlib
+import mmap
+import os
+import time
+
 import nest
 import pytest
 import numpy as np
 
 ## import model implementation
+from microcircuit import benchmark
+from microcircuit import connectivity
+from microcircuit import energy
+from microcircuit import helpers
 from microcircuit import network
+from microcircuit import provenance
+from microcircuit import registry
+from microcircuit import resources
+from microcircuit import result_cache
+from microcircuit import tuner
 
 ## import (default) parameters (network, simulation, stimulus)
 from microcircuit.network_params import default_net_dict as net_dict
@@ -30,6 +45,39 @@ scaling_factor = 0.2
 net_dict['N_scaling'] = scaling_factor
 net_dict['K_scaling'] = scaling_factor
 
+def small_network(tmp_path=None, **sim_params):
+    '''
+    Parameters of a downscaled network (2% of the neurons and indegrees) with Poisson background input,
+    which spikes within short simulations. The simulation parameters are updated by 'sim_params';
+    the data is stored in 'tmp_path'.
+    '''
+    sim_dict_small = copy.deepcopy(sim_dict)
+    if tmp_path is not None:
+        sim_dict_small['data_path'] = str(tmp_path) + '/'
+    sim_dict_small.update(sim_params)
+    net_dict_small = copy.deepcopy(net_dict)
+    net_dict_small.update({'N_scaling': 0.02, 'K_scaling': 0.02, 'bg_input_type': 'poisson'})
+    return sim_dict_small, net_dict_small
+
+@pytest.fixture(scope='module')
+def benchmark_run(tmp_path_factory):
+    '''
+    Benchmark data of a run with a presimulation and two simulate() calls, with energy measurement and timeline.
+    '''
+    path = tmp_path_factory.mktemp('benchmark')
+    sim_dict_benchmark, net_dict_small = small_network(path, t_presim=50.0, energy_meter='fake', trace=True)
+
+    net = network.Network(sim_dict_benchmark, net_dict_small, stim_dict)
+    net.create()
+    net.connect()
+    net.presimulate()
+    net.simulate(100.0)
+    net.simulate(100.0)
+    net.store_benchmark()
+
+    return {'net': net, 'net_dict': net_dict_small, 'path': path, 'data': helpers.json2dict(str(path / 'benchmark.json')),
+            'num_spikes': np.sum(net.spike_recorders.n_events), 'num_connections': nest.num_connections}
+
 def test_simulation():
     
     ## set simulation time
@@ -67,6 +115,559 @@ def test_simulation():
     print('')
     print('======================================')
 
+def test_adaptive_presimulation(tmp_path):
+
+    ## adaptive warm-up with an upper bound of 300 ms
+    sim_dict_adaptive = copy.deepcopy(sim_dict)
+    sim_dict_adaptive.update({
+        'data_path': str(tmp_path) + '/',
+        'presim_mode': 'adaptive',
+        't_presim_window': 50.0,
+        't_presim_max': 300.0,
+    })
+
+    net = network.Network(sim_dict_adaptive, net_dict, stim_dict)
+    net.create()
+    net.connect()
+    t_presim = net.presimulate()
+
+    assert 0.0 < t_presim <= sim_dict_adaptive['t_presim_max']
+    assert t_presim % sim_dict_adaptive['t_presim_window'] == 0.0
+    assert len(net.presim_rates) == t_presim / sim_dict_adaptive['t_presim_window']
+    assert nest.biological_time == t_presim
+
+    ## without stationarity, the presimulation stops at the last full window before the upper bound
+    sim_dict_adaptive.update({'t_presim_max': 280.0, 'presim_stationary_windows': 100})
+    net = network.Network(sim_dict_adaptive, net_dict, stim_dict)
+    net.create()
+    net.connect()
+    with pytest.warns(UserWarning):
+        assert net.presimulate() == 250.0
+
+def test_batched_create(tmp_path):
+
+    sim_dict_batched = copy.deepcopy(sim_dict)
+    sim_dict_batched.update({'data_path': str(tmp_path) + '/', 'batched_create': True})
+
+    net = network.Network(sim_dict_batched, net_dict, stim_dict)
+    net.create()
+
+    ## populations are contiguous, correctly sized and parameterized
+    assert [len(pop) for pop in net.pops] == list(net.num_neurons)
+    for i, pop in enumerate(net.pops[1:]):
+        assert pop[0].global_id == net.pops[i][-1].global_id + 1
+    for i, pop in enumerate(net.pops):
+        assert np.allclose(pop.get('I_e'), net.DC_amp[i])
+
+def test_spike_data_in_memory(tmp_path):
+
+    sim_dict_memory, net_dict_small = small_network(tmp_path, t_presim=50.0, spike_record_to='memory')
+
+    net = network.Network(sim_dict_memory, net_dict_small, stim_dict)
+    net.create()
+    net.connect()
+    net.presimulate()
+    net.simulate(100.0)
+    spikes = net.spike_data()
+
+    ## no spike files, all recorded spikes in memory
+    assert not any(name.startswith('spike_recorder') for name in os.listdir(tmp_path))
+    assert [len(pop_spikes['times']) for pop_spikes in spikes] == list(net.spike_recorders.n_events)
+    assert all(np.all(np.diff(pop_spikes['times']) >= 0) for pop_spikes in spikes)
+
+    ## analysis of the spikes in the simulation phase only
+    rates = helpers.time_averaged_single_neuron_firing_rates(spikes[0], net.pops[0].tolist(), (50.0, 150.0))
+    in_interval = (spikes[0]['times'] >= 50.0) & (spikes[0]['times'] <= 150.0)
+    assert np.isclose(np.sum(rates) * 0.1, np.sum(in_interval))
+
+def test_observable_store(tmp_path):
+
+    observable = {0: {'L23E': [1.0, 2.5, np.nan], 'L23I': []}, 1: {'L23E': np.arange(3), 'L23I': [0.5]}}
+    helpers.dict2npz(observable, str(tmp_path / 'observable.npz'))
+    loaded = helpers.npz2dict(str(tmp_path / 'observable.npz'))
+
+    assert sorted(loaded) == ['0', '1']
+    for seed in observable:
+        for pop, values in observable[seed].items():
+            assert loaded[str(seed)][pop].dtype == np.float32
+            assert np.array_equal(loaded[str(seed)][pop], np.asarray(values, dtype=np.float32), equal_nan=True)
+
+def test_statistics_cache(tmp_path, monkeypatch):
+
+    rng = np.random.default_rng(1)
+    spikes = {'senders': rng.integers(1, 11, 2000), 'times': np.sort(rng.uniform(0.0, 1000.0, 2000))}
+    fingerprint = helpers.spike_data_fingerprint(spikes=spikes)
+    cache = helpers.StatisticsCache(str(tmp_path / 'statistics'))
+
+    def load():
+        load.calls += 1
+        return spikes
+    load.calls = 0
+
+    ## the second call reloads the result without loading the spike data
+    args = (helpers.pairwise_spike_count_correlations, fingerprint, load, range(1, 11), (100.0, 900.0), 2.0)
+    ccs = cache.compute(*args)
+    assert np.array_equal(cache.compute(*args), ccs, equal_nan=True)
+    assert (cache.hits, cache.misses, load.calls) == (1, 1, 1)
+    assert np.allclose(ccs, helpers.pairwise_spike_count_correlations(spikes, range(1, 11), (100.0, 900.0), 2.0), equal_nan=True)
+
+    ## other bin sizes and spike data are computed anew
+    cache.compute(*args[:-1], 1.0)
+    spikes['times'] = spikes['times'] + 1.0
+    assert helpers.spike_data_fingerprint(spikes=spikes) != fingerprint
+    assert (cache.misses, load.calls) == (2, 2)
+
+    ## the least recently used results are removed first
+    key = cache.key(helpers.pairwise_spike_count_correlations, fingerprint, range(1, 11), (100.0, 900.0), 2.0)
+    os.utime(tmp_path / 'statistics' / (key + '.npy'), (0, 0))
+    cache.evict(cache.size() - 1)
+    assert not (tmp_path / 'statistics' / (key + '.npy')).exists()
+    cache.compute(*args)
+    assert cache.misses == 3
+
+    ## results of a changed implementation are computed anew
+    statistic = tmp_path / 'statistic.py'
+    statistic.write_text('import numpy as np\ndef count(spikes, pop, interval):\n    return np.array([len(spikes)])\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module('statistic')
+    cache.compute(module.count, fingerprint, spikes, range(1, 11), (100.0, 900.0))
+    statistic.write_text('import numpy as np\ndef count(spikes, pop, interval):\n    return np.array([len(spikes) + 1])\n')
+    module = importlib.reload(module)
+    cache = helpers.StatisticsCache(str(tmp_path / 'statistics'))
+    assert cache.compute(module.count, fingerprint, spikes, range(1, 11), (100.0, 900.0))[0] == 3
+    assert cache.misses == 1
+
+def test_node_ranges(tmp_path):
+
+    neurons = nest.Create('iaf_psc_exp', 5)
+    nodes = {'pop': helpers.encode_node_ids(neurons), 'subset': helpers.encode_node_ids(neurons[[0, 2]])}
+    assert nodes['pop'] == {'first': neurons[0].global_id, 'last': neurons[-1].global_id}
+
+    helpers.dict2json(nodes, str(tmp_path / 'nodes.json'))
+    loaded = helpers.load_nodes(str(tmp_path / 'nodes.json'))
+    assert list(loaded['pop']) == neurons.tolist()
+    assert list(loaded['subset']) == neurons[[0, 2]].tolist()
+
+def test_result_cache(tmp_path, monkeypatch):
+
+    ## canonical keys: independent of container types, sensitive to array data types
+    key = result_cache.cache_key({'a': (1.0, 2.0)}, {'b': np.arange(3)}, {}, '3.10', 4)
+    assert key == result_cache.cache_key({'a': [1.0, 2.0]}, {'b': np.arange(3)}, {}, '3.10', 4)
+    assert key != result_cache.cache_key({'a': [1.0, 2.0]}, {'b': np.arange(3.0)}, {}, '3.10', 4)
+    assert key != result_cache.cache_key({'a': [1.0, 2.0]}, {'b': np.arange(3)}, {}, '3.10', 8)
+    assert key == result_cache.cache_key({'a': (1.0, 2.0), 'trace': True, 'energy_meter': 'fake'}, {'b': np.arange(3)}, {},
+                                         '3.10', 4)
+
+    sim_dict_cache, net_dict_small = small_network(t_presim=50.0, t_sim=50.0, result_cache=str(tmp_path / 'cache'),
+                                                   run_registry=None, provenance_cache=str(tmp_path / 'provenance.json'))
+
+    def run(path):
+        sim_dict_cache['data_path'] = str(path) + '/'
+        net = network.Network(sim_dict_cache, net_dict_small, stim_dict)
+        net.create()
+        net.connect()
+        net.presimulate()
+        net.simulate(sim_dict_cache['t_sim'])
+        net.store_metadata()
+        return net
+
+    ## the second run restores the output files of the first
+    first = run(tmp_path / 'first')
+    second = run(tmp_path / 'second')
+    assert not first.cached and second.cached
+    assert second.t_presim == first.t_presim
+    assert sorted(os.listdir(tmp_path / 'second')) == sorted(os.listdir(tmp_path / 'first'))
+    for name in os.listdir(tmp_path / 'first'):
+        if name.startswith('spike_recorder'):
+            assert (tmp_path / 'second' / name).read_bytes() == (tmp_path / 'first' / name).read_bytes()
+
+    ## results of a changed code are not restored
+    (tmp_path / 'package').mkdir()
+    (tmp_path / 'package' / 'network.py').write_text('version = 1\n')
+    version = result_cache.code_version(str(tmp_path / 'package'))
+    (tmp_path / 'package' / 'network.py').write_text('version = 2\n')
+    assert result_cache.code_version(str(tmp_path / 'package')) != version
+    monkeypatch.setattr(result_cache, 'code_version', lambda: version)
+    changed = run(tmp_path / 'changed')
+    assert not changed.cached and changed.cache_key != first.cache_key
+
+    ## least recently used entries are evicted first
+    cache = result_cache.ResultCache(str(tmp_path / 'cache'))
+    cache.store('other', str(tmp_path / 'first'))
+    assert [entry['key'] for entry in cache.entries()] == ['other', changed.cache_key, first.cache_key]
+    assert cache.evict(cache.size() - 1) == [first.cache_key]
+    assert sorted(cache.purge()) == sorted(['other', changed.cache_key]) and cache.size() == 0
+
+def test_run_registry(tmp_path):
+
+    registry_file = str(tmp_path / 'runs.sqlite')
+    for seed in [1, 2]:
+        sim_dict_registry, net_dict_small = small_network(tmp_path / f'seed-{seed}', rng_seed=seed, t_presim=50.0,
+                                                          t_sim=100.0, run_registry=registry_file,
+                                                          provenance_cache=str(tmp_path / 'provenance.json'))
+        net = network.Network(sim_dict_registry, net_dict_small, stim_dict)
+        net.create()
+        net.connect()
+        net.presimulate()
+        net.simulate(sim_dict_registry['t_sim'])
+        net.store_metadata()
+
+    runs = registry.query(['K_scaling=0.02', 'real_time_factor>0'], registry_file=registry_file)
+    assert [run['rng_seed'] for run in runs] == [1, 2]
+    assert runs[1]['t_sim'] == 100.0 and runs[1]['time_simulate'] > 0.0 and runs[1]['memory_peak'] > 0
+    rates = net.population_rates()
+    assert runs[1]['rates'] == pytest.approx(rates)
+    assert runs[1]['mean_rate'] == pytest.approx(np.mean(list(rates.values())))
+
+    ## re-registering a data directory replaces its entry
+    registry.register_directory(str(tmp_path / 'seed-2'), registry_file)
+    runs = registry.query(['rng_seed>=2'], order_by='-id', registry_file=registry_file)
+    assert len(runs) == 1 and runs[0]['rates'] is None
+    assert runs[0]['nest_version'] == nest.__version__
+    assert registry.remove(['rng_seed=1'], registry_file) == 1
+
+    ## runs of earlier versions without benchmark.json are registered without times and memory
+    os.remove(tmp_path / 'seed-2' / 'benchmark.json')
+    registry.register_directory(str(tmp_path / 'seed-2'), registry_file)
+    run = registry.query(['rng_seed=2'], registry_file=registry_file)[0]
+    assert run['t_sim'] == 100.0 and run['time'] is not None
+    assert run['time_simulate'] is None and run['real_time_factor'] is None and run['memory_peak'] is None
+    with pytest.raises(FileNotFoundError):
+        registry.register_directory(str(tmp_path), registry_file)
+    with pytest.raises(ValueError):
+        registry.query(['N_scaling; DROP TABLE runs'], registry_file=registry_file)
+
+def test_connection_plan():
+
+    num_synapses = np.array([[10, 0], [5, 20]])
+    weights = np.array([[87.8, -351.2], [87.8, -351.2]])
+    delays = np.array([[1.5, 0.75], [1.5, 0.75]])
+    plan = connectivity.ConnectionPlan(num_synapses, weights, 0.1, delays, 0.5)
+
+    ## projections without synapses are dropped
+    assert len(plan) == 3
+    assert [(projection.target, projection.source) for projection in plan] == [(0, 0), (1, 0), (1, 1)]
+    assert plan.total_num_synapses == 35
+    inhibitory = plan.projections[2]
+    assert inhibitory.weight_mean < 0 and inhibitory.weight_std > 0
+
+def test_connectome_export_and_reload(tmp_path):
+
+    sim_dict_export, net_dict_small = small_network(tmp_path)
+
+    ## randomized connectivity
+    net = network.Network(sim_dict_export, net_dict_small, stim_dict)
+    net.create()
+    net.connect()
+    conns = nest.GetConnections(target=net.pops[2])
+    weights = sorted(conns.weight)
+    net.export_connectome()
+
+    ## connectivity restored from the exported arrays
+    sim_dict_reload = copy.deepcopy(sim_dict_export)
+    sim_dict_reload['connectome_path'] = str(tmp_path)
+    net = network.Network(sim_dict_reload, net_dict_small, stim_dict)
+    net.create()
+    net.connect()
+
+    assert sorted(nest.GetConnections(target=net.pops[2]).weight) == weights
+
+def test_dry_run_resource_estimate():
+
+    sim_dict_dry = copy.deepcopy(sim_dict)
+    sim_dict_dry['dry_run'] = True
+
+    net = network.Network(sim_dict_dry, net_dict, stim_dict)
+    with pytest.raises(RuntimeError):
+        net.create()
+
+    ## memory per process decreases with the number of processes
+    estimate_1 = net.estimate_resources(num_ranks=1)
+    estimate_4 = net.estimate_resources(num_ranks=4)
+    assert estimate_4['memory_per_rank'] < estimate_1['memory_per_rank']
+    assert estimate_1['num_neurons'] == np.sum(net.num_neurons)
+
+    ## calibration recovers the coefficients of synthetic measurements
+    calibration = {'base': 1.0e8, 'per_thread': 1.0e6, 'per_neuron': 2.0e4, 'per_synapse': 40.0}
+    measurements = []
+    for num_neurons, num_synapses, num_ranks, threads in [(1e4, 3e6, 1, 4), (4e4, 5e7, 2, 8), (8e4, 3e8, 4, 4), (2e4, 1e7, 1, 2)]:
+        memory = (calibration['base'] + calibration['per_thread'] * threads
+                  + (calibration['per_neuron'] * num_neurons + calibration['per_synapse'] * num_synapses) / num_ranks)
+        measurements.append({'num_neurons': num_neurons, 'num_synapses': num_synapses, 'num_ranks': num_ranks,
+                             'local_num_threads': threads, 'memory': memory})
+    fitted = resources.calibrate(measurements)
+    for key, value in calibration.items():
+        assert np.isclose(fitted[key], value)
+
+def test_calibration_from_stored_runs(tmp_path):
+
+    ## memory per process (maximum across processes) and network size from benchmark.json
+    for run, (num_neurons, num_synapses, memory_peaks) in enumerate([(1e4, 3e6, [5e8, 6e8]), (4e4, 5e7, [2e9, 2e9]), (8e4, 3e8, [7e9, 7e9])]):
+        (tmp_path / str(run)).mkdir()
+        helpers.dict2json({'num_ranks': 2, 'local_num_threads': 4, 'num_neurons': num_neurons, 'num_synapses': num_synapses,
+                           'ranks': [{'memory_peak': peak} for peak in memory_peaks]},
+                          str(tmp_path / str(run) / 'benchmark.json'))
+    (tmp_path / 'without_benchmark').mkdir()
+    measurements = resources.load_measurements([str(tmp_path / name) for name in ['0', '1', '2', 'without_benchmark']])
+    assert measurements == [
+        {'num_neurons': 1e4, 'num_synapses': 3e6, 'num_ranks': 2, 'local_num_threads': 4, 'memory': 6e8},
+        {'num_neurons': 4e4, 'num_synapses': 5e7, 'num_ranks': 2, 'local_num_threads': 4, 'memory': 2e9},
+        {'num_neurons': 8e4, 'num_synapses': 3e8, 'num_ranks': 2, 'local_num_threads': 4, 'memory': 7e9},
+    ]
+    assert resources.calibrate(measurements)['per_synapse'] > 0.0
+
+def test_benchmark(benchmark_run):
+
+    data = benchmark_run['data']
+    assert list(data['summary']['times']) == ['init', 'create', 'connect', 'presimulate', 'simulate']
+    assert data['summary']['t_model'] == 200.0
+    assert np.isclose(data['summary']['real_time_factor'], data['summary']['times']['simulate'] / 0.2)
+    assert len(data['ranks']) == nest.NumProcesses()
+    assert data['num_neurons'] == np.sum(benchmark_run['net'].num_neurons)
+    assert data['num_synapses'] == benchmark_run['num_connections']
+
+def test_kernel_timers(benchmark_run):
+
+    ## kernel timers are captured per nest.Simulate() call
+    data = benchmark_run['data']
+    calls = data['ranks'][0]['kernel_calls']
+    assert [call['phase'] for call in calls] == ['presimulate', 'simulate', 'simulate']
+    assert all(call['kernel_times']['time_simulate'] > 0.0 for call in calls)
+    assert np.isclose(data['summary']['kernel_times']['simulate']['time_simulate'],
+                      sum(call['kernel_times']['time_simulate'] for call in calls[1:]))
+
+def test_synaptic_events(benchmark_run):
+
+    ## synaptic events from the recorded spikes and the expected Poisson input
+    net = benchmark_run['net']
+    events = benchmark_run['data']['summary']['synaptic_events']['simulate']
+    assert 0.0 < events['recurrent'] <= benchmark_run['num_spikes'] * np.max(np.sum(net.num_synapses, axis=0) / net.num_neurons)
+    assert np.isclose(events['poisson'],
+                      np.sum(net.num_neurons * net.ext_indegrees) * benchmark_run['net_dict']['bg_rate'] * 0.2)
+
+def test_phase_memory(benchmark_run):
+
+    ## peak and final memory of every phase
+    rank_data = benchmark_run['data']['ranks'][0]
+    for phase in ['init', 'create', 'connect', 'presimulate', 'simulate']:
+        memory = rank_data['memory'][phase]
+        assert 0 < memory['end'] <= memory['peak'] <= rank_data['memory_peak']
+
+def test_energy_per_synaptic_event(benchmark_run):
+
+    summary = benchmark_run['data']['summary']
+    energy_simulate = summary['energy']['simulate']
+    ## the fake meter has a power of 100 W over the simulated model time of 200 ms
+    assert np.isclose(energy_simulate, 20.0)
+    assert np.isclose(summary['energy']['presimulate'], 5.0)
+    assert np.isclose(summary['energy_per_synaptic_event']['simulate'],
+                      energy_simulate / summary['synaptic_events']['simulate']['total'])
+
+def test_benchmark_without_spike_recorders(tmp_path):
+
+    ## synaptic events are only derived from recorded spikes
+    sim_dict_benchmark, net_dict_small = small_network(tmp_path, t_presim=50.0, rec_dev=[], energy_meter='fake')
+    net = network.Network(sim_dict_benchmark, net_dict_small, stim_dict)
+    net.create()
+    net.connect()
+    net.presimulate()
+    net.simulate(100.0)
+    summary = net.store_benchmark()['summary']
+    assert summary['synaptic_events'] == {} and summary['energy_per_synaptic_event'] == {}
+    assert np.isclose(summary['energy']['simulate'], 10.0)
+    assert net.population_rates() is None
+
+def test_trace(benchmark_run):
+
+    ## timeline with the phases, each projection and each simulate call
+    path = benchmark_run['path']
+    benchmark.merge_traces(benchmark.trace_filenames(str(path)), str(path / 'trace.json'))
+    events = helpers.json2dict(str(path / 'trace.json'))['traceEvents']
+    names = [event['name'] for event in events if event['ph'] == 'X']
+    simulate = [event for event in events if event['name'] == 'nest.Simulate']
+    assert sum(event['tid'] < benchmark.nest_thread_lane for event in simulate) == 3
+    assert all('time_simulate' in event['args']['kernel_times'] for event in simulate if 'args' in event)
+
+    ## one lane per NEST thread with the simulate calls
+    thread_names = {event['tid']: event['args']['name'] for event in events if event['name'] == 'thread_name'}
+    assert thread_names[benchmark.nest_thread_lane] == 'NEST thread 0'
+    assert sum(event['tid'] == benchmark.nest_thread_lane for event in simulate) == 3
+    assert 'L23E -> L4I' in names
+    assert sum(event.get('cat') == 'connect' and '->' in event['name'] for event in events) == len(benchmark_run['net'].connection_plan)
+    assert {'init', 'create', 'connect', 'nest.Prepare', 'presimulate', 'simulate'} <= set(names)
+    assert min(event['ts'] for event in events if 'ts' in event) == 0.0
+
+def test_kernel_trace_events():
+
+    ## the phases of the simulation loop per thread follow each other within the call
+    bench = benchmark.Benchmark(memory_sampling_interval=None)
+    kernel_times = {'time_simulate': 1.0, 'time_update': [0.25, 0.5], 'time_deliver_spike_data': [0.5, 0.25]}
+    bench.add_kernel_trace_events('nest.Simulate', 'simulate', 10.0, 11.0, kernel_times, 2)
+    events = bench.trace(0, 'host')['traceEvents']
+    lane = [(event['name'], event['ts'] * 1e-6, event['dur'] * 1e-6) for event in events
+            if event.get('tid') == benchmark.nest_thread_lane + 1 and event['ph'] == 'X']
+    assert lane == [('nest.Simulate', 10.0, 1.0), ('update', 10.0, 0.5), ('deliver_spike_data', 10.5, 0.25)]
+    assert [event['args']['name'] for event in events if event['name'] == 'thread_name'] == ['NEST thread 0',
+                                                                                            'NEST thread 1']
+
+def test_load_imbalance(tmp_path):
+
+    ## 2 populations (node IDs 1-6 and 7-10) on 2 VPs, spikes of VP 0 in two recorder files
+    (tmp_path / 'population_nodeids.dat').write_text('1 6\n7 10\n')
+    header = '# NEST\n# RecordingBackendASCII\nsender\ttime_ms\n'
+    (tmp_path / 'spike_recorder-11-0.dat').write_text(header + '2\t1.0\n2\t2.0\n4\t3.0\n')
+    (tmp_path / 'spike_recorder-12-0.dat').write_text(header + '8\t1.5\n')
+    (tmp_path / 'spike_recorder-11-1.dat').write_text(header)
+    (tmp_path / 'spike_recorder-12-1.dat').write_text(header + '9\t2.5\n')
+
+    report = helpers.load_imbalance(str(tmp_path) + '/', 'spike_recorder', 2, indegrees=[10.0, 20.0],
+                                    candidate_num_vps=[1, 2, 4])
+    assert list(report['neurons_per_vp']) == [5, 5]
+    assert list(report['spikes_per_vp']) == [4, 1]
+    assert list(report['synapses_per_vp']) == [70, 70]
+    assert np.isclose(report['imbalance']['spikes'], 1.6)
+    assert report['candidates'][1] == 1.0
+    assert len(report['recommendations']) > 0
+
+def test_tuner(tmp_path):
+
+    machine = {'cpu_model': 'test', 'physical_cores': 6, 'logical_cores': 12, 'numa_nodes': 2,
+               'memory_total': 2**34, 'memory_available': 2**33}
+    assert tuner.candidate_configurations(machine) == [(1, 1), (1, 2), (1, 4), (1, 6), (2, 1), (2, 2), (2, 3)]
+
+    ## calibration runs select a configuration and cache it for 'auto'
+    sim_dict_tune, net_dict_small = small_network(local_num_threads='auto')
+    cache_file = str(tmp_path / 'tuner.json')
+    configuration = tuner.tune(sim_dict_tune, net_dict_small, stim_dict, t_presim=10.0, t_sim=20.0,
+                               cache_file=cache_file, candidates=[(1, 1), (1, 2)])
+    assert configuration['local_num_threads'] in [1, 2]
+    assert all(result['rtf'] > 0.0 for result in configuration['candidates'])
+
+    ## a failing calibration run is recorded without a real-time factor
+    failed = tuner.tune(sim_dict_tune, net_dict_small, stim_dict, t_presim=10.0, t_sim=20.0,
+                        mpirun='false {ranks}', cache_file=str(tmp_path / 'tuner_failed.json'),
+                        candidates=[(1, 1), (2, 1)])
+    assert failed['num_ranks'] == 1
+    assert failed['candidates'][1]['rtf'] is None and 'error' in failed['candidates'][1]
+
+    sim_dict_tune['dry_run'] = True
+    net = network.Network(sim_dict_tune, net_dict_small, stim_dict)
+    assert tuner.local_num_threads(net, 1, cache_file=cache_file) == configuration['local_num_threads']
+
+def test_provenance(tmp_path, monkeypatch):
+
+    cache_file = str(tmp_path / 'provenance_cache.json')
+    data = provenance.collect(cache_file)
+    assert any(package['name'].lower() == 'numpy' for package in data['packages'])
+    assert data['nest']['version'] == nest.__version__
+    assert data['mpi']['num_processes'] == nest.NumProcesses()
+    assert len(data['mpi']['hosts']) == nest.NumProcesses()
+
+    ## the cached inventory is used as long as the environment is unchanged
+    def distributions():
+        raise AssertionError('package inventory not cached')
+    monkeypatch.setattr(provenance.importlib.metadata, 'distributions', distributions)
+    assert provenance.package_inventory(cache_file) == data['packages']
+
+    provenance.write_requirements(data['packages'], str(tmp_path / 'requirements.txt'))
+    assert len((tmp_path / 'requirements.txt').read_text().splitlines()) == len(data['packages'])
+
+def test_memory_tracker():
+
+    tracker = benchmark.MemoryTracker(interval=0.01)
+    rss = [100]
+    maxrss = [1000]
+    tracker.rss = lambda: rss[0]
+    tracker.maxrss = lambda: maxrss[0]
+    tracker.hwm = lambda: None
+
+    ## without a resettable high-water mark, a temporary peak below ru_maxrss is found by sampling
+    state = tracker.start()
+    rss[0] = 500
+    time.sleep(0.1)
+    rss[0] = 200
+    assert tracker.stop(state) == {'peak': 500, 'end': 200}
+
+    ## a new high-water mark is the peak, even if it is missed by sampling
+    state = tracker.start()
+    maxrss[0] = 2000
+    assert tracker.stop(state) == {'peak': 2000, 'end': 200}
+
+    ## the high-water mark is reset per interval; the peak before a nested interval belongs to the enclosing one
+    tracker = benchmark.MemoryTracker(interval=None)
+    hwm = [1000]
+    tracker.rss = lambda: rss[0]
+    tracker.hwm = lambda: hwm[0]
+    def reset_hwm():
+        hwm[0] = rss[0]
+        return True
+    tracker.reset_hwm = reset_hwm
+    outer = tracker.start()
+    hwm[0] = 800
+    inner = tracker.start()
+    hwm[0] = 600
+    rss[0] = 300
+    assert tracker.stop(inner) == {'peak': 600, 'end': 300}
+    assert tracker.stop(outer) == {'peak': 800, 'end': 300}
+
+def test_memory_tracker_high_water_mark():
+
+    tracker = benchmark.MemoryTracker(interval=None)
+    if tracker.hwm() is None or not tracker.reset_hwm():
+        pytest.skip('high-water mark of the resident set size cannot be reset')
+
+    def touch(size):
+        buffer = mmap.mmap(-1, size)
+        buffer.write(b'1' * size)
+        buffer.close()
+
+    ## a peak below an earlier, higher peak is measured without sampling
+    touch(2**27)
+    rss = tracker.rss()
+    state = tracker.start()
+    touch(2**26)
+    memory = tracker.stop(state)
+    assert memory['peak'] >= rss + 2**26 * 0.9
+    assert memory['peak'] < tracker.maxrss()
+
+def test_energy_meters(tmp_path):
+
+    ## fake powercap tree with two packages, a core and a DRAM subzone
+    zones = {'intel-rapl:0': ('package-0', 1000), 'intel-rapl:0:0': ('core', 400), 'intel-rapl:0:1': ('dram', 50),
+             'intel-rapl:1': ('package-1', 2000)}
+    for zone, (name, counter) in zones.items():
+        (tmp_path / zone).mkdir()
+        (tmp_path / zone / 'name').write_text(name + '\n')
+        (tmp_path / zone / 'max_energy_range_uj').write_text('262143999\n')
+        (tmp_path / zone / 'energy_uj').write_text('%d\n' % counter)
+
+    meter = energy.RAPLEnergyMeter(root=str(tmp_path))
+    assert [name for _, name, _ in meter.zones] == ['package-0', 'dram', 'package-1']
+    before = meter.read()
+
+    ## package-0 wraps around
+    (tmp_path / 'intel-rapl:0' / 'energy_uj').write_text('500\n')
+    (tmp_path / 'intel-rapl:0:1' / 'energy_uj').write_text('1050\n')
+    (tmp_path / 'intel-rapl:1' / 'energy_uj').write_text('3000\n')
+    assert np.isclose(meter.energy(before, meter.read()), (262144000 - 500 + 1000 + 1000) * 1e-6)
+
+    with pytest.raises(RuntimeError):
+        energy.RAPLEnergyMeter(root=str(tmp_path), domains=('psys',))
+
+    ## the fake meter is deterministic for a deterministic clock
+    clock = iter([10.0, 12.5])
+    meter = energy.FakeEnergyMeter(power=40.0, clock=lambda: next(clock))
+    assert meter.energy(meter.read(), meter.read()) == 100.0
+
+    ## without a clock, each reading advances the time by 1 s
+    meter = energy.FakeEnergyMeter(power=40.0)
+    assert meter.energy(meter.read(), meter.read()) == 40.0
+    assert isinstance(energy.create_meter('fake'), energy.FakeEnergyMeter) and energy.create_meter(None) is None
+
+    ## meters have to implement the interface
+    with pytest.raises(TypeError):
+        energy.EnergyMeter()
+
 if __name__ == '__main__':
     test_simulation()
 